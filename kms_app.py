@@ -1,11 +1,33 @@
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
-import matplotlib.pyplot as plt
+import matplotlib.image as mpimg
 import numpy as np
 import streamlit as st
+from matplotlib.axes import Axes
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
 from matplotlib.ticker import MultipleLocator
-from supabase import create_client, Client
 from datetime import date, datetime
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Optional
+from kms_chart_cache import ChartImageCache, content_hash
+from kms_child_search import SEARCH_LIMIT, ChildIndex
+from kms_history import decode_history
+from kms_import import import_measurements, prepare_rows, read_sheet
+from kms_offline import OfflineStore
+from kms_repository import VELOCITY_FIELDS, Repository, create_repository
+from kms_poly_cache import cache_namespace, cached_polyfit
+from kms_prevalence import PREVALENCE_INDICATORS, PrevalenceCache, monthly_prevalence, prevalence_table
+from kms_reference_store import load_reference_frame, open_store
+from kms_velocity import STATUS_LABELS, compute_velocity, not_gaining
+from kms_zscore import (BATCH_COLUMNS, BIV_COLUMN, CATEGORY_COLORS, SCORE_COLUMNS, calculate_scores_batch, classify_at_point,
+                        describe_biv, months_to_days, reference_version, score_record, sd_values_at)
 
 # ==============================================================================
 # KONFIGURASI TERPUSAT UNTUK SEMUA KURVA PERTUMBUHAN
@@ -18,7 +40,8 @@ CONFIG: Dict[str, Dict[str, Any]] = {
         "title": "Berat Badan menurut Umur",
         "y_col": "berat_kg",
         "y_label": "Berat Badan (kg)",
-        "interpretation_func": lambda berat, z: get_interpretation_wfa(berat, z),
+        "lms_indicator": "wfa",
+        "category_col": "kategori_wfa",
         "ranges": [
             {"max_age": 24, "xlim": (0, 24), "ylim": (0, 18), "x_major": 1, "y_major": 1, "age_range_label": "0-24 Bulan"},
             {"max_age": 60, "xlim": (24, 60), "ylim": (7, 30), "x_major": 1, "y_major": 1, "age_range_label": "24-60 Bulan"},
@@ -32,7 +55,7 @@ CONFIG: Dict[str, Dict[str, Any]] = {
         "x_col": "tinggi_cm",
         "y_col": "berat_kg",
         "y_label": "Berat Badan (kg)",
-        "interpretation_func": lambda berat, z: get_interpretation_wfh(berat, z),
+        "category_col": "kategori_wflh",
         "ranges": [
             {"max_age": 24, "file_key": "wfl", "x_col_std": "Length", "x_label": "Panjang Badan (cm)", "xlim": (45, 110), "ylim": (1, 25), "x_major": 5, "y_major": 2},
             {"max_age": 61, "file_key": "wfh", "x_col_std": "Height", "x_label": "Tinggi Badan (cm)", "xlim": (65, 120), "ylim": (5, 31), "x_major": 5, "y_major": 2},
@@ -43,7 +66,8 @@ CONFIG: Dict[str, Dict[str, Any]] = {
         "title": "Indeks Massa Tubuh (IMT) menurut Umur",
         "y_col": "bmi",
         "y_label": "IMT (kg/m²)",
-        "interpretation_func": lambda bmi, z: get_interpretation_bmi(bmi, z),
+        "lms_indicator": "bfa",
+        "category_col": "kategori_bfa",
         "ranges": [
             {"max_age": 24, "xlim": (0, 24), "ylim": (9, 23), "x_major": 1, "y_major": 1, "age_range_label": "0-24 Bulan"},
             {"max_age": 61, "xlim": (24, 60), "ylim": (11.6, 21), "x_major": 2, "y_major": 1, "age_range_label": "24-60 Bulan"},
@@ -55,7 +79,8 @@ CONFIG: Dict[str, Dict[str, Any]] = {
         "title": "Panjang/Tinggi Badan menurut Umur",
         "y_col": "tinggi_cm",
         "y_label": "Panjang/Tinggi Badan (cm)",
-        "interpretation_func": lambda tinggi, z: get_interpretation_lhfa(tinggi, z),
+        "lms_indicator": "lhfa",
+        "category_col": "kategori_lhfa",
         "ranges": [
             {"max_age": 24, "xlim": (0, 24), "ylim": (43, 100), "x_major": 1, "y_major": 5, "age_range_label": "0-24 Bulan"},
             {"max_age": 61, "xlim": (24, 60), "ylim": (76, 125), "x_major": 2, "y_major": 5, "age_range_label": "2-5 Tahun"},
@@ -67,7 +92,8 @@ CONFIG: Dict[str, Dict[str, Any]] = {
         "title": "Lingkar Kepala menurut Umur",
         "y_col": "lingkar_kepala_cm",
         "y_label": "Lingkar Kepala (cm)",
-        "interpretation_func": lambda hc, z: get_interpretation_hcfa(hc, z),
+        "lms_indicator": "hcfa",
+        "category_col": "kategori_hcfa",
         "ranges": [
             {"max_age": 24, "xlim": (0, 24), "ylim": (32, 52), "x_major": 1, "y_major": 1, "age_range_label": "0-24 Bulan"},
             {"max_age": 61, "xlim": (24, 60), "ylim": (42, 56), "x_major": 2, "y_major": 1, "age_range_label": "2-5 Tahun"},
@@ -81,99 +107,222 @@ CONFIG: Dict[str, Dict[str, Any]] = {
 # KONEKSI DATABASE & FUNGSI DATA HELPER
 # ==============================================================================
 
+def get_config(name: str, default: Any = None) -> Any:
+    """Nilai konfigurasi dari environment, lalu dari Streamlit Secrets (jika ada)."""
+    value = os.environ.get(name)
+    if value is None:
+        try:
+            value = st.secrets.get(name)
+        except Exception: # Tidak ada file secrets
+            value = None
+    return default if value is None else value
+
+@st.cache_resource
+def init_repository() -> Repository:
+    """
+    Backend penyimpanan sesuai KMS_BACKEND: 'supabase' (default) atau 'sqlite'
+    (file KMS_SQLITE_DB, untuk uji beban/benchmark tanpa layanan produksi).
+    Dibuat oleh kms_repository.create_repository, sama dengan alat CLI.
+    """
+    return create_repository(get_config("KMS_BACKEND"), get_config("KMS_SQLITE_DB"))
+
 @st.cache_resource
-def init_connection() -> Client:
-    """Membuat dan mengembalikan koneksi ke database Supabase."""
-    url = st.secrets["SUPABASE_URL"]
-    key = st.secrets["SUPABASE_KEY"]
-    return create_client(url, key)
+def get_offline_store(_repository: Repository) -> Optional[OfflineStore]:
+    """
+    Penyimpanan lokal offline-first (SQLite + sinkronisasi latar belakang), aktif jika
+    KMS_OFFLINE_DB berisi path file database lokal. None = langsung ke repository.
+    """
+    path = get_config("KMS_OFFLINE_DB")
+    if not path:
+        return None
+    store = OfflineStore(path, _repository)
+    store.start()
+    return store
 
-@st.cache_data(ttl=3600)
 def load_who_data(file_path: str) -> pd.DataFrame:
-    """Memuat dan menyimpan cache data dari file Excel standar WHO."""
+    """Memuat tabel standar WHO dari artefak referensi memory-mapped (tanpa membaca Excel)."""
     try:
-        return pd.read_excel(file_path)
+        return load_reference_frame(file_path)
     except FileNotFoundError:
         st.error(f"File standar tidak ditemukan: {file_path}")
         return None
 
 @st.cache_data(ttl=600)
-def get_child_list(_supabase: Client) -> pd.DataFrame:
-    """Mengambil dan memformat daftar anak yang unik dari database."""
+def get_child_list(_repository: Repository) -> pd.DataFrame:
+    """
+    Mengambil daftar anak dari tabel indeks `anak` (satu baris per anak, diambil per halaman).
+    Ukurannya tumbuh dengan jumlah anak, bukan dengan jumlah pengukuran.
+    """
     try:
-        response = _supabase.table("data_pengukuran").select("id_anak, nama_anak").execute()
-        if not response.data:
-            return pd.DataFrame()
-        df = pd.DataFrame(response.data).drop_duplicates(subset=['id_anak']).sort_values('nama_anak')
-        df['display_name'] = df['nama_anak'] + " (" + df['id_anak'] + ")"
-        return df
+        return add_display_name(pd.DataFrame(_repository.list_children()))
     except Exception as e:
         st.error(f"Gagal mengambil daftar anak: {e}")
         return pd.DataFrame()
 
-def save_measurement(data: Dict[str, Any]) -> None:
-    """Menyimpan satu data pengukuran baru ke Supabase."""
+def add_display_name(df: pd.DataFrame) -> pd.DataFrame:
+    """Menambahkan kolom 'Nama (ID)' untuk pilihan di selectbox; DataFrame kosong jika belum ada anak."""
+    if df.empty:
+        return pd.DataFrame()
+    df['display_name'] = df['nama_anak'] + " (" + df['id_anak'] + ")"
+    return df
+
+def load_children() -> pd.DataFrame:
+    """Daftar anak dari penyimpanan lokal (mode offline) atau dari indeks `anak` di repository."""
+    if offline_store is not None:
+        return add_display_name(offline_store.list_children())
+    return get_child_list(repository)
+
+@st.cache_resource(max_entries=4)
+def get_child_index(fingerprint: str, _df_anak: pd.DataFrame) -> ChildIndex:
+    """Indeks pencarian anak, dibangun ulang hanya jika isi/urutan daftar anak berubah (`fingerprint`)."""
+    return ChildIndex(_df_anak['id_anak'], _df_anak['nama_anak'])
+
+def select_child(df_anak: pd.DataFrame, label: str, key: str) -> Optional[pd.Series]:
+    """
+    Pemilih anak berbasis pencarian prefiks nama/ID. Hanya hasil teratas (SEARCH_LIMIT) yang
+    menjadi pilihan selectbox, sehingga daftar anak lengkap tidak dikirim ke browser.
+    """
+    row_hashes = pd.util.hash_pandas_object(df_anak[['id_anak', 'nama_anak']], index=False).to_numpy()
+    fingerprint = hashlib.sha1(row_hashes.tobytes()).hexdigest()
+    index = get_child_index(fingerprint, df_anak)
+    query = st.text_input("Cari anak (nama atau ID):", key=f"{key}_query", placeholder="Ketik awal nama atau ID anak")
+    if not query.strip():
+        st.caption(f"{len(index)} anak terdaftar. Ketik nama atau ID untuk mencari.")
+        return None
+    matches = index.search(query, SEARCH_LIMIT)
+    if not matches:
+        st.warning(f"Tidak ada anak dengan nama atau ID berawalan \"{query.strip()}\".")
+        return None
+    choice = st.selectbox(label, [None] + matches, index=1 if len(matches) == 1 else 0, key=f"{key}_choice",
+                          format_func=lambda pos: "-" if pos is None else df_anak['display_name'].iat[pos])
+    return None if choice is None else df_anak.iloc[choice]
+
+def save_measurement(data: Dict[str, Any], child: Dict[str, Any]) -> None:
+    """
+    Menyimpan satu data pengukuran baru ke repository.
+    `data` hanya berisi kolom pengukuran + id_anak (skema ternormalisasi); identitas anak
+    ada di tabel `anak`. Untuk anak baru (`child` punya kunci 'baru'), identitasnya disimpan dulu.
+    """
+    data = {**data, **score_record(data, child['jenis_kelamin'])} # Z-score + kategori disimpan bersama baris
     try:
-        supabase.table("data_pengukuran").insert(data).execute()
-        st.success(f"Data untuk {data['nama_anak']} berhasil disimpan!")
+        if offline_store is not None:
+            offline_store.insert_measurement(data, child if child.get('baru') else None)
+            st.success(f"Data untuk {child['nama_anak']} tersimpan di perangkat dan akan disinkronkan.")
+            warn_implausible(data)
+            return
+        if child.get('baru'):
+            identity = {k: child[k] for k in ('id_anak', 'nama_anak', 'tanggal_lahir', 'jenis_kelamin')}
+            repository.insert_children([identity]) # Gagal jika ID sudah terdaftar
+            get_child_list.clear() # Anak baru harus langsung muncul di daftar
+        apply_history_write(data['id_anak'], upserted=repository.insert_measurements([data]))
+        st.success(f"Data untuk {child['nama_anak']} berhasil disimpan!")
+        warn_implausible(data)
     except Exception as e:
         st.error(f"Gagal menyimpan data: {e}")
 
+def warn_implausible(record: Dict[str, Any]) -> None:
+    """Peringatan untuk baris bertanda BIV: tetap tersimpan, tetapi dikarantina dari agregat dan grafik."""
+    if record.get(BIV_COLUMN):
+        st.warning(f"⚠️ Nilai tidak wajar: {describe_biv(record)}. Data tetap disimpan tetapi tidak dipakai di grafik "
+                   "dan prevalensi sampai direvisi. Periksa kembali angka berat, tinggi, dan lingkar kepala.")
+
+# --- Cache riwayat per anak (write-through) ---
+# Riwayat setiap anak disimpan di session_state bersama nomor revisi dari kolom anak.revisi
+# (dinaikkan trigger setiap ada insert/update/delete di data_pengukuran). Selama revisi di
+# server sama dengan revisi cache, riwayat tidak diambil ulang. Penulisan dari sesi ini
+# langsung diterapkan ke cache dan menaikkan revisinya, sehingga tidak memicu pengambilan ulang.
+
+HISTORY_REVALIDATE_SECONDS = 30 # Dalam jendela ini cache dipakai tanpa cek revisi ke server
+
+def get_history_cache() -> Dict[str, Dict[str, Any]]:
+    """Cache riwayat milik sesi ini: id_anak -> {'revisi', 'rows', 'checked_at'}."""
+    return st.session_state.setdefault("history_cache", {})
+
+def get_child_history(id_anak: str) -> list:
+    """
+    Mengembalikan baris riwayat pengukuran satu anak (urut tanggal) dari cache sesi.
+    Riwayat hanya diambil ulang dari repository jika revisi di server berubah.
+    Baris didekode ke array bertipe oleh kms_history.decode_history.
+    """
+    if offline_store is not None:
+        return offline_store.get_history(id_anak)
+    cache = get_history_cache()
+    entry = cache.get(id_anak)
+    now = time.monotonic()
+    if entry is None or now - entry['checked_at'] >= HISTORY_REVALIDATE_SECONDS:
+        revisi = repository.get_revision(id_anak)
+        if entry is None or entry['revisi'] != revisi:
+            entry = {'revisi': revisi, 'rows': {row['id']: row for row in repository.get_history(id_anak)}}
+            cache[id_anak] = entry
+        entry['checked_at'] = now
+
+    return sorted(entry['rows'].values(), key=lambda row: (str(row.get('tanggal_pengukuran')), row['id']))
+
+def apply_history_write(id_anak: str, upserted: list = (), deleted_ids: list = ()) -> None:
+    """
+    Menerapkan hasil insert/update/delete ke cache riwayat (jika anak tersebut sudah di-cache).
+    Setiap baris yang berubah menaikkan revisi satu kali, sama seperti trigger di server.
+    """
+    entry = get_history_cache().get(id_anak)
+    if entry is None:
+        return
+    for row in upserted:
+        entry['rows'][row['id']] = row
+    for row_id in deleted_ids:
+        entry['rows'].pop(row_id, None)
+    entry['revisi'] += len(upserted) + len(deleted_ids)
+
+def update_measurement(id_anak: str, current: Dict[str, Any], update_data: Dict[str, Any]) -> None:
+    """Memperbarui satu baris pengukuran (`current`: baris lama + jenis_kelamin), skornya, dan cache riwayatnya."""
+    row_id = int(current['id'])
+    update_data = {**update_data, **score_record({**current, **update_data}, current['jenis_kelamin'])}
+    if offline_store is not None:
+        return offline_store.update_measurement(row_id, update_data)
+    apply_history_write(id_anak, upserted=repository.update_measurement(row_id, update_data))
+
+def delete_measurement(id_anak: str, row_id: int) -> None:
+    """Menghapus satu baris pengukuran dan mengeluarkannya dari cache riwayat."""
+    if offline_store is not None:
+        return offline_store.delete_measurement(row_id)
+    deleted = repository.delete_measurements([row_id])
+    apply_history_write(id_anak, deleted_ids=[row['id'] for row in deleted])
+
 # ==============================================================================
 # FUNGSI-FUNGSI LOGIKA DAN PERHITUNGAN
 # ==============================================================================
 
+def apply_current_scores(history_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Melengkapi kolom SCORE_COLUMNS riwayat. Skor yang disimpan saat tulis dipakai apa adanya;
+    hanya baris tanpa cap referensi_versi terbaru (data lama / tabel WHO berubah) yang dihitung ulang.
+    """
+    stale = history_df['referensi_versi'] != reference_version()
+    if stale.any():
+        scores = calculate_scores_batch(history_df[stale])
+        for col in SCORE_COLUMNS:
+            history_df[col] = history_df[col].where(~stale, scores[col])
+        history_df[BATCH_COLUMNS] = history_df[BATCH_COLUMNS].astype(np.float32)
+    return history_df
+
 def calculate_age_in_months(birth_date: date, measurement_date: date) -> int:
     """Menghitung usia dalam bulan penuh."""
     return (measurement_date.year - birth_date.year) * 12 + (measurement_date.month - birth_date.month)
 
-def calculate_bmi(weight_kg: float, height_cm: float) -> float:
-    """Menghitung Indeks Massa Tubuh (IMT)."""
-    if height_cm == 0:
-        return 0.0
-    return weight_kg / ((height_cm / 100) ** 2)
-
-# Fungsi-fungsi interpretasi tetap sama karena logikanya unik untuk setiap kurva.
-def get_interpretation_wfa(berat_anak: float, z: Dict) -> Tuple[str, str]:
-    if berat_anak > z['SD3']: return "Berat badan sangat lebih", 'red'
-    elif berat_anak > z['SD2']: return "Berat badan lebih", 'yellow'
-    elif berat_anak >= z['SD2neg']: return "Berat badan normal", 'forestgreen'
-    elif berat_anak > z['SD3neg']: return "Berat badan kurang", 'yellow'
-    else: return "Berat badan sangat kurang (Underweight)", 'red'
-
-def get_interpretation_wfh(berat_anak: float, z: Dict) -> Tuple[str, str]:
-    if berat_anak > z['SD3']: return "Gizi lebih (Obesitas)", 'red'
-    elif berat_anak > z['SD2']: return "Berisiko gizi lebih (Overweight)", 'yellow'
-    elif berat_anak >= z['SD2neg']: return "Gizi baik (Normal)", 'forestgreen'
-    elif berat_anak >= z['SD3neg']: return "Gizi kurang (Wasting)", 'yellow'
-    else: return "Gizi buruk (Severe Wasting)", 'red'
-
-def get_interpretation_bmi(bmi_anak: float, z: Dict) -> Tuple[str, str]:
-    if bmi_anak > z['SD3']: return "Gizi lebih (Obesitas)", 'red'
-    elif bmi_anak > z['SD2']: return "Berisiko gizi lebih (Overweight)", 'yellow'
-    elif bmi_anak >= z['SD2neg']: return "Gizi baik (Normal)", 'forestgreen'
-    elif bmi_anak >= z['SD3neg']: return "Gizi kurang (Wasting)", 'yellow'
-    else: return "Gizi buruk (Severe Wasting)", 'red'
-
-def get_interpretation_lhfa(panjang_anak: float, z: Dict) -> Tuple[str, str]:
-    if panjang_anak > z['SD2']: return "Tinggi", 'forestgreen'
-    elif panjang_anak >= z['SD2neg']: return "Normal", 'forestgreen'
-    elif panjang_anak >= z['SD3neg']: return "Pendek (Stunting)", 'yellow'
-    else: return "Sangat Pendek (Severe Stunting)", 'red'
-
-def get_interpretation_hcfa(hc_anak: float, z: Dict) -> Tuple[str, str]:
-    if hc_anak > z['SD2']: return "Makrosefali", 'yellow'
-    elif hc_anak >= z['SD2neg']: return "Normal", 'forestgreen'
-    else: return "Mikrosefali", 'yellow'
+def calculate_age_in_days(birth_date: date, measurement_date: date) -> int:
+    """Menghitung usia dalam hari (presisi yang dipakai tabel LMS harian WHO)."""
+    return (measurement_date - birth_date).days
 
 # ==============================================================================
 # FUNGSI PLOTTING UTAMA (TERABSTRAKSI)
 # ==============================================================================
 
-def create_growth_chart(ax: plt.Axes, chart_type: str, history_df: pd.DataFrame, gender: str, latest_data: pd.Series) -> None:
+Z_COLS = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
+FIGSIZE = (12, 7)
+
+def analyze_growth_chart(chart_type: str, gender: str, latest_data: pd.Series) -> Dict[str, Any]:
     """
-    Fungsi generik untuk membuat dan memformat satu grafik pertumbuhan.
-    Mengambil data yang sudah diproses dan menghasilkan plot.
+    Menentukan rentang grafik, tabel standar, kurva SD, dan interpretasi untuk data terakhir.
+    Hasilnya dipakai bersama oleh penggambar latar statis dan overlay per anak.
     """
     cfg = CONFIG[chart_type]
     is_age_based = cfg.get("x_axis_label", "").endswith("(Bulan)")
@@ -186,37 +335,66 @@ def create_growth_chart(ax: plt.Axes, chart_type: str, history_df: pd.DataFrame,
     
     # 2. Tentukan range dan file standar berdasarkan data terakhir
     if is_age_based:
-        range_cfg = next((r for r in cfg["ranges"] if x_latest < r["max_age"]), cfg["ranges"][-1])
+        range_index = next((i for i, r in enumerate(cfg["ranges"]) if x_latest < r["max_age"]), len(cfg["ranges"]) - 1)
         age_group_map = {24: "0-to-2-years", 60: "2-to-5-years", 61: "2-to-5-years", 121: "5-to-10-years"}
         age_group = next((v for k, v in age_group_map.items() if x_latest < k), "5-to-10-years")
         file_name = cfg["file_pattern"].format(gender="girls" if gender == 'P' else "boys", age_group=age_group)
         x_col_std = "Month"
     else: # Untuk WFH/WFL
-        range_cfg = next((r for r in cfg["ranges"] if latest_data['usia_bulan'] < r["max_age"]), cfg["ranges"][-1])
+        range_index = next((i for i, r in enumerate(cfg["ranges"]) if latest_data['usia_bulan'] < r["max_age"]), len(cfg["ranges"]) - 1)
         age_group_map = {24: "0-to-2-years", 61: "2-to-5-years"}
         age_group = next((v for k, v in age_group_map.items() if latest_data['usia_bulan'] < k), "2-to-5-years")
-        file_name = cfg["file_pattern"].format(file_key=range_cfg["file_key"], gender="girls" if gender == 'P' else "boys", age_group=age_group)
-        x_col_std = range_cfg["x_col_std"]
+        file_name = cfg["file_pattern"].format(file_key=cfg["ranges"][range_index]["file_key"], gender="girls" if gender == 'P' else "boys", age_group=age_group)
+        x_col_std = cfg["ranges"][range_index]["x_col_std"]
+    range_cfg = cfg["ranges"][range_index]
         
     df_std = load_who_data(file_name)
-    if df_std is None: return
+    if df_std is None: return None
     
-    # 3. Proses data standar dan hitung Z-scores
+    # 3. Proses data standar dan ambil kurva Z-score (koefisien dari cache)
     df_std = df_std.rename(columns={x_col_std: 'x_std'}).sort_values('x_std').drop_duplicates('x_std')
-    z_cols = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
-    poly_funcs = {col: np.poly1d(np.polyfit(df_std['x_std'], df_std[col], 5)) for col in z_cols}
-    z_scores_at_point = {col: func(x_latest) for col, func in poly_funcs.items()}
-    
-    # 4. Dapatkan interpretasi
-    interpretation, color = cfg["interpretation_func"](y_latest, z_scores_at_point)
-    st.info(f"**{cfg['title']}:** {interpretation}")
+    poly_funcs = cached_polyfit(file_name, df_std['x_std'], df_std, Z_COLS, 5)
+
+    # Nilai SD pada titik anak diambil langsung dari tabel LMS harian WHO (tanpa fitting).
+    # WFH/WFL memakai tabel sesuai rentang (file_key "wfl" atau "wfh").
+    # 4. Dapatkan interpretasi: kategori yang disimpan saat tulis dipakai selama capnya masih berlaku
+    stored_category = latest_data.get(cfg["category_col"])
+    if isinstance(stored_category, str) and latest_data.get('referensi_versi') == reference_version():
+        interpretation, color = stored_category, CATEGORY_COLORS[stored_category]
+    else:
+        lms_indicator = cfg.get("lms_indicator") or range_cfg["file_key"]
+        if not is_age_based:
+            lms_x = x_latest
+        elif pd.notna(latest_data.get('usia_hari')):
+            lms_x = latest_data['usia_hari']
+        else:
+            lms_x = months_to_days(x_latest)
+        try:
+            z_scores_at_point = sd_values_at(lms_indicator, gender, lms_x)
+        except ValueError:
+            # Di luar rentang tabel harian (mis. WFA 5-10 tahun): kembali ke kurva polinomial
+            z_scores_at_point = {col: func(x_latest) for col, func in poly_funcs.items()}
+        # Tabel batas yang sama dengan skor saat tulis (kms_zscore.CLASSIFICATION_TABLES)
+        interpretation, color = classify_at_point(cfg["category_col"].removeprefix("kategori_"), y_latest, z_scores_at_point)
+
+    return {
+        "chart_type": chart_type, "gender": gender, "range_index": range_index, "range_cfg": range_cfg,
+        "file_name": file_name, "x_range": (df_std['x_std'].min(), df_std['x_std'].max()), "poly_funcs": poly_funcs,
+        "x_col": x_col, "y_col": y_col, "x_latest": x_latest, "y_latest": y_latest,
+        "interpretation": interpretation, "color": color,
+    }
+
+def draw_chart_background(ax: Axes, analysis: Dict[str, Any]) -> None:
+    """Menggambar lapisan statis grafik: area & garis SD, judul, sumbu, grid, dan legenda."""
+    cfg = CONFIG[analysis["chart_type"]]
+    range_cfg = analysis["range_cfg"]
+    gender = analysis["gender"]
 
-    # 5. Plotting
     fig = ax.figure
     fig.set_facecolor('hotpink' if gender == 'P' else 'steelblue')
     
-    x_smooth = np.linspace(df_std['x_std'].min(), df_std['x_std'].max(), 300)
-    smooth_data = {col: func(x_smooth) for col, func in poly_funcs.items()}
+    x_smooth = np.linspace(*analysis["x_range"], 300)
+    smooth_data = {col: func(x_smooth) for col, func in analysis["poly_funcs"].items()}
 
     # Area berwarna Z-score
     ax.fill_between(x_smooth, smooth_data['SD3neg'], smooth_data['SD2neg'], color='yellow', alpha=0.5)
@@ -227,14 +405,6 @@ def create_growth_chart(ax: plt.Axes, chart_type: str, history_df: pd.DataFrame,
     for col, data in smooth_data.items():
         ax.plot(x_smooth, data, color='red' if col in ['SD3', 'SD3neg'] else 'black', lw=1, alpha=0.8)
 
-    # Plot riwayat dan titik terakhir
-    ax.plot(history_df[x_col].astype(float), history_df[y_col].astype(float), marker='o', linestyle='-', color='darkviolet', label='Riwayat Pertumbuhan')
-    ax.scatter(x_latest, y_latest, marker='*', c='cyan', s=300, ec='black', zorder=10, label='Pengukuran Terakhir')
-
-    # Anotasi dan Label
-    props = dict(boxstyle='round', facecolor=color, alpha=0.8)
-    ax.text(0.03, 0.97, f"Interpretasi: {interpretation}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
-    
     title_text = f"Grafik {cfg['title']} - {'Perempuan' if gender == 'P' else 'Laki-laki'}"
     if 'age_range_label' in range_cfg:
         title_text += f" ({range_cfg['age_range_label']})"
@@ -253,39 +423,242 @@ def create_growth_chart(ax: plt.Axes, chart_type: str, history_df: pd.DataFrame,
     
     ax.tick_params(axis='x', colors='white')
     ax.tick_params(axis='y', colors='white')
-    ax.legend(loc='lower right')
+
+    # Legenda memakai artist pengganti agar bisa digambar tanpa data anak
+    legend_handles = [
+        Line2D([], [], marker='o', linestyle='-', color='darkviolet', label='Riwayat Pertumbuhan'),
+        Line2D([], [], marker='*', linestyle='None', markerfacecolor='cyan', markeredgecolor='black', markersize=17, label='Pengukuran Terakhir'),
+    ]
+    ax.legend(handles=legend_handles, loc='lower right')
     fig.tight_layout()
 
+def draw_chart_overlay(ax: Axes, history_df: pd.DataFrame, analysis: Dict[str, Any]) -> list:
+    """Menggambar lapisan khusus anak (riwayat, titik terakhir, interpretasi) dan mengembalikan artist-nya."""
+    x_col, y_col = analysis["x_col"], analysis["y_col"]
+    line, = ax.plot(history_df[x_col].to_numpy(), history_df[y_col].to_numpy(), marker='o', linestyle='-', color='darkviolet')
+    star = ax.scatter(analysis["x_latest"], analysis["y_latest"], marker='*', c='cyan', s=300, ec='black', zorder=10)
+
+    props = dict(boxstyle='round', facecolor=analysis["color"], alpha=0.8)
+    text = ax.text(0.03, 0.97, f"Interpretasi: {analysis['interpretation']}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
+    return [line, star, text]
+
+# ==============================================================================
+# CACHE LATAR GRAFIK STATIS + KOMPOSISI OVERLAY PER ANAK
+# ==============================================================================
+
+# Latar setiap kombinasi (jenis grafik, jenis kelamin, rentang, file standar) dirender sekali
+# dengan Agg lalu disimpan sebagai region piksel. Per request, region dipulihkan (blit) dan
+# hanya riwayat anak, titik terakhir, serta kotak interpretasi yang digambar di atasnya.
+
+@st.cache_resource
+def get_chart_background_registry() -> Dict[str, Any]:
+    """Registri latar grafik yang bertahan lintas rerun dan sesi (skrip utama dieksekusi ulang tiap rerun)."""
+    return {"items": {}, "lock": threading.Lock()}
+
+def get_chart_background(registry: Dict[str, Any], analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Mengambil dari `registry` (atau merender sekali) latar statis untuk grafik yang dijelaskan `analysis`."""
+    key = (analysis["chart_type"], analysis["gender"], analysis["range_index"], analysis["file_name"])
+    entry = registry["items"].get(key)
+    if entry is None:
+        with registry["lock"]:
+            entry = registry["items"].get(key)
+            if entry is None:
+                fig = Figure(figsize=FIGSIZE)
+                canvas = FigureCanvasAgg(fig)
+                ax = fig.add_subplot()
+                draw_chart_background(ax, analysis)
+                canvas.draw()
+                entry = {"fig": fig, "ax": ax, "canvas": canvas, "region": canvas.copy_from_bbox(fig.bbox), "lock": threading.Lock()}
+                registry["items"][key] = entry
+    return entry
+
+def render_growth_chart(registry: Dict[str, Any], history_df: pd.DataFrame, analysis: Dict[str, Any]) -> bytes:
+    """Menyusun latar statis (dari `registry`) dengan overlay anak dan mengembalikan gambar PNG."""
+    entry = get_chart_background(registry, analysis)
+    with entry["lock"]:
+        canvas, ax = entry["canvas"], entry["ax"]
+        canvas.restore_region(entry["region"])
+        artists = draw_chart_overlay(ax, history_df, analysis)
+        try:
+            for artist in artists:
+                ax.draw_artist(artist)
+            ax.draw_artist(ax.get_legend()) # Legenda tetap di atas garis riwayat
+            pixels = np.asarray(canvas.buffer_rgba()).copy()
+        finally:
+            for artist in artists:
+                artist.remove()
+
+    # Kompresi ringan: encoding PNG adalah bagian terbesar waktu render setelah latar di-cache
+    buffer = io.BytesIO()
+    mpimg.imsave(buffer, pixels, format='png', pil_kwargs={"compress_level": 1})
+    return buffer.getvalue()
+
+# ==============================================================================
+# CACHE PNG BERDASARKAN HASH ISI
+# ==============================================================================
+
+# Naikkan jika tampilan grafik berubah agar semua PNG lama tidak dipakai lagi.
+CHART_STYLE_VERSION = 1
+
+@st.cache_resource
+def get_chart_image_cache() -> ChartImageCache:
+    """Cache PNG grafik (LRU memori + disk) yang dipakai bersama oleh semua sesi."""
+    return ChartImageCache()
+
+def chart_image_key(history_df: pd.DataFrame, analysis: Dict[str, Any]) -> str:
+    """Kunci cache dari semua masukan yang menentukan tampilan satu grafik."""
+    rows = history_df[[analysis["x_col"], analysis["y_col"]]].astype(float).round(4).values.tolist()
+    return content_hash(
+        CHART_STYLE_VERSION, cache_namespace(), analysis["chart_type"], analysis["gender"],
+        analysis["range_index"], analysis["file_name"], analysis["interpretation"], analysis["color"],
+        float(analysis["x_latest"]), float(analysis["y_latest"]), rows,
+    )
+
+def get_growth_chart_png(image_cache: ChartImageCache, registry: Dict[str, Any],
+                         history_df: pd.DataFrame, analysis: Dict[str, Any]) -> bytes:
+    """
+    PNG grafik dari cache; hanya dirender jika riwayat/gaya berubah.
+    Cache dan registri latar diterima sebagai argumen (bukan dipanggil dari sini) karena fungsi
+    ini berjalan di thread pool, yang tidak punya ScriptRunContext untuk st.cache_resource.
+    """
+    key = chart_image_key(history_df, analysis)
+    return image_cache.get_or_render(key, lambda: render_growth_chart(registry, history_df, analysis))
+
+# ==============================================================================
+# RENDERER SISI KLIEN (VEGA-LITE)
+# ==============================================================================
+
+# Alternatif render matplotlib: spesifikasi Vega-Lite digambar oleh browser lewat
+# st.vega_lite_chart. Geometri area SD dihitung sekali per (grafik, jenis kelamin, rentang)
+# dan didesimasi ke resolusi layar; per request hanya titik-titik anak yang ditambahkan.
+
+CHART_RENDERERS = {"Gambar (server)": "matplotlib", "Interaktif (browser)": "vega-lite"}
+VEGA_CHART_WIDTH_PX = 700
+VEGA_PX_PER_POINT = 5 # Satu titik kurva tiap ~5 piksel sudah halus di layar
+VEGA_STAR_SHAPE = "M0,-1L0.22,-0.31L0.95,-0.31L0.36,0.12L0.59,0.81L0,0.38L-0.59,0.81L-0.36,0.12L-0.95,-0.31L-0.22,-0.31Z"
+
+@st.cache_data
+def get_band_geometry(chart_type: str, gender: str, range_index: int, file_name: str, _poly_funcs: Dict) -> list:
+    """
+    Titik-titik kurva SD yang sudah didesimasi untuk satu latar grafik.
+    Hanya rentang sumbu X yang terlihat yang diambil sampelnya.
+    """
+    range_cfg = CONFIG[chart_type]["ranges"][range_index]
+    n_points = max(VEGA_CHART_WIDTH_PX // VEGA_PX_PER_POINT, 20)
+    x_values = np.linspace(*range_cfg["xlim"], n_points)
+    columns = {"x": np.round(x_values, 3)}
+    for col, func in _poly_funcs.items():
+        columns[col] = np.round(func(x_values), 3)
+    return pd.DataFrame(columns).to_dict(orient="records")
+
+def build_vega_lite_spec(history_df: pd.DataFrame, analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Menyusun spesifikasi Vega-Lite: latar area/garis SD (dari cache) + riwayat anak."""
+    cfg = CONFIG[analysis["chart_type"]]
+    range_cfg = analysis["range_cfg"]
+    gender = analysis["gender"]
+    x_col, y_col = analysis["x_col"], analysis["y_col"]
+
+    # Geometri SD cukup dikirim sekali sebagai dataset bernama, dipakai bersama oleh semua layer
+    band_values = get_band_geometry(analysis["chart_type"], gender, analysis["range_index"], analysis["file_name"], analysis["poly_funcs"])
+    bands = {"name": "sd_bands"}
+    x_values, y_values = history_df[x_col].to_numpy(dtype=float), history_df[y_col].to_numpy(dtype=float)
+    measured = ~(np.isnan(x_values) | np.isnan(y_values)) # Titik tanpa nilai tidak dikirim (NaN bukan JSON valid)
+    child = {"values": [{"x": x, "y": y} for x, y in zip(x_values[measured].tolist(), y_values[measured].tolist())]}
+    latest = {"values": [{"x": float(analysis["x_latest"]), "y": float(analysis["y_latest"])}]}
+
+    x_enc = {"field": "x", "type": "quantitative", "scale": {"domain": list(range_cfg["xlim"])},
+             "title": cfg.get('x_axis_label') or range_cfg.get('x_label'), "axis": {"tickMinStep": range_cfg["x_major"]}}
+    y_scale = {"domain": list(range_cfg["ylim"])}
+
+    def band(lower: str, upper: str, color: str, opacity: float) -> Dict[str, Any]:
+        return {"data": bands, "mark": {"type": "area", "color": color, "opacity": opacity, "clip": True},
+                "encoding": {"x": x_enc, "y": {"field": lower, "type": "quantitative", "scale": y_scale, "title": cfg['y_label']},
+                             "y2": {"field": upper}}}
+
+    title_text = f"Grafik {cfg['title']} - {'Perempuan' if gender == 'P' else 'Laki-laki'}"
+    if 'age_range_label' in range_cfg:
+        title_text += f" ({range_cfg['age_range_label']})"
+
+    return {
+        "title": {"text": title_text, "color": "white", "fontSize": 16},
+        "background": 'hotpink' if gender == 'P' else 'steelblue',
+        "width": "container", "height": 420,
+        "datasets": {"sd_bands": band_values},
+        "layer": [
+            band('SD3neg', 'SD2neg', 'yellow', 0.5),
+            band('SD2neg', 'SD2', 'green', 0.4),
+            band('SD2', 'SD3', 'yellow', 0.5),
+            {"data": bands, "transform": [{"fold": Z_COLS, "as": ["garis", "nilai"]}],
+             "mark": {"type": "line", "strokeWidth": 1, "clip": True},
+             "encoding": {"x": x_enc, "y": {"field": "nilai", "type": "quantitative", "scale": y_scale},
+                          "detail": {"field": "garis"},
+                          "color": {"condition": {"test": "datum.garis == 'SD3' || datum.garis == 'SD3neg'", "value": "red"}, "value": "black"}}},
+            {"data": child, "mark": {"type": "line", "point": True, "color": "darkviolet", "clip": True},
+             "encoding": {"x": x_enc, "y": {"field": "y", "type": "quantitative", "scale": y_scale}}},
+            {"data": latest, "mark": {"type": "point", "shape": VEGA_STAR_SHAPE, "size": 300, "filled": True,
+                                      "color": "cyan", "stroke": "black", "opacity": 1},
+             "encoding": {"x": x_enc, "y": {"field": "y", "type": "quantitative", "scale": y_scale},
+                          "tooltip": [{"field": "x", "title": x_enc["title"]}, {"field": "y", "title": cfg['y_label']}]}},
+        ],
+        "config": {"axis": {"labelColor": "white", "titleColor": "white", "gridColor": "gray"}, "view": {"fill": "white"}},
+    }
+
 # ==============================================================================
 # FUNGSI-FUNGSI PLOT SPESIFIK (SEKARANG JAUH LEBIH RINGKAS)
 # ==============================================================================
 
-def plot_all_curves(history_df: pd.DataFrame):
+# Kelima grafik dirender paralel di thread pool (jalur render tidak memakai state global pyplot).
+# Resource st.cache_resource diambil di thread skrip lalu diteruskan ke worker; elemen Streamlit
+# hanya diisi dari thread skrip. Set False untuk render berurutan.
+PARALLEL_CHART_RENDERING = True
+CHART_RENDER_WORKERS = min(5, os.cpu_count() or 1)
+
+@st.cache_resource
+def get_chart_executor() -> ThreadPoolExecutor:
+    """Thread pool render grafik yang dipakai bersama oleh semua sesi."""
+    return ThreadPoolExecutor(max_workers=CHART_RENDER_WORKERS, thread_name_prefix="chart-render")
+
+def plot_all_curves(history_df: pd.DataFrame, renderer: str = "matplotlib"):
     """Fungsi utama untuk menampilkan semua kurva pertumbuhan."""
     st.header("📈 Hasil Analisis Pertumbuhan")
     if history_df.empty:
         st.warning("Data riwayat tidak tersedia untuk membuat grafik.")
         return
 
-    # Tambah kolom BMI jika belum ada
-    if 'bmi' not in history_df.columns:
-        history_df['bmi'] = history_df.apply(lambda row: calculate_bmi(row['berat_kg'], row['tinggi_cm']), axis=1)
-
     latest_data = history_df.iloc[-1]
     gender = latest_data['jenis_kelamin']
 
     charts_to_plot = ["wfa", "wfh", "bmi", "lhfa", "hcfa"]
+    image_cache, registry = get_chart_image_cache(), get_chart_background_registry()
+    executor = get_chart_executor() if PARALLEL_CHART_RENDERING and renderer == "matplotlib" else None
+    pending = {}
     for chart_type in charts_to_plot:
-        if latest_data[CONFIG[chart_type]["y_col"]] > 0: # Hanya plot jika ada data
+        if latest_data[CONFIG[chart_type]["y_col"]] > 0: # Hanya plot jika ada data (NaN = tidak diukur)
             st.markdown("---")
             st.subheader(f"{charts_to_plot.index(chart_type)+1}. {CONFIG[chart_type]['title']}")
-            fig, ax = plt.subplots(figsize=(12, 7))
             try:
-                create_growth_chart(ax, chart_type, history_df, gender, latest_data)
-                st.pyplot(fig)
+                analysis = analyze_growth_chart(chart_type, gender, latest_data)
+                if analysis is None: continue
+                st.info(f"**{CONFIG[chart_type]['title']}:** {analysis['interpretation']}")
+                placeholder = st.empty()
+                if renderer == "vega-lite":
+                    placeholder.vega_lite_chart(build_vega_lite_spec(history_df, analysis), use_container_width=True)
+                elif executor is None:
+                    placeholder.image(get_growth_chart_png(image_cache, registry, history_df, analysis), use_container_width=True)
+                else:
+                    # Placeholder diisi begitu gambarnya selesai, dalam urutan selesai
+                    placeholder.caption("⏳ Menyiapkan grafik...")
+                    future = executor.submit(get_growth_chart_png, image_cache, registry, history_df, analysis)
+                    pending[future] = (chart_type, placeholder)
             except Exception as e:
                 st.error(f"Gagal membuat grafik {chart_type.upper()}: {e}")
-            plt.close(fig) # Tutup figure untuk membebaskan memori
+
+    for future in as_completed(pending):
+        chart_type, placeholder = pending[future]
+        try:
+            placeholder.image(future.result(), use_container_width=True)
+        except Exception as e:
+            placeholder.error(f"Gagal membuat grafik {chart_type.upper()}: {e}")
 
 # ==============================================================================
 # HALAMAN-HALAMAN STREAMLIT (UI)
@@ -298,16 +671,14 @@ def page_input_data():
     input_type = st.radio("Pilih jenis input:", ('Anak yang Sudah Terdaftar', 'Daftarkan Anak Baru'), horizontal=True)
 
     if input_type == 'Anak yang Sudah Terdaftar':
-        df_anak = get_child_list(supabase)
+        df_anak = load_children()
         if df_anak.empty:
             st.warning("Belum ada anak terdaftar. Silakan pilih 'Daftarkan Anak Baru'.")
             return
         
-        option_list = ["-"] + df_anak['display_name'].tolist()
-        selected_name = st.selectbox("Pilih Anak:", option_list)
+        child_data = select_child(df_anak, "Pilih Anak:", "input_child")
 
-        if selected_name and selected_name != "-":
-            child_data = df_anak[df_anak['display_name'] == selected_name].iloc[0]
+        if child_data is not None:
             with st.form("existing_child_form", clear_on_submit=True):
                 st.info(f"Menambahkan pengukuran untuk **{child_data['nama_anak']}**")
                 tanggal_pengukuran = st.date_input("Tanggal Pengukuran", max_value=date.today())
@@ -316,17 +687,17 @@ def page_input_data():
                 lingkar_kepala_cm = st.number_input("Lingkar Kepala (cm)", min_value=10.0, step=0.5, format="%.1f", help="Boleh dikosongkan jika tidak diukur.")
 
                 if st.form_submit_button("Simpan Pengukuran"):
-                    # Ambil data anak yg lengkap dari DB untuk submit
-                    full_child_data = supabase.table("data_pengukuran").select("*").eq("id_anak", child_data['id_anak']).limit(1).execute().data[0]
-                    usia_bulan = calculate_age_in_months(datetime.strptime(full_child_data['tanggal_lahir'], '%Y-%m-%d').date(), tanggal_pengukuran)
+                    # Identitas anak sudah ada di daftar anak: cukup satu request insert
+                    tanggal_lahir = datetime.strptime(str(child_data['tanggal_lahir']), '%Y-%m-%d').date()
+                    usia_bulan = calculate_age_in_months(tanggal_lahir, tanggal_pengukuran)
+                    usia_hari = calculate_age_in_days(tanggal_lahir, tanggal_pengukuran)
                     
                     data_to_insert = {
-                        "id_anak": full_child_data['id_anak'], "nama_anak": full_child_data['nama_anak'],
-                        "tanggal_lahir": full_child_data['tanggal_lahir'], "jenis_kelamin": full_child_data['jenis_kelamin'],
-                        "tanggal_pengukuran": str(tanggal_pengukuran), "usia_bulan": int(usia_bulan),
+                        "id_anak": child_data['id_anak'],
+                        "tanggal_pengukuran": str(tanggal_pengukuran), "usia_bulan": int(usia_bulan), "usia_hari": int(usia_hari),
                         "berat_kg": berat_kg, "tinggi_cm": tinggi_cm, "lingkar_kepala_cm": lingkar_kepala_cm if lingkar_kepala_cm > 0 else None
                     }
-                    save_measurement(data_to_insert)
+                    save_measurement(data_to_insert, child_data.to_dict())
 
     elif input_type == 'Daftarkan Anak Baru':
         with st.form("new_child_form", clear_on_submit=True):
@@ -347,49 +718,68 @@ def page_input_data():
                     st.warning("Harap isi semua field wajib (ID, Nama, Tanggal Lahir, Berat, Tinggi).")
                 else:
                     usia_bulan = calculate_age_in_months(tanggal_lahir, tanggal_pengukuran)
+                    usia_hari = calculate_age_in_days(tanggal_lahir, tanggal_pengukuran)
+                    child = {"id_anak": id_anak, "nama_anak": nama_anak, "tanggal_lahir": str(tanggal_lahir),
+                             "jenis_kelamin": jenis_kelamin, "baru": True}
                     data_to_insert = {
-                        "id_anak": id_anak, "nama_anak": nama_anak, "tanggal_lahir": str(tanggal_lahir), 
-                        "jenis_kelamin": jenis_kelamin, "tanggal_pengukuran": str(tanggal_pengukuran), 
-                        "usia_bulan": int(usia_bulan), "berat_kg": berat_kg, "tinggi_cm": tinggi_cm, 
+                        "id_anak": id_anak, "tanggal_pengukuran": str(tanggal_pengukuran), 
+                        "usia_bulan": int(usia_bulan), "usia_hari": int(usia_hari), "berat_kg": berat_kg, "tinggi_cm": tinggi_cm, 
                         "lingkar_kepala_cm": lingkar_kepala_cm if lingkar_kepala_cm > 0 else None
                     }
-                    save_measurement(data_to_insert)
+                    save_measurement(data_to_insert, child)
 
 def page_view_history():
     """Halaman untuk melihat riwayat, mengelola data, dan melihat grafik."""
     st.header("📊 Riwayat & Analisis Pertumbuhan")
 
-    df_anak = get_child_list(supabase)
+    df_anak = load_children()
     if df_anak.empty:
         st.info("Belum ada data tersimpan. Silakan input data baru pada halaman 'Input Pengukuran'.")
         return
 
-    option_list = ["-"] + df_anak['display_name'].tolist()
-    selected_name = st.selectbox("Pilih Anak untuk Dilihat Riwayatnya:", option_list)
+    child_data = select_child(df_anak, "Pilih Anak untuk Dilihat Riwayatnya:", "history_child")
 
-    if selected_name and selected_name != "-":
-        selected_id = df_anak[df_anak['display_name'] == selected_name]['id_anak'].iloc[0]
+    if child_data is not None:
+        selected_id = child_data['id_anak']
         
         try:
-            response = supabase.table("data_pengukuran").select("*").eq("id_anak", selected_id).order("usia_bulan").execute()
-            if not response.data:
+            rows = get_child_history(selected_id)
+            if not rows:
                 st.warning("Tidak ada riwayat pengukuran untuk anak ini.")
                 return
 
-            history_df = pd.DataFrame(response.data)
-            history_df.fillna(0, inplace=True) # Ganti NaN/None dengan 0 untuk konsistensi
-            
+            # Array bertipe (float32/int32, NaN = tidak diukur) dipakai bersama oleh tabel dan kelima grafik
+            history_df = decode_history(rows, child_data['tanggal_lahir'])
+            # Identitas anak diambil dari daftar anak (tidak lagi diulang di setiap baris pengukuran)
+            for col in ('nama_anak', 'jenis_kelamin'):
+                history_df[col] = child_data[col]
+            # Z-score dan kategori dibaca dari kolom tersimpan; baris bercap lama dihitung ulang sekaligus
+            history_df = apply_current_scores(history_df)
+            # Pengukuran bertanda BIV (nilai tidak wajar) tetap tampil di tabel, tetapi tidak dipakai grafik/kenaikan berat
+            flagged = history_df[BIV_COLUMN].notna().to_numpy()
+            plausible_df = history_df[~flagged]
+            # Kenaikan berat antar kunjungan dan status N/T/2T (KMS) untuk seluruh riwayat sekaligus
+            history_df = history_df.join(compute_velocity(plausible_df)[['kenaikan_berat_g', 'kbm_g', 'status_berat']])
+
             st.subheader(f"Riwayat untuk: {history_df['nama_anak'].iloc[0]}")
-            cols_to_show = ['tanggal_pengukuran', 'usia_bulan', 'berat_kg', 'tinggi_cm', 'lingkar_kepala_cm']
-            st.dataframe(history_df[cols_to_show], use_container_width=True)
+            cols_to_show = ['tanggal_pengukuran', 'usia_bulan', 'berat_kg', 'tinggi_cm', 'lingkar_kepala_cm'] + BATCH_COLUMNS + [
+                'kenaikan_berat_g', 'kbm_g', 'status_berat', BIV_COLUMN]
+            st.dataframe(history_df[cols_to_show].round(dict.fromkeys(cols_to_show[1:-2], 2)), use_container_width=True,
+                         column_config={"tanggal_pengukuran": st.column_config.DateColumn(format="YYYY-MM-DD")})
+            if flagged.any():
+                st.warning(f"{int(flagged.sum())} pengukuran bernilai tidak wajar (BIV) tidak dipakai di grafik dan prevalensi. "
+                           "Revisi lewat Kelola Data di bawah:\n" + "\n".join(
+                               f"- {row['tanggal_pengukuran']:%d-%m-%Y}: {describe_biv(row)}"
+                               for row in history_df[flagged].to_dict('records')))
             
             # Tampilkan semua kurva
-            plot_all_curves(history_df)
+            renderer_label = st.radio("Mode grafik:", list(CHART_RENDERERS.keys()), horizontal=True)
+            plot_all_curves(plausible_df, CHART_RENDERERS[renderer_label])
 
             # Bagian Kelola Data
             st.divider()
             with st.expander("⚙️ Kelola Data Pengukuran (Revisi/Hapus)"):
-                history_df['display_entry'] = pd.to_datetime(history_df['tanggal_pengukuran']).dt.strftime('%d %B %Y') + " (Usia " + history_df['usia_bulan'].astype(str) + " bln)"
+                history_df['display_entry'] = history_df['tanggal_pengukuran'].dt.strftime('%d %B %Y') + " (Usia " + history_df['usia_bulan'].astype(str) + " bln)"
                 entry_to_manage = st.selectbox("Pilih data yang ingin dikelola:", history_df['display_entry'])
                 selected_entry = history_df[history_df['display_entry'] == entry_to_manage].iloc[0]
                 
@@ -398,11 +788,11 @@ def page_view_history():
                     st.write(f"Merevisi data tanggal **{selected_entry['display_entry']}**")
                     edit_berat = st.number_input("Berat (kg)", value=float(selected_entry['berat_kg']))
                     edit_tinggi = st.number_input("Tinggi (cm)", value=float(selected_entry['tinggi_cm']))
-                    edit_lk = st.number_input("Lingkar Kepala (cm)", value=float(selected_entry['lingkar_kepala_cm']))
+                    edit_lk = st.number_input("Lingkar Kepala (cm)", value=float(np.nan_to_num(selected_entry['lingkar_kepala_cm'])))
                     if st.form_submit_button("Simpan Perubahan"):
                         try:
                             update_data = {"berat_kg": edit_berat, "tinggi_cm": edit_tinggi, "lingkar_kepala_cm": edit_lk if edit_lk > 0 else None}
-                            supabase.table("data_pengukuran").update(update_data).eq("id", int(selected_entry['id'])).execute()
+                            update_measurement(selected_id, selected_entry.to_dict(), update_data)
                             st.success("Data berhasil diperbarui! Halaman akan dimuat ulang."); st.rerun()
                         except Exception as e: st.error(f"Gagal memperbarui: {e}")
 
@@ -410,13 +800,190 @@ def page_view_history():
                 if st.checkbox(f"Saya yakin ingin menghapus data **{selected_entry['display_entry']}**"):
                     if st.button("🗑️ Hapus Data Ini Secara Permanen", type="primary"):
                         try:
-                            supabase.table("data_pengukuran").delete().eq("id", int(selected_entry['id'])).execute()
+                            delete_measurement(selected_id, int(selected_entry['id']))
                             st.success("Data berhasil dihapus! Halaman akan dimuat ulang."); st.rerun()
                         except Exception as e: st.error(f"Gagal menghapus: {e}")
 
         except Exception as e:
             st.error(f"Gagal mengambil riwayat data: {e}")
 
+def page_bulk_import():
+    """Halaman untuk mengimpor banyak pengukuran sekaligus dari spreadsheet posyandu."""
+    st.header("📥 Impor Massal Pengukuran")
+    st.write("Unggah file .xlsx atau .csv dengan kolom `id_anak`, `tanggal_pengukuran`, `berat_kg`, `tinggi_cm`, "
+             "dan opsional `lingkar_kepala_cm`. Untuk anak yang belum terdaftar, sertakan juga "
+             "`nama_anak`, `tanggal_lahir`, dan `jenis_kelamin` (L/P).")
+
+    uploaded = st.file_uploader("File hasil posyandu", type=["xlsx", "csv"])
+    if uploaded is None:
+        return
+    imported = st.session_state.setdefault("imported_files", set()) # Unggahan yang sudah disimpan di sesi ini
+    if uploaded.file_id in imported:
+        st.info(f"File **{uploaded.name}** sudah disimpan. Hapus atau unggah file lain untuk impor berikutnya.")
+        return
+
+    try:
+        raw = read_sheet(uploaded, uploaded.name)
+        rows, new_children, errors = prepare_rows(raw, load_children())
+    except Exception as e:
+        st.error(f"Gagal membaca file: {e}")
+        return
+
+    st.info(f"{len(raw)} baris dibaca: **{len(rows)}** siap disimpan ({len(new_children)} anak baru), **{len(errors)}** ditolak.")
+    if not errors.empty:
+        st.subheader("Baris yang ditolak")
+        st.dataframe(errors, use_container_width=True, hide_index=True)
+    if rows.empty:
+        return
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+    implausible = rows[rows[BIV_COLUMN].notna()]
+    if not implausible.empty:
+        st.warning(f"{len(implausible)} baris bernilai tidak wajar (BIV). Baris ini tetap disimpan tetapi tidak dipakai "
+                   "di grafik dan prevalensi sampai direvisi; periksa kembali angkanya di file.")
+        st.dataframe(implausible[['baris', 'id_anak', 'tanggal_pengukuran', 'berat_kg', 'tinggi_cm', 'lingkar_kepala_cm', BIV_COLUMN]],
+                     use_container_width=True, hide_index=True)
+
+    if st.button(f"Simpan {len(rows)} Pengukuran", type="primary"):
+        if offline_store is not None:
+            try:
+                offline_store.insert_many(rows.to_dict('records'), new_children)
+            except (ValueError, sqlite3.Error) as e: # Satu transaksi lokal: tidak ada baris yang tersimpan
+                st.error(f"{len(rows)} baris gagal disimpan: {e}")
+                return
+            imported.add(uploaded.file_id)
+            st.success(f"{len(rows)} pengukuran dan {len(new_children)} anak baru tersimpan di perangkat dan akan disinkronkan.")
+            return
+        result = import_measurements(repository, rows, new_children)
+        imported.add(uploaded.file_id)
+        if result['new_children']:
+            get_child_list.clear()
+        cache = get_history_cache()
+        for id_anak in result['child_ids']:
+            cache.pop(id_anak, None) # Riwayat anak yang terdampak diambil ulang saat dibuka
+        st.success(f"{result['inserted']} pengukuran dan {result['new_children']} anak baru berhasil disimpan.")
+        if not result['errors'].empty:
+            st.error(f"{len(result['errors'])} baris gagal disimpan:")
+            st.dataframe(result['errors'], use_container_width=True, hide_index=True)
+
+# --- Dashboard prevalensi posyandu ---
+PREVALENCE_REFRESH_SECONDS = 60 # Cek perubahan (revisi per anak) paling sering sekali per menit
+
+@st.cache_resource
+def get_prevalence_cache(_repository: Repository) -> PrevalenceCache:
+    """Pengukuran terakhir per anak + klasifikasinya, dipakai bersama oleh semua sesi."""
+    return PrevalenceCache(_repository)
+
+def format_prevalence(table: pd.DataFrame) -> pd.DataFrame:
+    """Tabel tampilan: jumlah balita dan prevalensi (%) setiap indikator."""
+    table = table[['anak'] + list(PREVALENCE_INDICATORS)].rename(columns={'anak': 'Jumlah balita'})
+    return table.rename(index={'L': 'Laki-laki', 'P': 'Perempuan'})
+
+def page_prevalence():
+    """Halaman dashboard prevalensi status gizi seluruh posyandu (pengukuran terakhir per anak)."""
+    st.header("📋 Prevalensi Status Gizi Posyandu")
+    cache = get_prevalence_cache(repository)
+    refresh = st.button("🔄 Perbarui Data")
+    if refresh or cache.refreshed_at is None or time.time() - cache.refreshed_at >= PREVALENCE_REFRESH_SECONDS:
+        try:
+            cache.refresh()
+        except Exception as e:
+            st.error(f"Gagal memperbarui data prevalensi: {e}")
+            if cache.refreshed_at is None:
+                return
+
+    months = st.slider("Hanya anak yang pengukuran terakhirnya dalam (bulan):", 1, 24, 12)
+    classified = cache.snapshot(since=pd.Timestamp(date.today()) - pd.DateOffset(months=months))
+    overall = prevalence_table(classified).iloc[0]
+    if overall['anak'] == 0:
+        st.info("Belum ada balita dengan pengukuran pada periode ini.")
+        return
+
+    for column, name in zip(st.columns(len(PREVALENCE_INDICATORS)), PREVALENCE_INDICATORS):
+        column.metric(name, "-" if pd.isna(overall[name]) else f"{overall[name]:.1f}%",
+                      help=f"{int(overall[f'{name}_kasus'])} dari {int(overall[f'{name}_diukur'])} balita terukur")
+    st.caption(f"{int(overall['anak'])} balita (0-59 bulan) dari pengukuran terakhir masing-masing. "
+               f"Data diperbarui {datetime.fromtimestamp(cache.refreshed_at).strftime('%d %B %Y %H:%M')}.")
+
+    st.subheader("Menurut Jenis Kelamin")
+    st.dataframe(format_prevalence(prevalence_table(classified, ['jenis_kelamin'])), use_container_width=True)
+    st.subheader("Menurut Kelompok Umur")
+    st.dataframe(format_prevalence(prevalence_table(classified, ['kelompok_umur'])), use_container_width=True)
+    with st.expander("Jenis kelamin × kelompok umur"):
+        st.dataframe(format_prevalence(prevalence_table(classified, ['jenis_kelamin', 'kelompok_umur'])), use_container_width=True)
+
+    st.subheader("Anak Tidak Naik Berat Badan (T/2T)")
+    since = (pd.Timestamp(date.today()) - pd.DateOffset(months=VELOCITY_WINDOW_MONTHS)).strftime('%Y-%m-%d')
+    try:
+        recent = get_recent_measurements(repository, since)
+    except Exception as e:
+        st.error(f"Gagal mengambil pengukuran terbaru: {e}")
+        return
+    flagged = not_gaining(recent)
+    if flagged.empty:
+        st.success(f"Tidak ada anak berstatus T/2T dalam {VELOCITY_WINDOW_MONTHS} bulan terakhir.")
+        return
+    st.caption(f"{len(flagged)} anak yang penimbangan terakhirnya (sejak {since}) tidak mencapai Kenaikan Berat Minimal.")
+    st.dataframe(flagged[['id_anak', 'nama_anak', 'tanggal_pengukuran', 'berat_kg', 'kenaikan_berat_g', 'kbm_g', 'status_berat']]
+                 .assign(status_berat=flagged['status_berat'].map(STATUS_LABELS))
+                 .round({'kenaikan_berat_g': 0, 'kbm_g': 0}), use_container_width=True, hide_index=True)
+
+VELOCITY_WINDOW_MONTHS = 4 # Cukup untuk dua interval penimbangan terakhir (penilaian 2T)
+
+@st.cache_data(ttl=PREVALENCE_REFRESH_SECONDS)
+def get_recent_measurements(_repository: Repository, since: str) -> pd.DataFrame:
+    """Pengukuran semua anak sejak `since` dalam satu DataFrame, untuk penilaian N/T/2T sekaligus."""
+    return pd.DataFrame(_repository.measurements_since(since), columns=VELOCITY_FIELDS)
+
+@st.cache_data(ttl=PREVALENCE_REFRESH_SECONDS)
+def get_monthly_counts(_repository: Repository, since: str) -> list:
+    """Baris penghitung prevalensi_bulanan sejak bulan `since` (ukurannya tidak bergantung pada jumlah pengukuran)."""
+    return _repository.monthly_counts(since)
+
+def page_prevalence_trend():
+    """Halaman tren prevalensi bulanan dari penghitung yang dijaga trigger database."""
+    st.header("📈 Tren Prevalensi Bulanan")
+    years = st.slider("Rentang (tahun terakhir):", 1, 10, 3)
+    since = (pd.Timestamp(date.today()).replace(day=1) - pd.DateOffset(years=years)).strftime('%Y-%m-01')
+    indicators = st.multiselect("Indikator:", list(PREVALENCE_INDICATORS), default=["Stunting", "Wasting"])
+    by_sex = st.toggle("Pisahkan menurut jenis kelamin")
+    try:
+        counts = get_monthly_counts(repository, since)
+    except Exception as e:
+        st.error(f"Gagal mengambil data tren: {e}")
+        return
+    if not counts or not indicators:
+        st.info("Belum ada pengukuran pada rentang ini." if not counts else "Pilih minimal satu indikator.")
+        return
+
+    trend = monthly_prevalence(counts, ['jenis_kelamin'] if by_sex else None)
+    chart = trend[indicators]
+    if by_sex:
+        chart = chart.unstack('jenis_kelamin').rename(columns={'L': 'Laki-laki', 'P': 'Perempuan'})
+        chart.columns = [f"{name} - {sex}" for name, sex in chart.columns]
+    st.line_chart(chart, y_label="Prevalensi (%)")
+    st.caption("Persentase pengukuran balita (0-59 bulan) per bulan; anak yang diukur dua kali dalam sebulan terhitung dua kali.")
+    with st.expander("Tabel penghitung"):
+        columns = [col for name in indicators for col in (name, f"{name}_kasus", f"{name}_diukur")]
+        st.dataframe(trend[columns], use_container_width=True)
+
+def show_sync_status():
+    """Status sinkronisasi penyimpanan lokal dan penyelesaian konflik di sidebar."""
+    status = offline_store.status()
+    koneksi = {True: "🟢 Online", False: "🔴 Offline", None: "⚪ Belum tersambung"}[status['online']]
+    st.sidebar.caption(f"{koneksi} · {status['pending']} perubahan menunggu sinkronisasi")
+    if st.sidebar.button("🔄 Sinkronkan Sekarang"):
+        offline_store.wake()
+
+    if status['conflicts']:
+        with st.sidebar.expander(f"⚠️ {status['conflicts']} konflik sinkronisasi"):
+            for conflict in offline_store.conflicts().itertuples():
+                st.write(f"**{conflict.id_anak}** ({conflict.op}, {conflict.created_at}): {conflict.error}")
+                col_local, col_server = st.columns(2)
+                if col_local.button("Pakai data lokal", key=f"keep_{conflict.seq}"):
+                    offline_store.resolve_conflict(conflict.seq, keep_local=True); st.rerun()
+                if col_server.button("Pakai data server", key=f"drop_{conflict.seq}"):
+                    offline_store.resolve_conflict(conflict.seq, keep_local=False); st.rerun()
+
 # ==============================================================================
 # STRUKTUR UTAMA APLIKASI STREAMLIT
 # ==============================================================================
@@ -426,17 +993,24 @@ def main():
     st.title("👶 Aplikasi Monitor Pertumbuhan Anak")
     st.write("Berdasarkan Standar Antropometri WHO 2005")
 
-    global supabase
-    supabase = init_connection()
+    # Buka artefak referensi WHO (memory-map; tanpa artefak hasil build, dikompilasi di memori)
+    open_store()
 
-    if not supabase:
+    global repository, offline_store
+    repository = init_repository()
+    offline_store = get_offline_store(repository)
+
+    if not repository:
         st.error("Koneksi ke database gagal. Aplikasi tidak dapat berjalan.")
         st.info("Pastikan Anda sudah mengatur SUPABASE_URL dan SUPABASE_KEY di Streamlit Secrets.")
         return
     
     pages = {
         "Input Pengukuran": page_input_data,
-        "Lihat Riwayat & Analisis": page_view_history
+        "Impor Massal": page_bulk_import,
+        "Lihat Riwayat & Analisis": page_view_history,
+        "Prevalensi Posyandu": page_prevalence,
+        "Tren Bulanan": page_prevalence_trend,
     }
     
     st.sidebar.title("Navigasi")
@@ -445,6 +1019,9 @@ def main():
     # Jalankan fungsi halaman yang dipilih
     page_function = pages[selection]
     page_function()
+
+    if offline_store is not None:
+        show_sync_status()
     
     st.sidebar.info("Dibuat dengan Streamlit & Supabase")
 
@@ -0,0 +1,101 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+# ==============================================================================
+# CACHE GAMBAR GRAFIK (PNG) BERDASARKAN HASH ISI
+# ==============================================================================
+
+# Gambar grafik disimpan dengan kunci hash dari semua hal yang memengaruhi tampilannya
+# (jenis grafik, jenis kelamin, baris riwayat, versi gaya). Tingkat pertama adalah LRU di
+# memori; entri yang tergusur ditumpahkan ke disk (chart_cache/) dan dibaca lagi saat perlu.
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chart_cache")
+
+
+def content_hash(*parts: Any) -> str:
+    """Hash SHA-1 stabil dari bagian-bagian kunci (harus bisa diserialisasi JSON)."""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+class ChartImageCache:
+    """LRU thread-safe untuk bytes PNG dengan tingkat cadangan di disk."""
+
+    def __init__(self, max_items: int = 256, disk_dir: Optional[str] = CACHE_DIR, max_disk_files: int = 5000):
+        self.max_items = max_items
+        self.disk_dir = disk_dir
+        self.max_disk_files = max_disk_files
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._spill_count = 0
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.png")
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Mengambil PNG dari memori, lalu dari disk; None jika tidak ada."""
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                return data
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    data = f.read()
+            except OSError:
+                return None
+            self.put(key, data, spill=False)
+        return data
+
+    def put(self, key: str, data: bytes, spill: bool = True) -> None:
+        """Menyimpan PNG di memori; entri tertua yang tergusur ditulis ke disk."""
+        evicted = []
+        with self._lock:
+            self._items[key] = data
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                evicted.append(self._items.popitem(last=False))
+        if spill and self.disk_dir:
+            for old_key, old_data in evicted:
+                self._spill(old_key, old_data)
+
+    def _spill(self, key: str, data: bytes) -> None:
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._spill_count += 1
+            if self._spill_count % 100 == 0: # Pemangkasan disk cukup sesekali
+                self._trim_disk()
+        except OSError:
+            pass # Cache disk bersifat opsional; kegagalan menulis tidak boleh menggagalkan render
+
+    def _trim_disk(self) -> None:
+        files = glob.glob(os.path.join(self.disk_dir, "*", "*.png"))
+        if len(files) <= self.max_disk_files:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_disk_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> bytes:
+        """Mengembalikan PNG dari cache, atau memanggil `render` sekali dan menyimpannya."""
+        data = self.get(key)
+        if data is None:
+            data = render()
+            self.put(key, data)
+        return data
@@ -0,0 +1,65 @@
+import unicodedata
+from bisect import bisect_left
+from typing import Iterable, List
+
+# ==============================================================================
+# INDEKS PENCARIAN ANAK (PREFIKS NAMA DAN ID)
+# ==============================================================================
+
+# Pemilih anak tidak lagi mengirim seluruh daftar anak ke browser. Daftar anak diindeks sekali
+# di memori sebagai beberapa daftar kunci terurut; setiap pencarian cukup bisect ke awal rentang
+# prefiks lalu mengambil paling banyak `limit` hasil, sehingga biayanya tidak bergantung pada
+# jumlah anak. Urutan prioritas hasil: ID, awal nama lengkap, lalu awal kata lain di nama.
+
+SEARCH_LIMIT = 20
+
+
+def normalize_key(text: str) -> str:
+    """Huruf kecil tanpa diakritik dan spasi berlebih ("  Ásih  Putri" -> "asih putri")."""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+class ChildIndex:
+    """Indeks prefiks terurut atas id_anak dan nama_anak; hasil berupa posisi baris di daftar asal."""
+
+    def __init__(self, ids: Iterable[str], names: Iterable[str]):
+        id_keys, name_keys, word_keys = [], [], []
+        for pos, (id_anak, nama) in enumerate(zip(ids, names)):
+            nama = normalize_key(nama)
+            id_keys.append((normalize_key(id_anak), pos))
+            name_keys.append((nama, pos))
+            word_keys.extend((nama[start:], pos) for start in self._word_starts(nama))
+        # Tiap tingkat disimpan sebagai dua daftar sejajar: kunci terurut dan posisi barisnya
+        self._levels = []
+        for keys in (id_keys, name_keys, word_keys):
+            keys.sort()
+            self._levels.append(([key for key, _ in keys], [pos for _, pos in keys]))
+        self.size = len(id_keys)
+
+    @staticmethod
+    def _word_starts(nama: str) -> List[int]:
+        """Posisi awal kata ke-2 dst. (kata pertama sudah tercakup oleh kunci nama lengkap)."""
+        return [i + 1 for i, ch in enumerate(nama) if ch == " "]
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> List[int]:
+        """Posisi baris (maks. `limit`, tanpa duplikat) yang ID, nama, atau salah satu katanya berawalan `query`."""
+        prefix = normalize_key(query)
+        if not prefix:
+            return []
+        found, seen = [], set()
+        for keys, positions in self._levels:
+            i = bisect_left(keys, prefix)
+            while i < len(keys) and keys[i].startswith(prefix):
+                if positions[i] not in seen:
+                    seen.add(positions[i])
+                    found.append(positions[i])
+                    if len(found) >= limit:
+                        return found
+                i += 1
+        return found
+
+    def __len__(self) -> int:
+        return self.size
+
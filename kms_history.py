@@ -0,0 +1,63 @@
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from kms_repository import HISTORY_FIELDS
+from kms_zscore import BATCH_COLUMNS, BIV_COLUMN, CATEGORY_COLUMNS, DAYS_PER_MONTH, age_days_column
+
+# ==============================================================================
+# DEKODE RIWAYAT PENGUKURAN KE ARRAY BERTIPE
+# ==============================================================================
+
+# Riwayat diambil hanya dengan kolom HISTORY_FIELDS lalu didekode langsung dari baris JSON ke
+# array bertipe: nilai ukur dan z-score sebagai float32 (NaN = tidak diukur, tidak diisi 0),
+# umur sebagai int32, id sebagai int64, tanggal sebagai datetime64. Kolom bilangan bulat yang
+# masih kosong setelah dilengkapi memakai IntegerArray pandas (nilai + mask null).
+# DataFrame hasilnya dipakai bersama oleh tabel, analisis, dan kelima grafik tanpa konversi ulang.
+
+FLOAT_FIELDS = ['berat_kg', 'tinggi_cm', 'lingkar_kepala_cm'] + BATCH_COLUMNS
+INT_FIELDS = {'id': np.int64, 'usia_bulan': np.int32, 'usia_hari': np.int32}
+TEXT_FIELDS = CATEGORY_COLUMNS + [BIV_COLUMN, 'referensi_versi']
+
+
+def _integer_column(values: List, dtype: type) -> pd.api.extensions.ExtensionArray:
+    """Array bilangan bulat dengan mask null eksplisit (baris lama tanpa nilai)."""
+    mask = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+    data = np.fromiter((0 if v is None else v for v in values), dtype=dtype, count=len(values))
+    return pd.arrays.IntegerArray(data, mask)
+
+
+def _compact(column: pd.api.extensions.ExtensionArray) -> object:
+    """IntegerArray tanpa null diubah ke array numpy biasa (tanpa mask) agar operasi NumPy tetap cepat."""
+    return column.to_numpy() if not column.isna().any() else column
+
+
+def decode_history(rows: List[Dict], tanggal_lahir: str) -> pd.DataFrame:
+    """
+    Mendekode baris riwayat (urut tanggal) satu anak menjadi DataFrame bertipe.
+    Umur yang kosong di baris lama dilengkapi dari tanggal (presisi hari) dan usia_hari.
+    Kolom bmi (float32, NaN jika tinggi tidak valid) ikut dihitung sekali untuk semua grafik.
+    """
+    columns = {field: [row.get(field) for row in rows] for field in HISTORY_FIELDS}
+    df = pd.DataFrame({
+        **{field: _integer_column(columns[field], dtype) for field, dtype in INT_FIELDS.items()},
+        'tanggal_pengukuran': pd.to_datetime(pd.Series(columns['tanggal_pengukuran'], dtype=object), errors='coerce'),
+        **{field: np.array(columns[field], dtype=np.float64).astype(np.float32) for field in FLOAT_FIELDS},
+        **{field: np.array(columns[field], dtype=object) for field in TEXT_FIELDS},
+    })
+    df['tanggal_lahir'] = tanggal_lahir
+
+    usia_hari = age_days_column(df)
+    df['usia_hari'] = _compact(_integer_column([None if np.isnan(v) else int(v) for v in usia_hari], np.int32))
+    missing_bulan = df['usia_bulan'].isna().to_numpy()
+    if missing_bulan.any():
+        bulan = np.floor(usia_hari / DAYS_PER_MONTH)
+        df['usia_bulan'] = df['usia_bulan'].mask(missing_bulan, pd.array(bulan, dtype="Int32"))
+    df['usia_bulan'] = _compact(df['usia_bulan'].array)
+    df['id'] = _compact(df['id'].array)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tinggi_m = df['tinggi_cm'].to_numpy() / np.float32(100)
+        df['bmi'] = np.where(tinggi_m > 0, df['berat_kg'].to_numpy() / (tinggi_m * tinggi_m), np.nan).astype(np.float32)
+    return df
@@ -0,0 +1,274 @@
+import argparse
+import csv
+import io
+import os
+import re
+import sys
+from datetime import date
+from typing import Any, BinaryIO, Callable, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from kms_repository import Repository, create_repository
+from kms_zscore import SCORE_COLUMNS, calculate_age_days, calculate_scores_batch
+
+# ==============================================================================
+# IMPOR MASSAL PENGUKURAN DARI SPREADSHEET POSYANDU (XLSX/CSV)
+# ==============================================================================
+
+# Satu file hasil hari posyandu (100-300 baris) dibaca secara streaming (openpyxl read-only),
+# divalidasi dan dihitung umurnya sekaligus untuk seluruh kolom, lalu disimpan dengan
+# insert per potongan (chunk). Baris yang salah dilaporkan per nomor baris tanpa
+# menggagalkan baris lain.
+#
+# Pemakaian CLI:  python kms_import.py hasil_posyandu.xlsx [--dry-run] [--chunk-size 100]
+# (backend dipilih lewat KMS_BACKEND/KMS_SQLITE_DB, lihat kms_repository.py)
+# Dipakai juga oleh halaman "Impor Massal" di kms_app.py.
+
+CHUNK_SIZE = 100
+
+# Header spreadsheet dinormalisasi (huruf kecil, non-alfanumerik -> '_') lalu dipetakan ke kolom baku.
+COLUMN_ALIASES = {
+    "id_anak": "id_anak", "id": "id_anak", "nik": "id_anak", "no_kms": "id_anak",
+    "nama_anak": "nama_anak", "nama": "nama_anak",
+    "tanggal_lahir": "tanggal_lahir", "tgl_lahir": "tanggal_lahir",
+    "jenis_kelamin": "jenis_kelamin", "jk": "jenis_kelamin", "l_p": "jenis_kelamin",
+    "tanggal_pengukuran": "tanggal_pengukuran", "tanggal": "tanggal_pengukuran", "tgl_ukur": "tanggal_pengukuran",
+    "berat_kg": "berat_kg", "berat": "berat_kg", "bb": "berat_kg", "berat_badan_kg": "berat_kg",
+    "tinggi_cm": "tinggi_cm", "tinggi": "tinggi_cm", "tb": "tinggi_cm", "pb": "tinggi_cm", "tinggi_badan_cm": "tinggi_cm",
+    "lingkar_kepala_cm": "lingkar_kepala_cm", "lingkar_kepala": "lingkar_kepala_cm", "lk": "lingkar_kepala_cm",
+}
+REQUIRED_COLS = ['id_anak', 'tanggal_pengukuran', 'berat_kg', 'tinggi_cm']
+IDENTITY_COLS = ['nama_anak', 'tanggal_lahir', 'jenis_kelamin']
+MEASUREMENT_COLS = ['id_anak', 'tanggal_pengukuran', 'usia_bulan', 'usia_hari', 'berat_kg', 'tinggi_cm', 'lingkar_kepala_cm'] + SCORE_COLUMNS
+
+# Batas isian yang sama dengan form input satu per satu (min_value) ditambah batas atas wajar.
+VALUE_RANGES = {
+    'berat_kg': (1.0, 60.0),
+    'tinggi_cm': (20.0, 150.0),
+    'lingkar_kepala_cm': (10.0, 70.0),
+}
+
+
+def normalize_header(name: Any) -> str:
+    """'Berat (kg)' -> 'berat_kg'; header yang tidak dikenal dikembalikan apa adanya (dinormalisasi)."""
+    key = re.sub(r"[^0-9a-z]+", "_", str(name or "").strip().lower()).strip("_")
+    return COLUMN_ALIASES.get(key, key)
+
+
+def read_sheet(source: Union[str, BinaryIO], file_name: str = None) -> pd.DataFrame:
+    """
+    Membaca lembar pertama xlsx (openpyxl read_only, baris demi baris) atau file CSV.
+    Kolom 'baris' berisi nomor baris di spreadsheet (header = baris 1) untuk laporan error.
+    """
+    file_name = file_name or getattr(source, "name", None) or str(source)
+    workbook = None
+    if file_name.lower().endswith(".csv"):
+        raw = source.read() if hasattr(source, "read") else open(source, "rb").read()
+        rows = csv.reader(io.StringIO(raw.decode("utf-8-sig")), delimiter=_sniff_delimiter(raw))
+    else:
+        workbook = load_workbook(source, read_only=True, data_only=True)
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+
+    header = [normalize_header(col) for col in next(rows, [])]
+    records, numbers = [], []
+    for number, row in enumerate(rows, start=2):
+        if all(value is None or str(value).strip() == "" for value in row):
+            continue # Baris kosong di akhir lembar
+        records.append(tuple(row[:len(header)]) + (None,) * (len(header) - len(row)))
+        numbers.append(number)
+    if workbook is not None:
+        workbook.close() # Mode read_only menahan file terbuka sampai ditutup
+
+    df = pd.DataFrame.from_records(records, columns=header) if records else pd.DataFrame(columns=header)
+    df.insert(0, 'baris', numbers)
+    return df
+
+
+def _sniff_delimiter(raw: bytes) -> str:
+    """Spreadsheet berbahasa Indonesia sering diekspor dengan ';' sebagai pemisah."""
+    first_line = raw.split(b"\n", 1)[0]
+    return ";" if first_line.count(b";") > first_line.count(b",") else ","
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """Tanggal dari xlsx (datetime) atau teks ('2024-05-17', '17/05/2024'); tidak valid -> NaT."""
+    text = values.astype("string").str.strip()
+    iso = pd.to_datetime(text, format="ISO8601", errors='coerce')
+    local = pd.to_datetime(text, format="%d/%m/%Y", errors='coerce')
+    return iso.fillna(local).dt.normalize()
+
+
+def calculate_age_months(tanggal_lahir: pd.Series, tanggal_pengukuran: pd.Series) -> np.ndarray:
+    """Versi vektor dari calculate_age_in_months di kms_app (selisih bulan kalender)."""
+    return ((tanggal_pengukuran.dt.year - tanggal_lahir.dt.year) * 12
+            + (tanggal_pengukuran.dt.month - tanggal_lahir.dt.month)).to_numpy(dtype=float)
+
+
+def prepare_rows(raw: pd.DataFrame, children: pd.DataFrame) -> Tuple[pd.DataFrame, List[Dict], pd.DataFrame]:
+    """
+    Memvalidasi seluruh baris sekaligus dan menghitung usia_bulan/usia_hari serta skor (SCORE_COLUMNS).
+    `children` adalah indeks anak yang sudah terdaftar (id_anak, tanggal_lahir, jenis_kelamin).
+    Mengembalikan (baris pengukuran siap insert, identitas anak baru, daftar error per baris).
+    """
+    missing = [col for col in REQUIRED_COLS if col not in raw.columns]
+    if missing:
+        raise ValueError(f"Kolom wajib tidak ditemukan: {', '.join(missing)}")
+
+    df = raw.copy()
+    for col in IDENTITY_COLS + ['lingkar_kepala_cm']:
+        if col not in df.columns:
+            df[col] = None
+    df['id_anak'] = df['id_anak'].astype("string").str.strip().str.replace(r"\.0$", "", regex=True)
+    df['jenis_kelamin'] = df['jenis_kelamin'].astype("string").str.strip().str.upper().str[:1]
+    df['tanggal_pengukuran'] = parse_dates(df['tanggal_pengukuran'])
+    df['tanggal_lahir_file'] = parse_dates(df['tanggal_lahir'])
+    for col in VALUE_RANGES:
+        df[col] = pd.to_numeric(df[col].astype("string").str.replace(",", ".", regex=False), errors='coerce')
+
+    # Identitas dari indeks anak didahulukan; identitas di file hanya dipakai untuk anak baru.
+    known = children.set_index('id_anak') if not children.empty else pd.DataFrame(columns=['tanggal_lahir', 'jenis_kelamin'])
+    is_known = df['id_anak'].isin(known.index)
+    known_birth = pd.to_datetime(df['id_anak'].map(known['tanggal_lahir']), errors='coerce')
+    df['tanggal_lahir'] = known_birth.where(is_known, df['tanggal_lahir_file'])
+    df['jenis_kelamin'] = df['id_anak'].map(known['jenis_kelamin']).where(is_known, df['jenis_kelamin'])
+
+    df['usia_hari'] = calculate_age_days(df['tanggal_lahir'], df['tanggal_pengukuran'])
+    df['usia_bulan'] = calculate_age_months(df['tanggal_lahir'], df['tanggal_pengukuran'])
+
+    today = pd.Timestamp(date.today())
+    checks = [
+        (df['id_anak'].isna() | (df['id_anak'] == ""), "ID anak kosong"),
+        (~is_known & (df['nama_anak'].isna() | df['tanggal_lahir'].isna() | ~df['jenis_kelamin'].isin(['L', 'P'])),
+         "Anak belum terdaftar: isi nama_anak, tanggal_lahir, dan jenis_kelamin (L/P)"),
+        (df['tanggal_pengukuran'].isna(), "Tanggal pengukuran tidak valid"),
+        (df['tanggal_pengukuran'] > today, "Tanggal pengukuran di masa depan"),
+        (df['usia_hari'] < 0, "Tanggal pengukuran sebelum tanggal lahir"),
+        (df.duplicated(['id_anak', 'tanggal_pengukuran']) & df['tanggal_pengukuran'].notna(),
+         "Duplikat: anak dan tanggal pengukuran yang sama sudah ada di baris sebelumnya"),
+    ]
+    for col, (low, high) in VALUE_RANGES.items():
+        optional = col == 'lingkar_kepala_cm'
+        value = df[col]
+        in_range = value.between(low, high).fillna(False).astype(bool) # Kosong/bukan angka -> <NA> -> di luar batas
+        invalid = ~in_range & (value.notna() if optional else True)
+        checks.append((invalid, f"{col} harus di antara {low:g} dan {high:g}"))
+
+    messages = pd.Series("", index=df.index)
+    for mask, message in checks:
+        mask = mask.fillna(False).astype(bool)
+        messages = messages.where(~mask, messages + np.where(messages == "", "", "; ") + message)
+    bad = messages != ""
+
+    errors = pd.DataFrame({'baris': df.loc[bad, 'baris'], 'id_anak': df.loc[bad, 'id_anak'], 'pesan': messages[bad]})
+    valid = df[~bad]
+
+    new_children = (valid[~is_known[~bad]].drop_duplicates('id_anak')
+                    .assign(tanggal_lahir=lambda d: d['tanggal_lahir'].dt.strftime('%Y-%m-%d')))
+    new_children = new_children[['id_anak'] + IDENTITY_COLS].to_dict('records')
+
+    valid = valid.join(calculate_scores_batch(valid))
+    rows = valid[['baris'] + MEASUREMENT_COLS].copy()
+    rows['tanggal_pengukuran'] = rows['tanggal_pengukuran'].dt.strftime('%Y-%m-%d')
+    rows['usia_bulan'] = rows['usia_bulan'].astype(int)
+    rows['usia_hari'] = rows['usia_hari'].astype(int)
+    for col in ['lingkar_kepala_cm'] + SCORE_COLUMNS:
+        rows[col] = rows[col].astype(object).where(rows[col].notna(), None)
+    return rows.reset_index(drop=True), new_children, errors.reset_index(drop=True)
+
+
+def insert_in_chunks(insert: Callable[[List[Dict]], List[Dict]], records: List[Dict], chunk_size: int = CHUNK_SIZE) -> List[Tuple[int, str]]:
+    """
+    Insert per potongan `chunk_size` baris (satu request per potongan).
+    Jika satu potongan ditolak, baris di dalamnya dicoba satu per satu agar hanya baris yang
+    benar-benar bermasalah yang gagal. Mengembalikan [(posisi di `records`, pesan error)].
+    """
+    failures = []
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        try:
+            insert(chunk)
+        except Exception:
+            for offset, record in enumerate(chunk):
+                try:
+                    insert([record])
+                except Exception as e:
+                    failures.append((start + offset, str(e)))
+    return failures
+
+
+def find_existing(repository: Repository, rows: pd.DataFrame, chunk_size: int = CHUNK_SIZE) -> pd.Series:
+    """Penanda baris `rows` yang pasangan (id_anak, tanggal_pengukuran)-nya sudah ada di database."""
+    dates = sorted(rows['tanggal_pengukuran'].unique())
+    ids = sorted(rows['id_anak'].unique())
+    existing = set()
+    for start in range(0, len(ids), chunk_size): # Dipotong agar daftar id di satu request tidak terlalu panjang
+        found = repository.find_measurements(ids[start:start + chunk_size], dates)
+        existing.update((row['id_anak'], str(row['tanggal_pengukuran'])[:10]) for row in found)
+    keys = pd.Series(list(zip(rows['id_anak'], rows['tanggal_pengukuran'])), index=rows.index, dtype=object)
+    return keys.isin(existing)
+
+
+def import_measurements(repository: Repository, rows: pd.DataFrame, new_children: List[Dict], chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Menyimpan anak baru lalu pengukuran hasil prepare_rows.
+    Baris yang pengukurannya (anak + tanggal) sudah ada di database tidak disimpan ulang dan dilaporkan sebagai error,
+    sehingga file yang sama aman diimpor dua kali.
+    Mengembalikan ringkasan: jumlah baris tersimpan, id anak yang terdampak, dan error per baris.
+    """
+    errors = []
+    if not rows.empty:
+        duplicate = find_existing(repository, rows, chunk_size)
+        errors += [{'baris': b, 'id_anak': i, 'pesan': "Duplikat: pengukuran anak ini pada tanggal yang sama sudah tersimpan"}
+                   for b, i in zip(rows.loc[duplicate, 'baris'], rows.loc[duplicate, 'id_anak'])]
+        rows = rows[~duplicate]
+
+    failed_children = set()
+    for position, message in insert_in_chunks(repository.insert_children, new_children, chunk_size):
+        failed_children.add(new_children[position]['id_anak'])
+    if failed_children:
+        skipped = rows['id_anak'].isin(failed_children)
+        errors += [{'baris': b, 'id_anak': i, 'pesan': "Gagal mendaftarkan anak baru"}
+                   for b, i in zip(rows.loc[skipped, 'baris'], rows.loc[skipped, 'id_anak'])]
+        rows = rows[~skipped]
+
+    records = rows[MEASUREMENT_COLS].to_dict('records')
+    failures = insert_in_chunks(repository.insert_measurements, records, chunk_size)
+    errors += [{'baris': int(rows['baris'].iloc[pos]), 'id_anak': records[pos]['id_anak'], 'pesan': message}
+               for pos, message in failures]
+    failed_positions = {pos for pos, _ in failures}
+    saved_ids = {record['id_anak'] for pos, record in enumerate(records) if pos not in failed_positions}
+    return {
+        'inserted': len(records) - len(failures),
+        'new_children': len(new_children) - len(failed_children),
+        'child_ids': saved_ids,
+        'errors': pd.DataFrame(errors, columns=['baris', 'id_anak', 'pesan']),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Impor massal pengukuran posyandu dari file xlsx/CSV.")
+    parser.add_argument("file", help="File .xlsx atau .csv (baris pertama = header)")
+    parser.add_argument("--dry-run", action="store_true", help="Hanya validasi, tidak menulis ke database")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help=f"Jumlah baris per request insert (default {CHUNK_SIZE})")
+    args = parser.parse_args()
+
+    repository = create_repository()
+    raw = read_sheet(args.file, os.path.basename(args.file))
+    rows, new_children, errors = prepare_rows(raw, pd.DataFrame(repository.list_children(), columns=['id_anak', 'tanggal_lahir', 'jenis_kelamin']))
+    print(f"{len(raw)} baris dibaca: {len(rows)} valid, {len(errors)} ditolak, {len(new_children)} anak baru.")
+
+    if not args.dry_run and not rows.empty:
+        result = import_measurements(repository, rows, new_children, args.chunk_size)
+        errors = pd.concat([errors, result['errors']], ignore_index=True)
+        print(f"{result['inserted']} pengukuran dan {result['new_children']} anak baru tersimpan.")
+
+    for error in errors.sort_values('baris').itertuples():
+        print(f"Baris {error.baris} ({error.id_anak}): {error.pesan}")
+    return 1 if len(errors) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
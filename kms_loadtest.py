@@ -0,0 +1,186 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from kms_repository import DEFAULT_SQLITE_PATH, Repository, SQLiteRepository
+from kms_zscore import calculate_scores_batch, load_lms_table, lms_value, lookup_index, scores_to_records
+
+# ==============================================================================
+# UJI BEBAN DENGAN BACKEND SQLITE LOKAL
+# ==============================================================================
+
+# Mengukur throughput dan latensi tanpa layanan Supabase produksi:
+#   python kms_loadtest.py seed  --db load.db --children 5000 --per-child 24
+#   python kms_loadtest.py bench --db load.db --ops 5000 --threads 8
+#   python kms_loadtest.py app   --db load.db --views 30
+# `seed` membuat anak dan riwayat kunjungan bulanan yang realistis (nilai diambil dari kurva
+# LMS WHO dengan z-score per anak yang bergeser pelan). `bench` menjalankan campuran operasi
+# repository dari banyak thread. `app` menjalankan kms_app.py lewat Streamlit AppTest dengan
+# KMS_BACKEND=sqlite dan mengukur waktu satu rerun halaman riwayat (termasuk grafik).
+
+SEED_CHUNK = 500
+FIRST_NAMES = ["Adi", "Ayu", "Bagus", "Bunga", "Citra", "Dewi", "Eka", "Fajar", "Gita", "Hadi", "Indah",
+               "Joko", "Kartika", "Lestari", "Putri", "Rizky", "Sari", "Tegar", "Wulan", "Yoga"]
+LAST_NAMES = ["Pratama", "Saputra", "Wijaya", "Lestari", "Nugroho", "Hidayat", "Santoso", "Kusuma", "Purnama"]
+
+# Campuran operasi per sesi posyandu: kebanyakan membuka riwayat, sebagian kecil menulis.
+OPERATION_MIX = {"history": 0.60, "children": 0.15, "insert": 0.17, "update": 0.06, "delete": 0.02}
+
+
+def generate_children(count: int, rng: np.random.Generator, today: date) -> List[Dict]:
+    """Identitas anak acak dengan umur 0-5 tahun."""
+    ages = rng.integers(0, 5 * 365, count)
+    sexes = rng.choice(['L', 'P'], count)
+    return [{
+        'id_anak': f"LT{i:06d}",
+        'nama_anak': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        'tanggal_lahir': str(today - timedelta(days=int(age))),
+        'jenis_kelamin': str(sex),
+    } for i, (age, sex) in enumerate(zip(ages, sexes))]
+
+
+def generate_history(child: Dict, per_child: int, rng: np.random.Generator, today: date) -> List[Dict]:
+    """Kunjungan bulanan terakhir (maks. `per_child`) dengan BB/TB/LK mengikuti kurva WHO."""
+    lahir = date.fromisoformat(child['tanggal_lahir'])
+    umur_hari = (today - lahir).days
+    visits = min(per_child, umur_hari // 30 + 1)
+    usia_hari = np.sort(umur_hari - np.arange(visits) * 30 - rng.integers(0, 5, visits))
+    usia_hari = usia_hari[usia_hari >= 0]
+
+    values = {}
+    for col, indicator, base_sd in (('berat_kg', 'wfa', 1.0), ('tinggi_cm', 'lhfa', 1.0), ('lingkar_kepala_cm', 'hcfa', 0.8)):
+        table = load_lms_table(indicator, child['jenis_kelamin'])
+        idx, _ = lookup_index(table, usia_hari)
+        z = rng.normal(0, base_sd) + np.cumsum(rng.normal(0, 0.1, len(usia_hari))) # Posisi z per anak bergeser pelan
+        values[col] = np.round(lms_value(table['L'][idx], table['M'][idx], table['S'][idx], z), 1)
+
+    rows = []
+    for i, hari in enumerate(usia_hari):
+        tanggal = lahir + timedelta(days=int(hari))
+        rows.append({
+            'id_anak': child['id_anak'], 'tanggal_pengukuran': str(tanggal),
+            'usia_bulan': (tanggal.year - lahir.year) * 12 + (tanggal.month - lahir.month), 'usia_hari': int(hari),
+            'berat_kg': float(values['berat_kg'][i]), 'tinggi_cm': float(values['tinggi_cm'][i]),
+            'lingkar_kepala_cm': float(values['lingkar_kepala_cm'][i]),
+        })
+    return rows
+
+
+def seed(repository: Repository, children: int, per_child: int, random_seed: int) -> None:
+    rng = np.random.default_rng(random_seed)
+    today = date.today()
+    identities = generate_children(children, rng, today)
+    start = time.perf_counter()
+    for i in range(0, len(identities), SEED_CHUNK):
+        repository.insert_children(identities[i:i + SEED_CHUNK])
+    rows = [row for child in identities for row in generate_history(child, per_child, rng, today)]
+    sexes = {child['id_anak']: child['jenis_kelamin'] for child in identities}
+    scores = scores_to_records(calculate_scores_batch(pd.DataFrame(rows).assign(
+        jenis_kelamin=lambda d: d['id_anak'].map(sexes)))) # Skor saat tulis, seperti jalur simpan aplikasi
+    rows = [{**row, **score} for row, score in zip(rows, scores)]
+    for i in range(0, len(rows), SEED_CHUNK):
+        repository.insert_measurements(rows[i:i + SEED_CHUNK])
+    print(f"{len(identities)} anak, {len(rows)} pengukuran dibuat dalam {time.perf_counter() - start:.1f} detik.")
+
+
+def bench(repository: Repository, ops: int, threads: int, random_seed: int) -> None:
+    """Menjalankan `ops` operasi campuran dari `threads` thread dan mencetak latensi per jenis operasi."""
+    children = repository.list_children()
+    if not children:
+        sys.exit("Database kosong; jalankan 'seed' terlebih dahulu.")
+    ids = [child['id_anak'] for child in children]
+    rng = np.random.default_rng(random_seed)
+    names = list(OPERATION_MIX)
+    plan = rng.choice(names, ops, p=list(OPERATION_MIX.values()))
+    targets = rng.choice(ids, ops)
+    today = str(date.today())
+
+    def run(i: int):
+        name, id_anak = plan[i], str(targets[i])
+        start = time.perf_counter()
+        if name == "history":
+            repository.get_revision(id_anak)
+            repository.get_history(id_anak)
+        elif name == "children":
+            repository.list_children()
+        elif name == "insert":
+            repository.insert_measurements([{'id_anak': id_anak, 'tanggal_pengukuran': today, 'usia_bulan': 0,
+                                             'usia_hari': 0, 'berat_kg': 10.0, 'tinggi_cm': 80.0, 'lingkar_kepala_cm': None}])
+        else:
+            history = repository.get_history(id_anak)
+            if history:
+                row_id = history[-1]['id']
+                if name == "update":
+                    repository.update_measurement(row_id, {'berat_kg': history[-1]['berat_kg']})
+                else:
+                    repository.delete_measurements([row_id])
+        return name, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(run, range(ops)))
+    elapsed = time.perf_counter() - start
+
+    print(f"{ops} operasi, {threads} thread: {ops / elapsed:.0f} operasi/detik ({len(ids)} anak)")
+    print(f"{'operasi':10s} {'jumlah':>7s} {'p50 ms':>8s} {'p95 ms':>8s} {'maks ms':>8s}")
+    for name in names:
+        latencies = np.array([ms for op, ms in results if op == name])
+        if len(latencies):
+            print(f"{name:10s} {len(latencies):7d} {np.percentile(latencies, 50):8.2f} "
+                  f"{np.percentile(latencies, 95):8.2f} {latencies.max():8.2f}")
+
+
+def bench_app(db_path: str, views: int, random_seed: int) -> None:
+    """Mengukur waktu rerun halaman riwayat kms_app.py (data + z-score + grafik) dengan backend SQLite."""
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["KMS_BACKEND"], os.environ["KMS_SQLITE_DB"] = "sqlite", db_path
+    at = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), "kms_app.py"), default_timeout=300).run()
+    at.sidebar.radio[0].set_value("Lihat Riwayat & Analisis").run()
+    ids = [child['id_anak'] for child in SQLiteRepository(db_path).list_children()]
+    rng = np.random.default_rng(random_seed)
+
+    timings = []
+    for id_anak in rng.choice(ids, min(views, len(ids)), replace=False):
+        start = time.perf_counter()
+        at.text_input(key="history_child_query").input(str(id_anak)).run() # ID lengkap = satu hasil, langsung terpilih
+        timings.append((time.perf_counter() - start) * 1000)
+        if at.exception:
+            sys.exit(f"Aplikasi error: {at.exception[0].value}")
+    timings = np.array(timings)
+    print(f"{len(timings)} tampilan riwayat ({len(ids)} anak): p50 {np.percentile(timings, 50):.0f} ms, "
+          f"p95 {np.percentile(timings, 95):.0f} ms, maks {timings.max():.0f} ms")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Uji beban kms_app dengan backend SQLite lokal.")
+    parser.add_argument("command", choices=["seed", "bench", "app"])
+    parser.add_argument("--db", default=DEFAULT_SQLITE_PATH, help="File database SQLite")
+    parser.add_argument("--children", type=int, default=2000, help="seed: jumlah anak")
+    parser.add_argument("--per-child", type=int, default=24, help="seed: maksimum kunjungan per anak")
+    parser.add_argument("--ops", type=int, default=2000, help="bench: jumlah operasi")
+    parser.add_argument("--threads", type=int, default=8, help="bench: jumlah thread paralel")
+    parser.add_argument("--views", type=int, default=20, help="app: jumlah anak yang dibuka")
+    parser.add_argument("--seed", type=int, default=0, help="seed acak")
+    args = parser.parse_args()
+
+    if args.command == "app":
+        bench_app(args.db, args.views, args.seed)
+        return 0
+    repository = SQLiteRepository(args.db)
+    if args.command == "seed":
+        seed(repository, args.children, args.per_child, args.seed)
+    else:
+        bench(repository, args.ops, args.threads, args.seed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import argparse
+import sys
+from collections import defaultdict
+from typing import Dict, List
+
+from supabase import Client
+
+from kms_repository import connect
+
+# ==============================================================================
+# ALAT MIGRASI DATA KE SKEMA TERNORMALISASI (anak + data_pengukuran)
+# ==============================================================================
+
+# Urutan migrasi untuk data yang sudah berjalan:
+#   1. python kms_migrate.py check      -> laporkan id_anak dengan identitas bertentangan
+#   2. python kms_migrate.py backfill   -> isi/rapikan tabel `anak` dari baris pengukuran lama
+#   3. jalankan supabase/migrations/20261018000300_normalize_pengukuran.sql
+# Kredensial dibaca dari env SUPABASE_URL/SUPABASE_KEY atau .streamlit/secrets.toml.
+
+PAGE_SIZE = 1000
+UPSERT_CHUNK = 500
+IDENTITY_COLS = ['nama_anak', 'tanggal_lahir', 'jenis_kelamin']
+
+
+def fetch_legacy_rows(client: Client) -> List[Dict]:
+    """Membaca identitas dari setiap baris data_pengukuran lama, per halaman."""
+    rows, start = [], 0
+    while True:
+        response = (client.table("data_pengukuran")
+                    .select("id, id_anak, tanggal_pengukuran, " + ", ".join(IDENTITY_COLS))
+                    .order("id").range(start, start + PAGE_SIZE - 1).execute())
+        rows.extend(response.data)
+        if len(response.data) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
+
+
+def latest_identities(rows: List[Dict]) -> Dict[str, Dict]:
+    """Identitas per anak diambil dari pengukuran terbaru (tanggal, lalu id)."""
+    latest = {}
+    for row in sorted(rows, key=lambda r: (str(r['tanggal_pengukuran']), r['id'])):
+        latest[row['id_anak']] = {'id_anak': row['id_anak'], **{col: row[col] for col in IDENTITY_COLS}}
+    return latest
+
+
+def find_conflicts(rows: List[Dict]) -> Dict[str, set]:
+    """id_anak yang barisnya mencatat lebih dari satu identitas berbeda."""
+    identities = defaultdict(set)
+    for row in rows:
+        identities[row['id_anak']].add(tuple(row[col] for col in IDENTITY_COLS))
+    return {id_anak: found for id_anak, found in identities.items() if len(found) > 1}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Migrasi data_pengukuran ke skema anak + pengukuran.")
+    parser.add_argument("command", choices=["check", "backfill"])
+    parser.add_argument("--dry-run", action="store_true", help="backfill: tampilkan jumlah baris tanpa menulis")
+    args = parser.parse_args()
+
+    client = connect()
+    rows = fetch_legacy_rows(client)
+    print(f"{len(rows)} baris pengukuran lama dibaca.")
+
+    conflicts = find_conflicts(rows)
+    for id_anak, found in sorted(conflicts.items()):
+        print(f"KONFLIK {id_anak}: {sorted(found, key=str)}")
+    if args.command == "check":
+        print("Tidak ada konflik identitas." if not conflicts else f"{len(conflicts)} anak memiliki identitas bertentangan; "
+              "backfill akan memakai identitas dari pengukuran terbaru.")
+        return 1 if conflicts else 0
+
+    children = list(latest_identities(rows).values())
+    print(f"{len(children)} anak akan ditulis ke tabel `anak`.")
+    if args.dry_run:
+        return 0
+    for start in range(0, len(children), UPSERT_CHUNK):
+        client.table("anak").upsert(children[start:start + UPSERT_CHUNK]).execute()
+    print("Backfill selesai. Lanjutkan dengan menjalankan migrasi SQL normalisasi.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,482 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from kms_repository import CHILD_FIELDS, HISTORY_FIELDS, MEASUREMENT_FIELDS, ROW_FIELDS, SCORE_COLUMN_TYPES, Repository, RepositoryError
+
+# ==============================================================================
+# PENYIMPANAN LOKAL OFFLINE-FIRST DENGAN SINKRONISASI LATAR BELAKANG
+# ==============================================================================
+
+# Koneksi di lokasi posyandu sering terputus. OfflineStore menyimpan salinan daftar anak
+# dan riwayat pengukuran di SQLite (mode WAL), sehingga baca dan tulis selesai secara lokal
+# dalam hitungan milidetik. Setiap tulisan juga dicatat di tabel `outbox`; thread latar
+# belakang mengirim isi outbox ke Supabase per batch ketika koneksi tersedia, lalu menarik
+# perubahan dari server (kolom anak.revisi).
+#
+# Deteksi konflik saat sinkronisasi:
+# - anak baru: id_anak sudah ada di server dengan identitas berbeda
+# - pengukuran baru: anak yang sama sudah punya pengukuran pada tanggal yang sama di server
+# - revisi/hapus: baris di server sudah berubah (atau terhapus) sejak disalin ke lokal
+# Entri yang konflik tidak dikirim sampai diselesaikan lewat resolve_conflict().
+#
+# Server tujuan sinkronisasi adalah Repository (kms_repository): SupabaseRepository di
+# produksi, atau SQLiteRepository sebagai pengganti lokal untuk pengujian.
+
+SYNC_INTERVAL_SECONDS = 30
+SYNC_BATCH = 100
+
+SCHEMA = """
+create table if not exists anak (
+    id_anak text primary key,
+    nama_anak text,
+    tanggal_lahir text,
+    jenis_kelamin text,
+    server_revisi integer,  -- revisi terakhir yang terlihat di server
+    synced_revisi integer   -- revisi server yang sesuai riwayat lokal; NULL = riwayat belum diambil
+);
+create table if not exists pengukuran (
+    id integer primary key autoincrement,  -- id lokal (dipakai UI)
+    server_id integer unique,              -- id di Supabase; NULL = belum tersinkron
+    id_anak text not null,
+    tanggal_pengukuran text,
+    usia_bulan integer,
+    usia_hari integer,
+    berat_kg real,
+    tinggi_cm real,
+    lingkar_kepala_cm real,
+    {score_columns}
+);
+create index if not exists pengukuran_anak_idx on pengukuran (id_anak, tanggal_pengukuran);
+create table if not exists outbox (
+    seq integer primary key autoincrement,
+    op text not null,                 -- insert_anak | insert | update | delete
+    id_anak text not null,
+    local_id integer,                 -- pengukuran.id untuk op insert
+    server_id integer,                -- target op update/delete
+    payload text,                     -- JSON kolom yang ditulis
+    base text,                        -- JSON nilai server sebelum diubah; NULL = tanpa cek konflik
+    force integer not null default 0, -- 1 = kirim walaupun terdeteksi duplikat
+    status text not null default 'pending', -- pending | conflict
+    error text,
+    created_at text not null
+);
+""".replace("{score_columns}", ",\n    ".join(f"{col} {kind}" for col, kind in SCORE_COLUMN_TYPES.items()))
+
+
+def _same(a: Any, b: Any) -> bool:
+    """Perbandingan nilai kolom server vs lokal (angka dibandingkan sampai 3 desimal)."""
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return round(float(a), 3) == round(float(b), 3)
+    return (a is None and b is None) or str(a) == str(b)
+
+
+class OfflineStore:
+    """Cache baca + antrean tulis SQLite untuk data anak/pengukuran, disinkronkan ke repository server."""
+
+    def __init__(self, path: str, remote: Repository):
+        self.remote = remote
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("pragma journal_mode=wal")
+        self._conn.execute("pragma synchronous=normal") # Aman di WAL; commit tidak menunggu fsync penuh
+        existing = {row['name'] for row in self._conn.execute("pragma table_info(pengukuran)")}
+        for col, kind in SCORE_COLUMN_TYPES.items(): # File lama sebelum ada kolom skor
+            if existing and col not in existing:
+                self._conn.execute(f"alter table pengukuran add column {col} {kind}")
+        self._conn.executescript(SCHEMA)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.online: Optional[bool] = None
+        self.last_sync: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    # --- Baca (selalu dari lokal) ---
+
+    def list_children(self) -> pd.DataFrame:
+        with self._lock:
+            rows = self._conn.execute(
+                f"select {', '.join(CHILD_FIELDS)} from anak order by nama_anak, id_anak").fetchall()
+        return pd.DataFrame([dict(row) for row in rows], columns=CHILD_FIELDS)
+
+    def get_history(self, id_anak: str) -> List[Dict]:
+        """
+        Riwayat pengukuran satu anak dari lokal. Jika riwayatnya belum pernah diambil,
+        dicoba diambil dari server sekali (tanpa koneksi: kembalikan yang ada di lokal).
+        """
+        with self._lock:
+            child = self._conn.execute("select synced_revisi from anak where id_anak = ?", (id_anak,)).fetchone()
+        if child is not None and child['synced_revisi'] is None:
+            try:
+                self.refresh_history(id_anak)
+            except Exception as e:
+                self.online, self.last_error = isinstance(e, RepositoryError), str(e)
+        with self._lock:
+            rows = self._conn.execute(
+                f"select {', '.join(HISTORY_FIELDS)} from pengukuran "
+                "where id_anak = ? order by tanggal_pengukuran, id", (id_anak,)).fetchall()
+        return [dict(row) for row in rows]
+
+    # --- Tulis (commit lokal + outbox dalam satu transaksi) ---
+
+    def _enqueue(self, op: str, id_anak: str, payload: Dict = None, base: Dict = None,
+                 local_id: int = None, server_id: int = None) -> None:
+        self._conn.execute(
+            "insert into outbox (op, id_anak, local_id, server_id, payload, base, created_at) values (?, ?, ?, ?, ?, ?, ?)",
+            (op, id_anak, local_id, server_id, json.dumps(payload) if payload is not None else None,
+             json.dumps(base) if base is not None else None, datetime.now().isoformat(timespec='seconds')))
+
+    def insert_measurement(self, data: Dict[str, Any], child: Optional[Dict[str, Any]] = None) -> int:
+        """Menyimpan satu pengukuran (dan identitas anak baru jika `child` diberikan). Mengembalikan id lokal."""
+        return self.insert_many([data], [child] if child else [])[0]
+
+    def insert_many(self, records: List[Dict[str, Any]], new_children: List[Dict[str, Any]]) -> List[int]:
+        """Menyimpan banyak pengukuran + anak baru dalam satu transaksi lokal."""
+        with self._lock, self._conn:
+            for child in new_children:
+                identity = {k: child[k] for k in CHILD_FIELDS}
+                try:
+                    self._conn.execute("insert into anak (id_anak, nama_anak, tanggal_lahir, jenis_kelamin, synced_revisi) "
+                                       "values (:id_anak, :nama_anak, :tanggal_lahir, :jenis_kelamin, 0)", identity)
+                except sqlite3.IntegrityError:
+                    raise ValueError(f"ID anak {identity['id_anak']} sudah terdaftar")
+                self._enqueue("insert_anak", identity['id_anak'], identity)
+            local_ids = []
+            for data in records:
+                values = {field: data.get(field) for field in ROW_FIELDS}
+                cursor = self._conn.execute(
+                    f"insert into pengukuran (id_anak, {', '.join(ROW_FIELDS)}) "
+                    f"values (:id_anak, {', '.join(':' + f for f in ROW_FIELDS)})",
+                    {'id_anak': data['id_anak'], **values})
+                local_ids.append(cursor.lastrowid)
+                self._enqueue("insert", data['id_anak'], local_id=cursor.lastrowid)
+        self.wake()
+        return local_ids
+
+    def _row(self, local_id: int) -> sqlite3.Row:
+        row = self._conn.execute("select * from pengukuran where id = ?", (local_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Pengukuran {local_id} tidak ditemukan")
+        return row
+
+    def update_measurement(self, local_id: int, update_data: Dict[str, Any]) -> None:
+        """
+        Merevisi satu pengukuran. Baris yang belum tersinkron cukup diubah di lokal (insert di
+        outbox membaca nilai terbaru saat dikirim); revisi berurutan digabung dalam satu op.
+        """
+        with self._lock, self._conn:
+            row = self._row(local_id)
+            sets = ", ".join(f"{field} = :{field}" for field in update_data)
+            self._conn.execute(f"update pengukuran set {sets} where id = :id", {**update_data, 'id': local_id})
+            if row['server_id'] is None:
+                return
+            pending = self._conn.execute("select seq, payload from outbox where op = 'update' and server_id = ? "
+                                         "and status = 'pending'", (row['server_id'],)).fetchone()
+            if pending:
+                merged = {**json.loads(pending['payload']), **update_data}
+                self._conn.execute("update outbox set payload = ? where seq = ?", (json.dumps(merged), pending['seq']))
+            else:
+                base = {field: row[field] for field in MEASUREMENT_FIELDS}
+                self._enqueue("update", row['id_anak'], update_data, base, server_id=row['server_id'])
+        self.wake()
+
+    def delete_measurement(self, local_id: int) -> None:
+        """Menghapus satu pengukuran; penghapusan baris yang belum tersinkron cukup membatalkan insert-nya."""
+        with self._lock, self._conn:
+            row = self._row(local_id)
+            self._conn.execute("delete from pengukuran where id = ?", (local_id,))
+            if row['server_id'] is None:
+                self._conn.execute("delete from outbox where op = 'insert' and local_id = ?", (local_id,))
+                return
+            base = {field: row[field] for field in MEASUREMENT_FIELDS}
+            pending = self._conn.execute("select seq, base from outbox where op = 'update' and server_id = ? "
+                                         "and status = 'pending'", (row['server_id'],)).fetchone()
+            if pending:
+                base = json.loads(pending['base']) if pending['base'] else None
+                self._conn.execute("delete from outbox where seq = ?", (pending['seq'],))
+            self._enqueue("delete", row['id_anak'], base=base, server_id=row['server_id'])
+        self.wake()
+
+    # --- Status dan konflik ---
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._conn.execute("select status, count(*) from outbox group by status").fetchall())
+        return {'pending': counts.get('pending', 0), 'conflicts': counts.get('conflict', 0),
+                'online': self.online, 'last_sync': self.last_sync, 'last_error': self.last_error}
+
+    def conflicts(self) -> pd.DataFrame:
+        with self._lock:
+            rows = self._conn.execute("select seq, op, id_anak, local_id, server_id, error, created_at from outbox "
+                                      "where status = 'conflict' order by seq").fetchall()
+        return pd.DataFrame([dict(row) for row in rows],
+                            columns=['seq', 'op', 'id_anak', 'local_id', 'server_id', 'error', 'created_at'])
+
+    def resolve_conflict(self, seq: int, keep_local: bool) -> None:
+        """
+        keep_local=True: kirim ulang perubahan lokal tanpa cek konflik (menimpa server).
+        keep_local=False: buang perubahan lokal dan ambil ulang riwayat anak dari server.
+        """
+        with self._lock, self._conn:
+            op = self._conn.execute("select * from outbox where seq = ?", (seq,)).fetchone()
+            if op is None:
+                return
+            if keep_local:
+                self._conn.execute("update outbox set status = 'pending', force = 1, base = null, error = null "
+                                   "where seq = ?", (seq,))
+            else:
+                self._conn.execute("delete from outbox where seq = ?", (seq,))
+                if op['op'] == 'insert':
+                    self._conn.execute("delete from pengukuran where id = ?", (op['local_id'],))
+                elif op['op'] == 'insert_anak':
+                    self._conn.execute("delete from outbox where id_anak = ?", (op['id_anak'],))
+                    self._conn.execute("delete from pengukuran where id_anak = ? and server_id is null", (op['id_anak'],))
+                    self._conn.execute("update anak set synced_revisi = null where id_anak = ?", (op['id_anak'],))
+                else:
+                    self._conn.execute("update anak set synced_revisi = -1 where id_anak = ?", (op['id_anak'],))
+        self.wake()
+
+    # --- Sinkronisasi ---
+
+    def start(self, interval: float = SYNC_INTERVAL_SECONDS) -> None:
+        """Menjalankan thread sinkronisasi latar belakang (sekali per store)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True, name="kms-offline-sync")
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self) -> None:
+        """Meminta sinkronisasi secepatnya (dipanggil setelah setiap tulisan lokal)."""
+        self._wake.set()
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.is_set():
+            self.sync_once()
+            self._wake.wait(interval)
+            self._wake.clear()
+
+    def sync_once(self) -> Dict[str, int]:
+        """
+        Satu putaran sinkronisasi: kirim outbox (per batch), lalu tarik perubahan server.
+        Kegagalan jaringan menghentikan putaran dan outbox dicoba lagi di putaran berikutnya.
+        """
+        stats = {'pushed': 0, 'conflicts': 0}
+        try:
+            self._push_children(stats)
+            self._push_inserts(stats)
+            self._push_changes(stats)
+            self.pull()
+        except RepositoryError as e:
+            self.online, self.last_error = True, str(e)
+        except Exception as e:
+            self.online, self.last_error = False, str(e)
+            return stats
+        else:
+            self.online, self.last_error = True, None
+        self.last_sync = time.time()
+        return stats
+
+    def _pending(self, ops: str) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(f"select * from outbox where status = 'pending' and op in ({ops}) "
+                                      "order by seq limit ?", (SYNC_BATCH,)).fetchall()
+
+    def _conflict(self, op: sqlite3.Row, message: str, stats: Dict[str, int]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("update outbox set status = 'conflict', error = ? where seq = ?", (message, op['seq']))
+        stats['conflicts'] += 1
+
+    def _done(self, op: sqlite3.Row, stats: Dict[str, int]) -> None:
+        """Menghapus op dari outbox dan menaikkan revisi tersinkron anak (server menaikkan revisi per baris)."""
+        with self._lock, self._conn:
+            self._conn.execute("delete from outbox where seq = ?", (op['seq'],))
+            if op['op'] != 'insert_anak':
+                self._conn.execute("update anak set synced_revisi = synced_revisi + 1, server_revisi = server_revisi + 1 "
+                                   "where id_anak = ? and synced_revisi = server_revisi", (op['id_anak'],))
+        stats['pushed'] += 1
+
+    @staticmethod
+    def _insert_remote(insert, records: List[Dict]) -> List[Any]:
+        """Insert satu batch; jika ditolak, per baris. Hasil per record: baris server atau RepositoryError."""
+        try:
+            return list(insert(records))
+        except RepositoryError:
+            results = []
+            for record in records:
+                try:
+                    results.append(insert([record])[0])
+                except RepositoryError as e:
+                    results.append(e)
+            return results
+
+    def _push_children(self, stats: Dict[str, int]) -> None:
+        ops = self._pending("'insert_anak'")
+        if not ops:
+            return
+        identities = [json.loads(op['payload']) for op in ops]
+        for op, identity, result in zip(ops, identities, self._insert_remote(self.remote.insert_children, identities)):
+            if not isinstance(result, RepositoryError):
+                with self._lock, self._conn:
+                    self._conn.execute("update anak set server_revisi = 0 where id_anak = ?", (identity['id_anak'],))
+                self._done(op, stats)
+                continue
+            server = self.remote.get_child(identity['id_anak'])
+            if server and all(_same(server[k], identity[k]) for k in CHILD_FIELDS):
+                self._done(op, stats) # Anak yang sama sudah didaftarkan dari perangkat lain
+            else:
+                self._conflict(op, "ID anak sudah terdaftar di server dengan identitas berbeda" if server else str(result), stats)
+
+    def _push_inserts(self, stats: Dict[str, int]) -> None:
+        with self._lock:
+            ops = self._conn.execute(
+                "select o.* from outbox o join pengukuran p on p.id = o.local_id "
+                "where o.status = 'pending' and o.op = 'insert' "
+                "and not exists (select 1 from outbox a where a.op = 'insert_anak' and a.id_anak = o.id_anak) "
+                "order by o.seq limit ?", (SYNC_BATCH,)).fetchall()
+            records = [{'id_anak': op['id_anak'], **{f: self._row(op['local_id'])[f] for f in ROW_FIELDS}} for op in ops]
+        if not ops:
+            return
+
+        # Pengukuran anak yang sama pada tanggal yang sama yang sudah ada di server = konflik
+        existing = self.remote.find_measurements(sorted({r['id_anak'] for r in records}),
+                                                 sorted({r['tanggal_pengukuran'] for r in records}))
+        existing = {(row['id_anak'], str(row['tanggal_pengukuran'])) for row in existing}
+        to_send = []
+        for op, record in zip(ops, records):
+            if not op['force'] and (record['id_anak'], record['tanggal_pengukuran']) in existing:
+                self._conflict(op, "Sudah ada pengukuran anak ini pada tanggal yang sama di server", stats)
+            else:
+                to_send.append((op, record))
+        if not to_send:
+            return
+
+        results = self._insert_remote(self.remote.insert_measurements, [record for _, record in to_send])
+        for (op, record), result in zip(to_send, results):
+            if isinstance(result, RepositoryError):
+                self._conflict(op, str(result), stats)
+                continue
+            with self._lock, self._conn:
+                current = self._conn.execute("select * from pengukuran where id = ?", (op['local_id'],)).fetchone()
+                if current is None: # Dihapus di lokal selama dikirim
+                    self._enqueue("delete", op['id_anak'], base=None, server_id=result['id'])
+                else:
+                    self._conn.execute("update pengukuran set server_id = ? where id = ?", (result['id'], op['local_id']))
+                    changed = {f: current[f] for f in ROW_FIELDS if not _same(current[f], record[f])}
+                    if changed: # Direvisi di lokal selama dikirim
+                        self._enqueue("update", op['id_anak'], changed, {f: record[f] for f in MEASUREMENT_FIELDS},
+                                      server_id=result['id'])
+            self._done(op, stats)
+
+    def _push_changes(self, stats: Dict[str, int]) -> None:
+        ops = self._pending("'update', 'delete'")
+        if not ops:
+            return
+        server_rows = {row['id']: row for row in self.remote.get_measurements([op['server_id'] for op in ops])}
+
+        deletes = []
+        for op in ops:
+            server = server_rows.get(op['server_id'])
+            base = json.loads(op['base']) if op['base'] else None
+            if server is None:
+                if op['op'] == 'delete':
+                    self._done(op, stats) # Sudah terhapus di server
+                else:
+                    self._conflict(op, "Pengukuran sudah dihapus di server", stats)
+                continue
+            if base is not None and not all(_same(server.get(f), base[f]) for f in base):
+                self._conflict(op, "Pengukuran sudah diubah di server sejak disalin ke perangkat ini", stats)
+                continue
+            if op['op'] == 'delete':
+                deletes.append(op)
+                continue
+            payload = json.loads(op['payload'])
+            try:
+                self.remote.update_measurement(op['server_id'], payload)
+            except RepositoryError as e: # Ditolak server: tandai op ini saja, antrean di belakangnya tetap jalan
+                self._conflict(op, str(e), stats)
+                continue
+            with self._lock, self._conn:
+                current = self._conn.execute("select payload from outbox where seq = ?", (op['seq'],)).fetchone()
+                if current is not None and current['payload'] != op['payload']:
+                    # Direvisi lagi selama dikirim: sisakan op dengan base = nilai server sekarang
+                    new_base = {f: server.get(f) for f in MEASUREMENT_FIELDS} | payload
+                    self._conn.execute("update outbox set base = ? where seq = ?", (json.dumps(new_base), op['seq']))
+                    continue
+            self._done(op, stats)
+
+        if deletes:
+            results = self._delete_remote([op['server_id'] for op in deletes])
+            for op, result in zip(deletes, results):
+                if isinstance(result, RepositoryError):
+                    self._conflict(op, str(result), stats)
+                else:
+                    self._done(op, stats)
+
+    def _delete_remote(self, server_ids: List[int]) -> List[Optional[RepositoryError]]:
+        """Hapus satu batch; jika ditolak, per baris. Hasil per id: None jika terhapus atau RepositoryError."""
+        try:
+            self.remote.delete_measurements(server_ids)
+            return [None] * len(server_ids)
+        except RepositoryError:
+            results = []
+            for server_id in server_ids:
+                try:
+                    self.remote.delete_measurements([server_id])
+                    results.append(None)
+                except RepositoryError as e:
+                    results.append(e)
+            return results
+
+    def pull(self) -> None:
+        """Menarik daftar anak dan riwayat anak yang revisinya berubah di server."""
+        rows = self.remote.list_children()
+
+        with self._lock, self._conn:
+            for row in rows:
+                self._conn.execute(
+                    "insert into anak (id_anak, nama_anak, tanggal_lahir, jenis_kelamin, server_revisi) "
+                    "values (:id_anak, :nama_anak, :tanggal_lahir, :jenis_kelamin, :revisi) "
+                    "on conflict (id_anak) do update set nama_anak = excluded.nama_anak, tanggal_lahir = excluded.tanggal_lahir, "
+                    "jenis_kelamin = excluded.jenis_kelamin, server_revisi = excluded.server_revisi",
+                    {**row, 'revisi': row.get('revisi') or 0})
+            # Anak yang dihapus di server (dan tidak punya perubahan lokal) ikut dihapus
+            server_ids = json.dumps([row['id_anak'] for row in rows])
+            self._conn.execute("delete from pengukuran where id_anak in (select id_anak from anak where id_anak not in "
+                               "(select value from json_each(?)) and id_anak not in (select id_anak from outbox))", (server_ids,))
+            self._conn.execute("delete from anak where id_anak not in (select value from json_each(?)) "
+                               "and id_anak not in (select id_anak from outbox)", (server_ids,))
+            stale = [row['id_anak'] for row in self._conn.execute(
+                "select id_anak from anak where synced_revisi is not null and synced_revisi != server_revisi "
+                "and id_anak not in (select id_anak from outbox)").fetchall()]
+
+        for id_anak in stale:
+            self.refresh_history(id_anak)
+
+    def refresh_history(self, id_anak: str) -> None:
+        """Mengganti salinan lokal riwayat satu anak dengan data server (baris lokal yang belum terkirim dipertahankan)."""
+        server_revisi = self.remote.get_revision(id_anak)
+        rows = self.remote.get_history(id_anak)
+        with self._lock, self._conn:
+            if self._conn.execute("select 1 from outbox where id_anak = ? and op != 'insert'", (id_anak,)).fetchone():
+                return # Ada perubahan lokal yang belum terkirim; tarik ulang setelah outbox kosong
+            server_ids = json.dumps([row['id'] for row in rows])
+            self._conn.execute("delete from pengukuran where id_anak = ? and server_id is not null "
+                               "and server_id not in (select value from json_each(?))", (id_anak, server_ids))
+            for row in rows:
+                values = {'server_id': row['id'], 'id_anak': id_anak, **{f: row.get(f) for f in ROW_FIELDS}}
+                self._conn.execute(
+                    f"insert into pengukuran (server_id, id_anak, {', '.join(ROW_FIELDS)}) "
+                    f"values (:server_id, :id_anak, {', '.join(':' + f for f in ROW_FIELDS)}) "
+                    f"on conflict (server_id) do update set {', '.join(f'{f} = excluded.{f}' for f in ROW_FIELDS)}",
+                    values)
+            self._conn.execute("update anak set server_revisi = ?, synced_revisi = ? where id_anak = ?",
+                               (server_revisi, server_revisi, id_anak))
@@ -0,0 +1,91 @@
+import glob
+import os
+import re
+import shutil
+import threading
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from kms_reference_store import open_store
+
+# ==============================================================================
+# CACHE KOEFISIEN POLINOMIAL KURVA SD (UNTUK JALUR POLYFIT YANG MASIH DIPAKAI)
+# ==============================================================================
+
+# Kurva SD pada grafik masih dihaluskan dengan np.polyfit. Koefisiennya hanya dihitung
+# sekali per (tabel indikator/jenis kelamin/rentang umur, derajat), lalu disimpan di memori
+# proses dan di disk (poly_cache/). Setiap rerun Streamlit cukup mengevaluasi koefisien.
+#
+# Invalidasi eksplisit: naikkan POLY_CACHE_VERSION jika cara fitting berubah. Perubahan
+# tabel referensi otomatis memakai folder cache baru lewat fingerprint artefak referensi; folder
+# namespace lama dihapus saat proses pertama kali menulis ke namespace baru. Tingkat disk
+# bersifat opsional: jika tidak bisa ditulis (read-only, disk penuh), koefisien tetap dipakai dari memori.
+
+POLY_CACHE_VERSION = 1
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "poly_cache")
+
+_memory_cache: Dict[str, np.ndarray] = {}
+_lock = threading.Lock()
+_pruned = False
+
+
+def cache_namespace() -> str:
+    """Nama folder cache untuk versi koefisien dan versi data referensi saat ini."""
+    index, _ = open_store()
+    return f"v{POLY_CACHE_VERSION}-{index['fingerprint']}"
+
+
+def cache_path(full_key: str) -> str:
+    """Path file .npy untuk satu kunci cache (karakter selain alfanumerik diganti '_')."""
+    namespace, key = full_key.split(":", 1)
+    return os.path.join(CACHE_DIR, namespace, re.sub(r"[^A-Za-z0-9.-]+", "_", key) + ".npy")
+
+
+def prune_namespaces(current: str) -> None:
+    """Menghapus folder cache dari versi koefisien/fingerprint referensi selain `current`."""
+    for path in glob.glob(os.path.join(CACHE_DIR, "v*-*")):
+        if os.path.basename(path) != current:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def save_coefficients(full_key: str, coefs: np.ndarray) -> None:
+    """Menulis koefisien ke disk secara atomik; kegagalan tulis diabaikan (cache saja)."""
+    global _pruned
+    path = cache_path(full_key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, coefs)
+        os.replace(tmp_path, path)
+    except OSError:
+        return
+    if not _pruned:
+        _pruned = True
+        prune_namespaces(full_key.split(":", 1)[0])
+
+
+def cached_polyfit(cache_key: str, x: pd.Series, df: pd.DataFrame, columns: List[str], degree: int) -> Dict[str, np.poly1d]:
+    """
+    Mengembalikan np.poly1d per kolom SD untuk satu tabel standar.
+    `cache_key` harus unik per indikator/jenis kelamin/rentang umur (mis. nama file standar);
+    derajat polinomial dan nama kolom ikut menjadi bagian kunci.
+    """
+    full_key = f"{cache_namespace()}:{cache_key}-{'_'.join(columns)}-deg{degree}"
+
+    coefs = _memory_cache.get(full_key)
+    if coefs is None:
+        with _lock:
+            coefs = _memory_cache.get(full_key)
+            if coefs is None:
+                try:
+                    coefs = np.load(cache_path(full_key))
+                except (OSError, ValueError):
+                    coefs = np.vstack([np.polyfit(x, df[col], degree) for col in columns])
+                    save_coefficients(full_key, coefs)
+                _memory_cache[full_key] = coefs
+
+    return {col: np.poly1d(coef) for col, coef in zip(columns, coefs)}
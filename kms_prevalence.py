@@ -0,0 +1,161 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from kms_repository import LATEST_FIELDS, MONTHLY_COUNT_FIELDS, Repository
+from kms_zscore import BIV_COLUMN, DAYS_PER_MONTH, SCORE_COLUMNS, age_days_column, calculate_scores_batch, reference_version
+
+# ==============================================================================
+# PREVALENSI STATUS GIZI TINGKAT POSYANDU
+# ==============================================================================
+
+# Laporan bulanan ke puskesmas memakai pengukuran terakhir setiap anak. Semua anak
+# diklasifikasikan sekaligus: kategori yang disimpan saat tulis (kms_zscore.classify_zscores,
+# tabel batas yang sama dengan interpretasi grafik di kms_app) dipakai langsung, dan baris bercap
+# lama dihitung ulang dalam satu pass vektor. Pengukuran bertanda BIV (nilai tidak wajar) tidak
+# dihitung di indikator mana pun. Agregat per jenis kelamin dan kelompok umur
+# cukup satu groupby atas kolom boolean.
+#
+# PrevalenceCache menyimpan pengukuran terakhir per anak di memori. refresh() hanya meminta
+# ulang anak yang revisinya (anak.revisi, naik setiap pengukurannya berubah) atau
+# identitasnya berubah, sehingga pembaruan setelah beberapa input hanya butuh dua request kecil.
+#
+# Tren bulanan tidak dihitung dari data_pengukuran sama sekali: tabel prevalensi_bulanan berisi
+# jumlah pengukuran balita per (bulan, jenis kelamin, kolom kategori, kategori) dan dijaga oleh
+# trigger database pada setiap insert/update/delete. monthly_prevalence() hanya menjumlahkan
+# penghitung tersebut, sehingga biayanya sebanding dengan jumlah bulan, bukan jumlah pengukuran.
+
+# Indikator -> (kolom kategori, label yang dihitung sebagai kasus)
+PREVALENCE_INDICATORS: Dict[str, Tuple[str, List[str]]] = {
+    "Stunting": ('kategori_lhfa', ["Pendek (Stunting)", "Sangat Pendek (Severe Stunting)"]),
+    "Wasting": ('kategori_wflh', ["Gizi kurang (Wasting)", "Gizi buruk (Severe Wasting)"]),
+    "Underweight": ('kategori_wfa', ["Berat badan kurang", "Berat badan sangat kurang (Underweight)"]),
+    "Overweight": ('kategori_wflh', ["Berisiko gizi lebih (Overweight)", "Gizi lebih (Obesitas)"]),
+    "Mikrosefali": ('kategori_hcfa', ["Mikrosefali"]),
+}
+
+# Kelompok umur (bulan, batas bawah inklusif) untuk balita; umur >= 60 bulan tidak dihitung.
+AGE_BAND_EDGES = [0, 6, 12, 24, 36, 48, 60]
+AGE_BAND_LABELS = ["0-5 bln", "6-11 bln", "12-23 bln", "24-35 bln", "36-47 bln", "48-59 bln"]
+
+FETCH_CHUNK = 200 # Jumlah id_anak per request (batas panjang URL filter `in`)
+
+
+def classify_latest(latest: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mengklasifikasikan pengukuran terakhir semua anak sekaligus.
+    Mengembalikan id_anak, jenis_kelamin, tanggal_pengukuran, umur_bulan, kelompok_umur, dan
+    untuk setiap indikator kolom boolean `<indikator>` (kasus) dan `<indikator>_diukur`.
+    """
+    latest = latest.reset_index(drop=True)
+    stale = (latest['referensi_versi'] != reference_version()).to_numpy()
+    if stale.any():
+        scores = calculate_scores_batch(latest[stale])
+        for col in SCORE_COLUMNS:
+            latest[col] = latest[col].where(~stale, scores[col])
+
+    # Baris lama yang baru ketahuan tidak wajar setelah dihitung ulang ikut dikarantina
+    plausible = latest[BIV_COLUMN].isna().to_numpy()
+    umur_bulan = np.floor(age_days_column(latest) / DAYS_PER_MONTH)
+    band = np.digitize(umur_bulan, AGE_BAND_EDGES) - 1 # -1 = tanpa umur, 6 = di atas 59 bulan
+    valid_band = (band >= 0) & (band < len(AGE_BAND_LABELS))
+    result = pd.DataFrame({
+        'id_anak': latest['id_anak'],
+        'jenis_kelamin': latest['jenis_kelamin'],
+        'tanggal_pengukuran': pd.to_datetime(latest['tanggal_pengukuran'], errors='coerce'),
+        'umur_bulan': umur_bulan,
+        'kelompok_umur': pd.Categorical.from_codes(np.where(valid_band, band, -1), categories=AGE_BAND_LABELS, validate=False),
+    })
+    for name, (col, labels) in PREVALENCE_INDICATORS.items():
+        category = latest[col]
+        result[name] = category.isin(labels).to_numpy() & plausible
+        result[f"{name}_diukur"] = category.notna().to_numpy() & plausible
+    return result
+
+
+def prevalence_table(classified: pd.DataFrame, by: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Jumlah anak dan prevalensi (%) tiap indikator, per kelompok `by` (None = seluruh posyandu).
+    Penyebut setiap indikator adalah anak yang indikatornya terukur.
+    Kolom: anak, lalu `<indikator>` (%), `<indikator>_kasus`, `<indikator>_diukur`.
+    """
+    under_five = classified[classified['kelompok_umur'].notna()]
+    flags = list(PREVALENCE_INDICATORS) + [f"{name}_diukur" for name in PREVALENCE_INDICATORS]
+    if by:
+        grouped = under_five.groupby(by, observed=False)
+        sums, counts = grouped[flags].sum(), grouped.size()
+    else:
+        sums = under_five[flags].sum().to_frame("Semua").T
+        counts = pd.Series([len(under_five)], index=sums.index)
+
+    table = pd.DataFrame({'anak': counts})
+    for name in PREVALENCE_INDICATORS:
+        measured = sums[f"{name}_diukur"]
+        table[name] = (100 * sums[name] / measured.where(measured > 0)).round(1)
+        table[f"{name}_kasus"] = sums[name].astype(int)
+        table[f"{name}_diukur"] = measured.astype(int)
+    return table
+
+
+def monthly_prevalence(counts: List[Dict], by: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Prevalensi (%) per bulan dari baris penghitung prevalensi_bulanan (Repository.monthly_counts).
+    Indeks: bulan (+ kolom `by`, mis. ['jenis_kelamin']). Kolom sama seperti prevalence_table
+    tanpa 'anak'; satuannya pengukuran (anak yang diukur dua kali dalam sebulan terhitung dua kali).
+    """
+    counts = pd.DataFrame(counts, columns=MONTHLY_COUNT_FIELDS)
+    counts['bulan'] = pd.to_datetime(counts['bulan'])
+    keys = ['bulan'] + (by or [])
+    measured_rows = counts[counts['kategori'] != '-']
+
+    table = pd.DataFrame(index=measured_rows.groupby(keys).size().index)
+    for name, (col, labels) in PREVALENCE_INDICATORS.items():
+        rows = measured_rows[measured_rows['kolom'] == col]
+        measured = rows.groupby(keys)['jumlah'].sum().reindex(table.index, fill_value=0)
+        cases = rows[rows['kategori'].isin(labels)].groupby(keys)['jumlah'].sum().reindex(table.index, fill_value=0)
+        table[name] = (100 * cases / measured.where(measured > 0)).round(1)
+        table[f"{name}_kasus"] = cases.astype(int)
+        table[f"{name}_diukur"] = measured.astype(int)
+    return table
+
+
+class PrevalenceCache:
+    """Pengukuran terakhir per anak beserta klasifikasinya, diperbarui per anak yang berubah."""
+
+    def __init__(self, repository: Repository, fetch_chunk: int = FETCH_CHUNK):
+        self.repository = repository
+        self.fetch_chunk = fetch_chunk
+        self.versions: Dict[str, tuple] = {}
+        self.classified = classify_latest(pd.DataFrame(columns=LATEST_FIELDS))
+        self.refreshed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> int:
+        """Menyamakan cache dengan server; mengembalikan jumlah anak yang diambil ulang atau dihapus."""
+        with self._lock:
+            children = self.repository.list_children()
+            versions = {child['id_anak']: (child.get('revisi'), child['jenis_kelamin'], str(child['tanggal_lahir']))
+                        for child in children}
+            changed = [id_anak for id_anak, version in versions.items() if self.versions.get(id_anak) != version]
+            removed = set(self.versions) - set(versions)
+
+            rows = []
+            for start in range(0, len(changed), self.fetch_chunk):
+                rows.extend(self.repository.latest_measurements(changed[start:start + self.fetch_chunk]))
+            if changed or removed:
+                kept = self.classified[~self.classified['id_anak'].isin(set(changed) | removed)]
+                fresh = classify_latest(pd.DataFrame(rows, columns=LATEST_FIELDS))
+                self.classified = pd.concat([kept, fresh], ignore_index=True) if len(kept) else fresh
+            self.versions = versions
+            self.refreshed_at = time.time()
+            return len(changed) + len(removed)
+
+    def snapshot(self, since: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """Klasifikasi pengukuran terakhir; `since` membatasi ke anak yang diukur sejak tanggal tersebut."""
+        classified = self.classified
+        if since is not None:
+            classified = classified[classified['tanggal_pengukuran'] >= since]
+        return classified
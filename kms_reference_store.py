@@ -0,0 +1,198 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# PENYIMPANAN REFERENSI WHO TERKOMPILASI (MEMORY-MAPPED)
+# ==============================================================================
+
+# Semua tabel standar WHO (file *.xlsx di root dan data/*.csv) dikompilasi sekali menjadi
+# satu array float64 (.npy) beserta indeks JSON. Aplikasi membuka array tersebut dengan
+# mmap_mode='r', sehingga semua proses worker Streamlit berbagi halaman memori yang sama
+# dan tidak perlu lagi memanggil pd.read_excel/openpyxl saat request.
+#
+# Artefak dibangun secara eksplisit sebagai langkah build/deploy, tidak pernah saat request:
+#   python kms_reference_store.py build
+# Lokasinya STORE_DIR (env KMS_REFERENCE_DIR, default folder repo), sehingga deploy dengan
+# kode read-only cukup mengarahkan variabel itu ke folder yang bisa ditulis saat build.
+# Jika artefak belum ada atau usang (sidik jari isi sumber berbeda), open_store() mengompilasi
+# tabel di memori proses saja: tetap benar, hanya tanpa berbagi halaman antar-worker.
+
+STORE_VERSION = 1
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+STORE_DIR = os.environ.get("KMS_REFERENCE_DIR", BASE_DIR)
+INDEX_PATH = os.path.join(STORE_DIR, "who_reference.json")
+
+# Contoh: wfa_boys_0-to-5-years_zscores.xlsx, hcfa_girls_0-13-zscores.xlsx
+XLSX_PATTERN = re.compile(r"^(?P<indicator>[a-z]+)_(?P<sex>boys|girls)_(?P<band>.+?)[-_]zscores\.xlsx$")
+# Contoh: wfa-boys-zscore-expanded-tables(WFA_boys_z_exp_0_5).csv
+CSV_PATTERN = re.compile(r"^(?P<indicator>[a-z]+)-(?P<sex>boys|girls)-zscore-expanded-tables?\(.*\)\.csv$")
+
+
+def source_files() -> List[str]:
+    """Daftar semua file sumber referensi WHO yang ikut dikompilasi."""
+    files = glob.glob(os.path.join(BASE_DIR, "*zscores.xlsx"))
+    files += glob.glob(os.path.join(DATA_DIR, "*-zscore-expanded-table*.csv"))
+    return sorted(files)
+
+
+def source_key(path: str) -> str:
+    """
+    Menentukan kunci tabel dengan format indikator/jenis_kelamin/sumbu.
+    Tabel xlsx memakai rentang umur pada nama file, tabel harian data/ memakai 'daily'.
+    """
+    name = os.path.basename(path)
+    match = CSV_PATTERN.match(name)
+    if match:
+        return f"{match['indicator']}/{match['sex']}/daily"
+    match = XLSX_PATTERN.match(name)
+    if match:
+        return f"{match['indicator']}/{match['sex']}/{match['band']}"
+    raise ValueError(f"Nama file referensi tidak dikenali: {name}")
+
+
+def sources_fingerprint(files: List[str]) -> str:
+    """
+    Sidik jari isi sumber (nama + hash byte file) untuk mendeteksi artefak yang usang.
+    Berbasis isi, bukan mtime, sehingga checkout/salin ulang file yang sama tidak membuatnya usang.
+    """
+    digest = hashlib.sha1(f"v{STORE_VERSION}".encode())
+    for path in files:
+        with open(path, "rb") as f:
+            digest.update(f"{os.path.basename(path)}:{hashlib.sha1(f.read()).hexdigest()}".encode())
+    return digest.hexdigest()[:12]
+
+
+def read_source(path: str) -> pd.DataFrame:
+    """Membaca satu file sumber dan merapikan nama kolomnya (mis. 'M       ' -> 'M')."""
+    df = pd.read_csv(path) if path.endswith(".csv") else pd.read_excel(path)
+    df.columns = [str(col).strip() for col in df.columns]
+    return df.apply(pd.to_numeric, errors='coerce')
+
+
+def compile_store(files: List[str]) -> Tuple[Dict, np.ndarray]:
+    """Mengompilasi tabel sumber di memori: (indeks, array data float64 satu dimensi)."""
+    fingerprint = sources_fingerprint(files)
+    blocks, tables, offset = [], {}, 0
+    for path in files:
+        df = read_source(path)
+        block = df.to_numpy(dtype=np.float64)
+        tables[source_key(path)] = {
+            "source": os.path.basename(path),
+            "offset": offset,
+            "shape": list(block.shape),
+            "columns": list(df.columns),
+        }
+        blocks.append(block.ravel())
+        offset += block.size
+    index = {"version": STORE_VERSION, "fingerprint": fingerprint, "data_file": None, "tables": tables}
+    return index, np.concatenate(blocks)
+
+
+def build_store() -> Dict:
+    """Langkah build eksplisit: menulis artefak .npy dan indeks JSON-nya ke STORE_DIR."""
+    index, data = compile_store(source_files())
+    data_name = f"who_reference-v{STORE_VERSION}-{index['fingerprint']}.npy"
+    index["data_file"] = data_name
+
+    # Tulis data lalu indeks secara atomik: pembaca lama tetap memakai file data lama.
+    os.makedirs(STORE_DIR, exist_ok=True)
+    data_path = os.path.join(STORE_DIR, data_name)
+    tmp_data = f"{data_path}.{os.getpid()}.tmp"
+    with open(tmp_data, "wb") as f:
+        np.save(f, data)
+    os.replace(tmp_data, data_path)
+
+    tmp_index = f"{INDEX_PATH}.{os.getpid()}.tmp"
+    with open(tmp_index, "w") as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp_index, INDEX_PATH)
+
+    # Bersihkan artefak versi lama
+    for old in glob.glob(os.path.join(STORE_DIR, "who_reference-v*.npy")):
+        if os.path.basename(old) != data_name:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return index
+
+
+def read_index() -> Optional[Dict]:
+    """Membaca indeks artefak; mengembalikan None jika belum ada atau rusak."""
+    try:
+        with open(INDEX_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=1)
+def open_store() -> Tuple[Dict, np.ndarray]:
+    """
+    Membuka artefak referensi sebagai memory-map read-only (sekali per proses).
+    Tidak pernah menulis: jika artefak belum ada, versinya berbeda, sumbernya berubah, atau
+    tidak bisa dibaca, tabel dikompilasi di memori proses ini (lihat build_store untuk artefaknya).
+    """
+    files = source_files()
+    index = read_index()
+    if (index is not None and index.get("version") == STORE_VERSION
+            and index.get("fingerprint") == sources_fingerprint(files)):
+        try:
+            return index, np.load(os.path.join(STORE_DIR, index["data_file"]), mmap_mode='r')
+        except (OSError, ValueError, TypeError):
+            pass
+    return compile_store(files)
+
+
+def get_table(key: str) -> Dict[str, np.ndarray]:
+    """Mengembalikan kolom-kolom satu tabel sebagai view array (tanpa salin) dari memory-map."""
+    index, data = open_store()
+    if key not in index["tables"]:
+        raise KeyError(f"Tabel referensi tidak ditemukan: {key}")
+    meta = index["tables"][key]
+    rows, cols = meta["shape"]
+    block = data[meta["offset"]:meta["offset"] + rows * cols].reshape(rows, cols)
+    return {col: block[:, i] for i, col in enumerate(meta["columns"])}
+
+
+def get_frame(key: str) -> pd.DataFrame:
+    """Mengembalikan satu tabel referensi sebagai DataFrame."""
+    return pd.DataFrame(get_table(key))
+
+
+def load_reference_frame(file_name: str) -> pd.DataFrame:
+    """
+    Pengganti pd.read_excel untuk file standar WHO di root repo.
+    Nama file dipetakan ke kunci tabel; FileNotFoundError jika tabel tidak ada di artefak.
+    """
+    try:
+        return get_frame(source_key(file_name))
+    except (KeyError, ValueError):
+        raise FileNotFoundError(f"File standar tidak ditemukan: {file_name}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Kompilasi tabel referensi WHO menjadi artefak memory-mapped.")
+    parser.add_argument("command", choices=["build", "list"], help="build: kompilasi ulang, list: tampilkan isi artefak")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        result = build_store()
+        print(f"Artefak {result['data_file']} berisi {len(result['tables'])} tabel.")
+    else:
+        result, _ = open_store()
+        if result["data_file"] is None:
+            print("Artefak belum dibangun atau usang; tabel dikompilasi di memori (jalankan: build).")
+        for table_key, meta in sorted(result["tables"].items()):
+            print(f"{table_key:40s} {meta['shape'][0]:5d} baris  <- {meta['source']}")
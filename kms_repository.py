@@ -0,0 +1,451 @@
+import os
+import sqlite3
+import threading
+import tomllib
+from typing import Any, Dict, List, Optional
+
+from postgrest.exceptions import APIError
+from supabase import Client, create_client
+
+from kms_zscore import BATCH_COLUMNS, BIV_COLUMN, CATEGORY_COLUMNS, SCORE_COLUMNS
+
+# ==============================================================================
+# REPOSITORY DATA ANAK & PENGUKURAN (SUPABASE ATAU SQLITE LOKAL)
+# ==============================================================================
+
+# Semua akses data aplikasi lewat satu antarmuka Repository, sehingga backend bisa dipilih
+# lewat konfigurasi:
+#   KMS_BACKEND=supabase (default)  -> tabel `anak` + `data_pengukuran` di Supabase
+#   KMS_BACKEND=sqlite              -> skema yang sama di file SQLite (KMS_SQLITE_DB),
+#                                      untuk uji beban/benchmark tanpa layanan produksi
+# Semua method mengembalikan list dict (bentuk yang sama dengan response.data Supabase).
+# Penolakan oleh database (duplikat, constraint) dilaporkan sebagai RepositoryError;
+# error lain (mis. jaringan) diteruskan apa adanya.
+# Baris bertanda BIV (kolom `biv`, lihat kms_zscore.BIV_LIMITS) tidak ikut pengukuran terakhir
+# maupun penghitung prevalensi_bulanan.
+
+CHILD_FIELDS = ['id_anak', 'nama_anak', 'tanggal_lahir', 'jenis_kelamin']
+MEASUREMENT_FIELDS = ['tanggal_pengukuran', 'usia_bulan', 'usia_hari', 'berat_kg', 'tinggi_cm', 'lingkar_kepala_cm']
+# Kolom yang disimpan per baris pengukuran: nilai ukur + skor saat tulis (kms_zscore.SCORE_COLUMNS)
+ROW_FIELDS = MEASUREMENT_FIELDS + SCORE_COLUMNS
+# Proyeksi kolom untuk riwayat satu anak (id_anak sudah menjadi filter, identitas ada di `anak`)
+HISTORY_FIELDS = ['id'] + ROW_FIELDS
+# Pengukuran terakhir per anak untuk dashboard prevalensi (baris + identitas yang dibutuhkan klasifikasi)
+LATEST_FIELDS = ['id', 'id_anak', 'jenis_kelamin', 'tanggal_lahir'] + ROW_FIELDS
+# Penghitung bulanan kategori (tabel prevalensi_bulanan, dijaga trigger di data_pengukuran)
+MONTHLY_COUNT_FIELDS = ['bulan', 'jenis_kelamin', 'kolom', 'kategori', 'jumlah']
+# Pengukuran terbaru banyak anak untuk penilaian naik/tidak naik (kms_velocity)
+VELOCITY_FIELDS = ['id', 'id_anak', 'nama_anak', 'jenis_kelamin', 'tanggal_lahir', 'tanggal_pengukuran',
+                   'usia_hari', 'berat_kg', 'tinggi_cm', BIV_COLUMN]
+SCORE_COLUMN_TYPES = {col: ('real' if col in BATCH_COLUMNS else 'text') for col in SCORE_COLUMNS}
+# Kolom yang dibutuhkan untuk menghitung ulang skor satu baris
+RESCORE_FIELDS = ['id', 'jenis_kelamin', 'tanggal_lahir', 'tanggal_pengukuran', 'usia_hari', 'usia_bulan',
+                  'berat_kg', 'tinggi_cm', 'lingkar_kepala_cm']
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kms_local.db")
+
+
+class RepositoryError(Exception):
+    """Tulisan/kueri ditolak oleh database (bukan masalah koneksi)."""
+
+
+class Repository:
+    """Antarmuka penyimpanan data anak dan pengukuran."""
+
+    def list_children(self) -> List[Dict]:
+        """Semua anak (identitas + revisi), urut nama lalu id."""
+        raise NotImplementedError
+
+    def get_child(self, id_anak: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def get_revision(self, id_anak: str) -> int:
+        """Nomor revisi riwayat anak (naik satu setiap baris pengukurannya berubah)."""
+        raise NotImplementedError
+
+    def get_history(self, id_anak: str) -> List[Dict]:
+        """Semua pengukuran satu anak, urut tanggal pengukuran."""
+        raise NotImplementedError
+
+    def get_measurements(self, ids: List[int]) -> List[Dict]:
+        raise NotImplementedError
+
+    def find_measurements(self, id_anak: List[str], tanggal: List[str]) -> List[Dict]:
+        """Pengukuran dengan id_anak di `id_anak` dan tanggal di `tanggal` (untuk cek duplikat)."""
+        raise NotImplementedError
+
+    def insert_children(self, records: List[Dict]) -> List[Dict]:
+        raise NotImplementedError
+
+    def insert_measurements(self, records: List[Dict]) -> List[Dict]:
+        """Insert banyak baris dalam satu request; mengembalikan baris tersimpan (dengan id) sesuai urutan."""
+        raise NotImplementedError
+
+    def update_measurement(self, row_id: int, data: Dict[str, Any]) -> List[Dict]:
+        raise NotImplementedError
+
+    def delete_measurements(self, ids: List[int]) -> List[Dict]:
+        raise NotImplementedError
+
+    def latest_measurements(self, id_anak: List[str]) -> List[Dict]:
+        """Pengukuran terakhir tanpa tanda BIV (LATEST_FIELDS) setiap anak di `id_anak`; anak tanpa pengukuran tidak muncul."""
+        raise NotImplementedError
+
+    def measurements_since(self, since: str) -> List[Dict]:
+        """Semua pengukuran (VELOCITY_FIELDS) dengan tanggal_pengukuran >= `since`, urut id_anak lalu tanggal."""
+        raise NotImplementedError
+
+    def monthly_counts(self, since: str) -> List[Dict]:
+        """Penghitung prevalensi_bulanan (MONTHLY_COUNT_FIELDS) mulai bulan `since` ('YYYY-MM-01')."""
+        raise NotImplementedError
+
+    def rebuild_monthly_counts(self) -> int:
+        """Menghitung ulang seluruh prevalensi_bulanan dari data_pengukuran; mengembalikan jumlah baris penghitung."""
+        raise NotImplementedError
+
+    def list_unscored(self, version: str, limit: int) -> List[Dict]:
+        """Maksimal `limit` baris (RESCORE_FIELDS) yang skornya belum ada atau berversi selain `version`."""
+        raise NotImplementedError
+
+    def apply_scores(self, rows: List[Dict]) -> int:
+        """Menulis kolom skor (SCORE_COLUMNS) untuk banyak baris sekaligus; `rows` berisi 'id' + kolom skor."""
+        raise NotImplementedError
+
+
+class SupabaseRepository(Repository):
+    """Repository di atas tabel Supabase (PostgREST)."""
+
+    PAGE_SIZE = 1000 # Batas default baris per request PostgREST/Supabase
+
+    def __init__(self, client: Client):
+        self.client = client
+
+    @staticmethod
+    def _execute(query) -> List[Dict]:
+        try:
+            return query.execute().data
+        except APIError as e:
+            raise RepositoryError(e.message) from e
+
+    def list_children(self) -> List[Dict]:
+        rows, start = [], 0
+        while True:
+            page = self._execute(self.client.table("anak").select(", ".join(CHILD_FIELDS) + ", revisi")
+                                 .order("nama_anak").order("id_anak").range(start, start + self.PAGE_SIZE - 1))
+            rows.extend(page)
+            if len(page) < self.PAGE_SIZE:
+                return rows
+            start += self.PAGE_SIZE
+
+    def get_child(self, id_anak: str) -> Optional[Dict]:
+        rows = self._execute(self.client.table("anak").select(", ".join(CHILD_FIELDS) + ", revisi").eq("id_anak", id_anak))
+        return rows[0] if rows else None
+
+    def get_revision(self, id_anak: str) -> int:
+        rows = self._execute(self.client.table("anak").select("revisi").eq("id_anak", id_anak))
+        return int(rows[0].get("revisi") or 0) if rows else 0
+
+    def get_history(self, id_anak: str) -> List[Dict]:
+        return self._execute(self.client.table("data_pengukuran").select(", ".join(HISTORY_FIELDS))
+                             .eq("id_anak", id_anak).order("tanggal_pengukuran").order("id"))
+
+    def get_measurements(self, ids: List[int]) -> List[Dict]:
+        return self._execute(self.client.table("data_pengukuran").select("*").in_("id", list(ids)))
+
+    def find_measurements(self, id_anak: List[str], tanggal: List[str]) -> List[Dict]:
+        return self._execute(self.client.table("data_pengukuran").select("id, id_anak, tanggal_pengukuran")
+                             .in_("id_anak", list(id_anak)).in_("tanggal_pengukuran", list(tanggal)))
+
+    def insert_children(self, records: List[Dict]) -> List[Dict]:
+        return self._execute(self.client.table("anak").insert(records))
+
+    def insert_measurements(self, records: List[Dict]) -> List[Dict]:
+        return self._execute(self.client.table("data_pengukuran").insert(records))
+
+    def update_measurement(self, row_id: int, data: Dict[str, Any]) -> List[Dict]:
+        return self._execute(self.client.table("data_pengukuran").update(data).eq("id", row_id))
+
+    def delete_measurements(self, ids: List[int]) -> List[Dict]:
+        return self._execute(self.client.table("data_pengukuran").delete().in_("id", list(ids)))
+
+    def latest_measurements(self, id_anak: List[str]) -> List[Dict]:
+        return self._execute(self.client.table("pengukuran_terakhir").select(", ".join(LATEST_FIELDS)).in_("id_anak", list(id_anak)))
+
+    def measurements_since(self, since: str) -> List[Dict]:
+        rows, start = [], 0
+        while True:
+            page = self._execute(self.client.table("data_pengukuran_lengkap").select(", ".join(VELOCITY_FIELDS))
+                                 .gte("tanggal_pengukuran", since).order("id_anak").order("tanggal_pengukuran").order("id")
+                                 .range(start, start + self.PAGE_SIZE - 1))
+            rows.extend(page)
+            if len(page) < self.PAGE_SIZE:
+                return rows
+            start += self.PAGE_SIZE
+
+    def monthly_counts(self, since: str) -> List[Dict]:
+        rows, start = [], 0
+        while True:
+            page = self._execute(self.client.table("prevalensi_bulanan").select(", ".join(MONTHLY_COUNT_FIELDS))
+                                 .gte("bulan", since).gt("jumlah", 0).order("bulan")
+                                 .range(start, start + self.PAGE_SIZE - 1))
+            rows.extend(page)
+            if len(page) < self.PAGE_SIZE:
+                return rows
+            start += self.PAGE_SIZE
+
+    def rebuild_monthly_counts(self) -> int:
+        try:
+            return self.client.rpc("hitung_ulang_prevalensi_bulanan", {}).execute().data
+        except APIError as e:
+            raise RepositoryError(e.message) from e
+
+    def list_unscored(self, version: str, limit: int) -> List[Dict]:
+        return self._execute(self.client.table("data_pengukuran_lengkap").select(", ".join(RESCORE_FIELDS))
+                             .or_(f"referensi_versi.is.null,referensi_versi.neq.{version}").order("id").limit(limit))
+
+    def apply_scores(self, rows: List[Dict]) -> int:
+        try:
+            return self.client.rpc("terapkan_skor", {"baris": rows}).execute().data
+        except APIError as e:
+            raise RepositoryError(e.message) from e
+
+
+# Skema SQLite yang meniru supabase/migrations/ (termasuk trigger anak.revisi).
+SQLITE_SCHEMA = """
+create table if not exists anak (
+    id_anak text primary key,
+    nama_anak text not null,
+    tanggal_lahir text not null,
+    jenis_kelamin text not null,
+    revisi integer not null default 0
+);
+create table if not exists data_pengukuran (
+    id integer primary key autoincrement,
+    id_anak text not null references anak (id_anak) on update cascade on delete cascade,
+    tanggal_pengukuran text not null,
+    usia_bulan integer,
+    usia_hari integer,
+    berat_kg real,
+    tinggi_cm real,
+    lingkar_kepala_cm real,
+    {score_columns}
+);
+create index if not exists data_pengukuran_id_anak_tanggal_idx on data_pengukuran (id_anak, tanggal_pengukuran);
+create index if not exists data_pengukuran_referensi_versi_idx on data_pengukuran (referensi_versi);
+create trigger if not exists data_pengukuran_revisi_insert after insert on data_pengukuran
+begin
+    update anak set revisi = revisi + 1 where id_anak = new.id_anak;
+end;
+create trigger if not exists data_pengukuran_revisi_update after update on data_pengukuran
+begin
+    update anak set revisi = revisi + 1 where id_anak = old.id_anak;
+    update anak set revisi = revisi + 1 where id_anak = new.id_anak and new.id_anak != old.id_anak;
+end;
+create trigger if not exists data_pengukuran_revisi_delete after delete on data_pengukuran
+begin
+    update anak set revisi = revisi + 1 where id_anak = old.id_anak;
+end;
+""".replace("{score_columns}", ",\n    ".join(f"{col} {kind}" for col, kind in SCORE_COLUMN_TYPES.items()))
+
+
+def _monthly_count_rows(row: str) -> str:
+    """SELECT baris penghitung (bulan, jenis_kelamin, kolom, kategori) untuk pengukuran `row` (new/old/p)."""
+    categories = " union all ".join(f"select '{col}' as kolom, {row}.{col} as kategori" for col in CATEGORY_COLUMNS)
+    return (f"select strftime('%Y-%m-01', {row}.tanggal_pengukuran) as bulan, a.jenis_kelamin, k.kolom, "
+            f"coalesce(k.kategori, '-') as kategori from anak a, ({categories}) k "
+            f"where a.id_anak = {row}.id_anak and coalesce({row}.usia_bulan, 0) < 60 and {row}.{BIV_COLUMN} is null")
+
+
+# Tiruan supabase/migrations/20261018000700_prevalensi_bulanan.sql (+ 20261018000800_biv.sql)
+_INCREMENT = ("insert into prevalensi_bulanan (bulan, jenis_kelamin, kolom, kategori, jumlah) select *, 1 from ({rows}) "
+              "where true on conflict (bulan, jenis_kelamin, kolom, kategori) do update set jumlah = jumlah + 1;")
+_DECREMENT = ("update prevalensi_bulanan set jumlah = jumlah - 1 "
+              "where (bulan, jenis_kelamin, kolom, kategori) in ({rows});")
+SQLITE_MONTHLY_COUNT_SCHEMA = f"""
+create table if not exists prevalensi_bulanan (
+    bulan text not null,
+    jenis_kelamin text not null,
+    kolom text not null,
+    kategori text not null,
+    jumlah integer not null default 0,
+    primary key (bulan, jenis_kelamin, kolom, kategori)
+);
+create trigger if not exists data_pengukuran_prevalensi_insert after insert on data_pengukuran
+begin
+    {_INCREMENT.format(rows=_monthly_count_rows("new"))}
+end;
+create trigger if not exists data_pengukuran_prevalensi_update
+after update of tanggal_pengukuran, usia_bulan, id_anak, {", ".join(CATEGORY_COLUMNS + [BIV_COLUMN])} on data_pengukuran
+begin
+    {_DECREMENT.format(rows=_monthly_count_rows("old"))}
+    {_INCREMENT.format(rows=_monthly_count_rows("new"))}
+end;
+create trigger if not exists data_pengukuran_prevalensi_delete after delete on data_pengukuran
+begin
+    {_DECREMENT.format(rows=_monthly_count_rows("old"))}
+end;
+"""
+
+
+class SQLiteRepository(Repository):
+    """
+    Repository di atas file SQLite (mode WAL) dengan skema yang sama seperti Supabase.
+    Setiap thread memakai koneksinya sendiri, sehingga pembacaan paralel tidak saling menunggu.
+    """
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("pragma journal_mode=wal")
+            existing = {row['name'] for row in conn.execute("pragma table_info(data_pengukuran)")}
+            for col, kind in SCORE_COLUMN_TYPES.items(): # File lama sebelum ada kolom skor
+                if existing and col not in existing:
+                    conn.execute(f"alter table data_pengukuran add column {col} {kind}")
+            conn.executescript(SQLITE_SCHEMA)
+            has_counts = conn.execute("select 1 from sqlite_master where name = 'prevalensi_bulanan'").fetchone()
+            outdated = bool(existing) and BIV_COLUMN not in existing # Trigger penghitung lama belum mengecualikan BIV
+            if outdated:
+                for action in ('insert', 'update', 'delete'):
+                    conn.execute(f"drop trigger if exists data_pengukuran_prevalensi_{action}")
+            conn.executescript(SQLITE_MONTHLY_COUNT_SCHEMA)
+        if not has_counts or outdated: # File lama: isi penghitung bulanan dari data yang ada
+            self.rebuild_monthly_counts()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("pragma foreign_keys=on")
+            conn.execute("pragma synchronous=normal")
+            self._local.conn = conn
+        return conn
+
+    def _query(self, sql: str, params: Any = ()) -> List[Dict]:
+        return [dict(row) for row in self._conn().execute(sql, params).fetchall()]
+
+    def _write(self, sql: str, params: Any = ()) -> List[Dict]:
+        try:
+            with self._conn() as conn:
+                return [dict(row) for row in conn.execute(sql, params).fetchall()]
+        except sqlite3.IntegrityError as e:
+            raise RepositoryError(str(e)) from e
+
+    def list_children(self) -> List[Dict]:
+        return self._query(f"select {', '.join(CHILD_FIELDS)}, revisi from anak order by nama_anak, id_anak")
+
+    def get_child(self, id_anak: str) -> Optional[Dict]:
+        rows = self._query(f"select {', '.join(CHILD_FIELDS)}, revisi from anak where id_anak = ?", (id_anak,))
+        return rows[0] if rows else None
+
+    def get_revision(self, id_anak: str) -> int:
+        rows = self._query("select revisi from anak where id_anak = ?", (id_anak,))
+        return int(rows[0]['revisi']) if rows else 0
+
+    def get_history(self, id_anak: str) -> List[Dict]:
+        return self._query(f"select {', '.join(HISTORY_FIELDS)} from data_pengukuran "
+                           "where id_anak = ? order by tanggal_pengukuran, id", (id_anak,))
+
+    def get_measurements(self, ids: List[int]) -> List[Dict]:
+        marks = ", ".join("?" * len(ids))
+        return self._query(f"select * from data_pengukuran where id in ({marks})", list(ids))
+
+    def find_measurements(self, id_anak: List[str], tanggal: List[str]) -> List[Dict]:
+        marks_anak, marks_tanggal = ", ".join("?" * len(id_anak)), ", ".join("?" * len(tanggal))
+        return self._query(f"select id, id_anak, tanggal_pengukuran from data_pengukuran "
+                           f"where id_anak in ({marks_anak}) and tanggal_pengukuran in ({marks_tanggal})",
+                           list(id_anak) + list(tanggal))
+
+    def _insert(self, table: str, fields: List[str], records: List[Dict]) -> List[Dict]:
+        if not records:
+            return []
+        sql = (f"insert into {table} ({', '.join(fields)}) values ({', '.join(':' + f for f in fields)}) returning *")
+        try:
+            with self._conn() as conn: # Satu transaksi: semua baris tersimpan atau tidak sama sekali
+                return [dict(conn.execute(sql, {f: record.get(f) for f in fields}).fetchone()) for record in records]
+        except sqlite3.IntegrityError as e:
+            raise RepositoryError(str(e)) from e
+
+    def insert_children(self, records: List[Dict]) -> List[Dict]:
+        return self._insert("anak", CHILD_FIELDS, records)
+
+    def insert_measurements(self, records: List[Dict]) -> List[Dict]:
+        return self._insert("data_pengukuran", ['id_anak'] + ROW_FIELDS, records)
+
+    def update_measurement(self, row_id: int, data: Dict[str, Any]) -> List[Dict]:
+        sets = ", ".join(f"{field} = :{field}" for field in data)
+        return self._write(f"update data_pengukuran set {sets} where id = :id returning *", {**data, 'id': row_id})
+
+    def delete_measurements(self, ids: List[int]) -> List[Dict]:
+        marks = ", ".join("?" * len(ids))
+        return self._write(f"delete from data_pengukuran where id in ({marks}) returning *", list(ids))
+
+    def latest_measurements(self, id_anak: List[str]) -> List[Dict]:
+        marks = ", ".join("?" * len(id_anak))
+        return self._query(f"select {', '.join(LATEST_FIELDS)} from ("
+                           "select p.*, a.jenis_kelamin, a.tanggal_lahir, row_number() over "
+                           "(partition by p.id_anak order by p.tanggal_pengukuran desc, p.id desc) as urutan "
+                           f"from data_pengukuran p join anak a using (id_anak) where p.id_anak in ({marks}) and p.{BIV_COLUMN} is null"
+                           ") where urutan = 1", list(id_anak))
+
+    def measurements_since(self, since: str) -> List[Dict]:
+        return self._query(f"select p.id, {', '.join(VELOCITY_FIELDS[1:])} from data_pengukuran p join anak a using (id_anak) "
+                           "where p.tanggal_pengukuran >= ? order by p.id_anak, p.tanggal_pengukuran, p.id", (since,))
+
+    def monthly_counts(self, since: str) -> List[Dict]:
+        return self._query(f"select {', '.join(MONTHLY_COUNT_FIELDS)} from prevalensi_bulanan "
+                           "where bulan >= ? and jumlah > 0 order by bulan", (since,))
+
+    def rebuild_monthly_counts(self) -> int:
+        with self._conn() as conn:
+            conn.execute("delete from prevalensi_bulanan")
+            columns = " union all ".join(f"select '{col}' as kolom" for col in CATEGORY_COLUMNS)
+            category = " ".join(f"when '{col}' then p.{col}" for col in CATEGORY_COLUMNS)
+            conn.execute("insert into prevalensi_bulanan (bulan, jenis_kelamin, kolom, kategori, jumlah) "
+                         f"select strftime('%Y-%m-01', p.tanggal_pengukuran), a.jenis_kelamin, k.kolom, "
+                         f"coalesce(case k.kolom {category} end, '-'), count(*) "
+                         f"from data_pengukuran p join anak a using (id_anak), ({columns}) k "
+                         f"where coalesce(p.usia_bulan, 0) < 60 and p.{BIV_COLUMN} is null group by 1, 2, 3, 4")
+            return conn.execute("select count(*) from prevalensi_bulanan").fetchone()[0]
+
+    def list_unscored(self, version: str, limit: int) -> List[Dict]:
+        return self._query(f"select p.id, a.jenis_kelamin, a.tanggal_lahir, {', '.join(RESCORE_FIELDS[3:])} "
+                           "from data_pengukuran p join anak a using (id_anak) "
+                           "where p.referensi_versi is null or p.referensi_versi != ? order by p.id limit ?", (version, limit))
+
+    def apply_scores(self, rows: List[Dict]) -> int:
+        sets = ", ".join(f"{col} = :{col}" for col in SCORE_COLUMNS)
+        with self._conn() as conn:
+            conn.executemany(f"update data_pengukuran set {sets} where id = :id",
+                             [{'id': row['id'], **{col: row.get(col) for col in SCORE_COLUMNS}} for row in rows])
+        return len(rows)
+
+
+def load_credentials() -> Dict[str, str]:
+    """Mengambil URL dan key Supabase dari environment atau file secrets Streamlit."""
+    url, key = os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY")
+    if url and key:
+        return {"SUPABASE_URL": url, "SUPABASE_KEY": key}
+    secrets_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".streamlit", "secrets.toml")
+    with open(secrets_path, "rb") as f:
+        return tomllib.load(f)
+
+
+def connect() -> Client:
+    """Client Supabase dari load_credentials (dipakai create_repository dan alat CLI)."""
+    creds = load_credentials()
+    return create_client(creds["SUPABASE_URL"], creds["SUPABASE_KEY"])
+
+
+def create_repository(backend: Optional[str] = None, sqlite_path: Optional[str] = None) -> Repository:
+    """
+    Membuat repository sesuai konfigurasi (argumen, lalu env KMS_BACKEND / KMS_SQLITE_DB).
+    Untuk Supabase, kredensial dibaca lewat load_credentials (env atau .streamlit/secrets.toml).
+    """
+    backend = backend or os.environ.get("KMS_BACKEND", "supabase")
+    if backend == "sqlite":
+        return SQLiteRepository(sqlite_path or os.environ.get("KMS_SQLITE_DB", DEFAULT_SQLITE_PATH))
+    if backend == "supabase":
+        return SupabaseRepository(connect())
+    raise ValueError(f"Backend penyimpanan tidak dikenal: {backend} (pilih 'supabase' atau 'sqlite')")
@@ -0,0 +1,62 @@
+import argparse
+import sys
+
+import pandas as pd
+
+from kms_repository import create_repository
+from kms_zscore import BIV_COLUMN, calculate_scores_batch, reference_version, scores_to_records
+
+# ==============================================================================
+# HITUNG ULANG SKOR TERSIMPAN (LATAR BELAKANG)
+# ==============================================================================
+
+# Z-score dan kategori disimpan saat data ditulis (lihat kms_zscore.SCORE_COLUMNS). Jika tabel
+# referensi WHO atau rumus kategori berubah, cap reference_version() ikut berubah dan baris
+# lama perlu dihitung ulang sekali saja, di luar jalur baca:
+#   python kms_rescore.py              -> hitung ulang semua baris bercap lama/kosong
+#   python kms_rescore.py --dry-run    -> hanya tampilkan cap aktif dan apakah ada baris lama
+#   python kms_rescore.py --prevalensi -> hitung ulang juga penghitung prevalensi_bulanan
+#                                         (mis. setelah jenis kelamin anak dikoreksi)
+# Baris diproses per batch (satu request baca + satu request tulis per batch). Hitung ulang ini
+# juga menandai nilai tidak wajar (kolom biv) di data historis.
+
+BATCH_SIZE = 500
+
+
+def rescore(repository, batch_size: int = BATCH_SIZE) -> int:
+    """Menghitung ulang semua baris yang capnya berbeda dari reference_version(). Mengembalikan jumlah baris."""
+    version, total, flagged, last_ids = reference_version(), 0, 0, None
+    while True:
+        rows = repository.list_unscored(version, batch_size)
+        ids = [row['id'] for row in rows]
+        if not rows or ids == last_ids: # Tidak ada lagi (atau penulisan batch sebelumnya tidak berefek)
+            return total
+        df = pd.DataFrame(rows)
+        scores = calculate_scores_batch(df)
+        repository.apply_scores([{'id': row_id, **score} for row_id, score in zip(ids, scores_to_records(scores))])
+        total, last_ids = total + len(rows), ids
+        flagged += int(scores[BIV_COLUMN].notna().sum())
+        print(f"{total} baris dihitung ulang ({flagged} ditandai BIV)...")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Menghitung ulang z-score/kategori tersimpan yang capnya lama.")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help=f"Jumlah baris per batch (default {BATCH_SIZE})")
+    parser.add_argument("--dry-run", action="store_true", help="Hanya periksa, tidak menulis ke database")
+    parser.add_argument("--prevalensi", action="store_true", help="Hitung ulang penghitung prevalensi_bulanan")
+    args = parser.parse_args()
+
+    repository = create_repository()
+    print(f"Cap referensi aktif: {reference_version()}")
+    if args.dry_run:
+        pending = repository.list_unscored(reference_version(), args.batch)
+        print(f"{len(pending)}{'+' if len(pending) == args.batch else ''} baris perlu dihitung ulang.")
+        return 0
+    print(f"Selesai: {rescore(repository, args.batch)} baris dihitung ulang.")
+    if args.prevalensi:
+        print(f"Penghitung prevalensi bulanan dibangun ulang: {repository.rebuild_monthly_counts()} baris.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
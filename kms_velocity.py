@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from kms_zscore import BIV_COLUMN, DAYS_PER_MONTH, age_days_column
+
+# ==============================================================================
+# KECEPATAN PERTUMBUHAN DAN PENILAIAN NAIK/TIDAK NAIK (N/T/2T)
+# ==============================================================================
+
+# Kenaikan berat dan panjang/tinggi dihitung antara dua pengukuran berurutan untuk semua anak
+# sekaligus: baris diurutkan per (id_anak, tanggal), np.diff dihitung atas seluruh array, dan
+# selisih yang melewati batas dua anak dibuang dengan mask. Kenaikan dinormalkan per bulan
+# (DAYS_PER_MONTH hari) sehingga interval kunjungan yang tidak tepat sebulan tetap sebanding.
+#
+# Penilaian KMS: berat dinilai "N" (naik) jika kenaikannya >= Kenaikan Berat Minimal (KBM)
+# sesuai umur dikalikan lama interval, "T" jika kurang, "2T" jika T dua kali berturut-turut.
+# Kunjungan pertama ("B") dan kunjungan yang bulan sebelumnya tidak ditimbang ("O", interval
+# lebih dari MAX_INTERVAL_DAYS) tidak dinilai.
+
+# KBM (gram per bulan) menurut umur dalam bulan penuh: batas bawah umur -> KBM (Buku KIA/KMS)
+KBM_AGE_MONTHS = np.array([0, 1, 2, 3, 4, 5, 6, 8, 11])
+KBM_GRAMS = np.array([800, 800, 900, 800, 600, 500, 400, 300, 200])
+
+MIN_INTERVAL_DAYS = 20 # Interval lebih pendek dari ini terlalu bising untuk dinilai
+MAX_INTERVAL_DAYS = 62 # Lebih dari ~2 bulan: bulan lalu dianggap tidak ditimbang ("O")
+
+STATUS_LABELS = {"N": "Naik", "T": "Tidak naik", "2T": "Tidak naik 2x berturut-turut",
+                 "B": "Baru (kunjungan pertama)", "O": "Bulan lalu tidak ditimbang", "-": "Tidak dinilai"}
+VELOCITY_COLUMNS = ['selang_hari', 'kenaikan_berat_g', 'kbm_g', 'kenaikan_berat_g_per_bulan',
+                    'kenaikan_tinggi_cm_per_bulan', 'status_berat']
+
+
+def minimum_gain_grams(usia_bulan: np.ndarray) -> np.ndarray:
+    """KBM (gram/bulan) untuk umur dalam bulan penuh; umur kosong menghasilkan NaN."""
+    usia_bulan = np.asarray(usia_bulan, dtype=float)
+    index = np.searchsorted(KBM_AGE_MONTHS, np.nan_to_num(usia_bulan, nan=0), side='right') - 1
+    return np.where(np.isnan(usia_bulan), np.nan, KBM_GRAMS[np.clip(index, 0, len(KBM_GRAMS) - 1)])
+
+
+def compute_velocity(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Kenaikan berat/tinggi dan status N/T/2T/B/O untuk setiap baris `df` (satu atau banyak anak).
+    `df` berisi tanggal_pengukuran, berat_kg, tinggi_cm, dan usia_hari (atau tanggal_lahir);
+    tanpa kolom id_anak semua baris dianggap satu anak. Hasil berindeks sama dengan `df`
+    dengan kolom VELOCITY_COLUMNS.
+    """
+    order_keys = ['tanggal_pengukuran'] + (['id'] if 'id' in df.columns else [])
+    if 'id_anak' in df.columns:
+        order_keys = ['id_anak'] + order_keys
+    ordered = df.sort_values(order_keys, kind='stable')
+    n = len(ordered)
+
+    same_child = np.zeros(n, dtype=bool) # Baris i punya pengukuran sebelumnya milik anak yang sama
+    if n > 1:
+        ids = ordered['id_anak'].to_numpy() if 'id_anak' in ordered.columns else np.zeros(n)
+        same_child[1:] = ids[1:] == ids[:-1]
+
+    def increment(values: np.ndarray) -> np.ndarray:
+        diff = np.full(n, np.nan)
+        if n > 1:
+            diff[1:] = np.diff(values)
+        return np.where(same_child, diff, np.nan)
+
+    usia_hari = age_days_column(ordered)
+    berat = ordered['berat_kg'].to_numpy(dtype=float)
+    tinggi = ordered['tinggi_cm'].to_numpy(dtype=float)
+    selang = increment(usia_hari)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        per_month = np.where(selang > 0, DAYS_PER_MONTH / selang, np.nan)
+        kenaikan_g = increment(berat) * 1000
+        kbm = minimum_gain_grams(np.floor(usia_hari / DAYS_PER_MONTH))
+        # KBM per bulan dikalikan lama interval (dalam bulan) = kenaikan minimal untuk interval ini
+        naik = kenaikan_g >= kbm / per_month
+
+    assessable = same_child & (selang >= MIN_INTERVAL_DAYS) & (selang <= MAX_INTERVAL_DAYS) & ~np.isnan(kenaikan_g)
+    status = np.select(
+        [~same_child, same_child & (selang > MAX_INTERVAL_DAYS), ~assessable, naik],
+        ["B", "O", "-", "N"], "T").astype(object)
+    previous_t = np.zeros(n, dtype=bool)
+    previous_t[1:] = status[:-1] == "T"
+    status[(status == "T") & previous_t & same_child] = "2T"
+
+    result = pd.DataFrame({
+        'selang_hari': selang,
+        'kenaikan_berat_g': kenaikan_g,
+        'kbm_g': kbm,
+        'kenaikan_berat_g_per_bulan': kenaikan_g * per_month,
+        'kenaikan_tinggi_cm_per_bulan': increment(tinggi) * per_month,
+        'status_berat': status,
+    }, index=ordered.index)
+    return result.reindex(df.index)
+
+
+def not_gaining(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Anak yang pengukuran terakhirnya berstatus T atau 2T, dari riwayat banyak anak sekaligus.
+    Satu baris per anak (kolom input + VELOCITY_COLUMNS), 2T lebih dulu, lalu kenaikan terkecil.
+    Pengukuran bertanda BIV dilewati, sehingga selisih dihitung dari penimbangan wajar sebelumnya.
+    """
+    if BIV_COLUMN in df.columns:
+        df = df[df[BIV_COLUMN].isna()]
+    if df.empty:
+        return df.assign(**{col: [] for col in VELOCITY_COLUMNS})
+    scored = df.join(compute_velocity(df))
+    latest = scored.sort_values(['id_anak', 'tanggal_pengukuran']).groupby('id_anak', sort=False).tail(1)
+    flagged = latest[latest['status_berat'].isin(["T", "2T"])]
+    rank = (flagged['status_berat'] == "T").to_numpy() # 2T (False) lebih dulu
+    return flagged.iloc[np.lexsort((flagged['kenaikan_berat_g'].to_numpy(), rank))]
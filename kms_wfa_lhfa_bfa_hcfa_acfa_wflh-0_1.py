@@ -1,8 +1,43 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
 import pandas as pd
+import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
+from matplotlib.backends.backend_pdf import PdfPages
 from matplotlib.ticker import MultipleLocator
 
+from kms_import import parse_dates, read_sheet
+from kms_reference_store import load_reference_frame
+from kms_zscore import (BATCH_COLUMNS, BIV_COLUMN, DAYS_PER_MONTH, SCORE_COLUMNS, WFL_MAX_AGE_DAYS, calculate_age_days,
+                        calculate_scores_batch, classify_at_point, flag_implausible, months_to_days,
+                        months_to_days_float, sd_values_at)
+
+# ==============================================================================
+# TABEL STANDAR WHO (.XLSX)
+# ==============================================================================
+
+def read_reference(nama_file):
+    """
+    Tabel standar WHO dari kms_reference_store (dicari di folder repo, bukan folder kerja);
+    yang dikembalikan salinan agar aman diubah.
+    """
+    return load_reference_frame(nama_file).copy()
+
+def get_z_scores_at(indicator, kelamin, x_lms, poly_funcs, x_poly):
+    """
+    Mengambil nilai SD pada titik anak langsung dari tabel LMS harian di data/ (sama dengan kms_app).
+    Jika titik berada di luar rentang tabel, pakai kurva polinomial sebagai cadangan.
+    """
+    try:
+        return sd_values_at(indicator, kelamin, x_lms)
+    except ValueError:
+        return {col: func(x_poly) for col, func in poly_funcs.items()}
+
 # ==============================================================================
 # FUNGSI-FUNGSI UNTUK KURVA BERAT BADAN vs UMUR (WfA)
 # ==============================================================================
@@ -50,146 +85,141 @@ def get_settings_wfa(age_in_months):
             "age_range": "5-10 Tahun"
             }
 
-def get_interpretation_wfa(berat_anak, z_scores_at_age):
-    """Menentukan interpretasi untuk WfA."""
-    if berat_anak > z_scores_at_age['SD3']: return "Berat badan sangat lebih", 'red'
-    elif berat_anak > z_scores_at_age['SD2']: return "Berat badan lebih", 'yellow'
-    elif berat_anak >= z_scores_at_age['SD1']: return "Berat cukup normal", 'lightgreen'
-    elif berat_anak >= z_scores_at_age['SD1neg']: return "Berat badan normal", 'darkgreen'
-    elif berat_anak > z_scores_at_age['SD2neg']: return "Berat cukup normal", 'lightgreen'
-    elif berat_anak > z_scores_at_age['SD3neg']: return "Berat badan kurang", 'yellow'
-    else: return "Berat badan kurang (Underweight)", 'red'
+def draw_weight_for_age(kelamin, umur_anak, berat_anak):
+    """Menggambar kurva Berat Badan vs Umur untuk satu anak dan mengembalikan Figure-nya. Interpretasi dari kms_zscore.classify_at_point."""
+    settings = get_settings_wfa(umur_anak)
 
-def handle_weight_for_age():
-    """Fungsi utama untuk menangani semua logika kurva Berat Badan vs Umur."""
-    try:
-        kelamin, umur_anak, berat_anak = get_input_wfa()
-        settings = get_settings_wfa(umur_anak)
-        
-        gender_text = "Perempuan" if kelamin == 'P' else "Laki-laki"
+    gender_text = "Perempuan" if kelamin == 'P' else "Laki-laki"
+    nama_file = f"wfa_{'girls' if kelamin == 'P' else 'boys'}_0-to-5-years_zscores.xlsx"
+    judul = f'Grafik Berat Badan vs Umur - Anak {gender_text} ({settings["age_range"]})'
+
+
+    # Logika untuk memilih file dan pengaturan berdasarkan USIA
+    if umur_anak <= 60:
         nama_file = f"wfa_{'girls' if kelamin == 'P' else 'boys'}_0-to-5-years_zscores.xlsx"
         judul = f'Grafik Berat Badan vs Umur - Anak {gender_text} ({settings["age_range"]})'
+    else: # Usia > 24 bulan
+        nama_file = f"wfa_{'girls' if kelamin == 'P' else 'boys'}_5-to-10-years_zscores.xlsx"
+        judul = f'Grafik Berat Badan vs Umur - Anak {gender_text} ({settings["age_range"]})'
 
+    df = read_reference(nama_file)
+    #df = df.rename(columns={'SD-2': 'SD_2', 'SD-3': 'SD_3'}).sort_values(by='Month').drop_duplicates(subset='Month')
 
-        # Logika untuk memilih file dan pengaturan berdasarkan USIA
-        if umur_anak <= 60:
-            nama_file = f"wfa_{'girls' if kelamin == 'P' else 'boys'}_0-to-5-years_zscores.xlsx"
-            judul = f'Grafik Berat Badan vs Umur - Anak {gender_text} ({settings["age_range"]})'
-        else: # Usia > 24 bulan
-            nama_file = f"wfa_{'girls' if kelamin == 'P' else 'boys'}_5-to-10-years_zscores.xlsx"
-            judul = f'Grafik Berat Badan vs Umur - Anak {gender_text} ({settings["age_range"]})'
+    x_original = df['Month']
+    z_cols = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
+    poly_funcs = {col: np.poly1d(np.polyfit(x_original, df[col], 5)) for col in z_cols}
 
-        df = pd.read_excel(nama_file)
-        #df = df.rename(columns={'SD-2': 'SD_2', 'SD-3': 'SD_3'}).sort_values(by='Month').drop_duplicates(subset='Month')
+    x_smooth = np.linspace(x_original.min(), x_original.max(), 500)
+    smooth_data = {col: func(x_smooth) for col, func in poly_funcs.items()}
 
-        x_original = df['Month']
-        z_cols = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
-        poly_funcs = {col: np.poly1d(np.polyfit(x_original, df[col], 5)) for col in z_cols}
+    fig, ax = plt.subplots(figsize=(12, 7))
 
-        x_smooth = np.linspace(x_original.min(), x_original.max(), 500)
-        smooth_data = {col: func(x_smooth) for col, func in poly_funcs.items()}
-        
-        fig, ax = plt.subplots(figsize=(12, 7))
+    # --- TAMBAHKAN BARIS INI ---
+    # Mengatur warna latar belakang Figure menjadi biru muda
+    if kelamin == 'L':
+        fig.set_facecolor('steelblue')#fig.set_facecolor('darkturquoise') deepskyblue dodgerblue
+    else:
+        fig.set_facecolor('hotpink')
+    # ---------------------------
 
-        # --- TAMBAHKAN BARIS INI ---
-        # Mengatur warna latar belakang Figure menjadi biru muda
-        if kelamin == 'L':
-            fig.set_facecolor('steelblue')#fig.set_facecolor('darkturquoise') deepskyblue dodgerblue
-        else:
-            fig.set_facecolor('hotpink')
-        # ---------------------------
-        
-        ax.fill_between(x_smooth, smooth_data['SD3neg'], smooth_data['SD2neg'], color='yellow', alpha=0.5)
-        ax.fill_between(x_smooth, smooth_data['SD2neg'], smooth_data['SD1neg'], color='lightgreen', alpha=0.4)
-        ax.fill_between(x_smooth, smooth_data['SD1neg'], smooth_data['SD1'], color='darkgreen', alpha=0.4)
-        ax.fill_between(x_smooth, smooth_data['SD1'], smooth_data['SD2'], color='lightgreen', alpha=0.5)
-        ax.fill_between(x_smooth, smooth_data['SD2'], smooth_data['SD3'], color='yellow', alpha=0.5)
-        
-        for col, data in smooth_data.items():
-            ax.plot(x_smooth, data, color='black' if col not in ['SD3neg', 'SD3'] else 'red', lw=1)
-        
-        ax.scatter(umur_anak, berat_anak, marker='*', c='darkviolet', s=250, ec='black', zorder=10, label=f'Data Anak')
-        
-        z_scores_at_age = {col: func(umur_anak) for col, func in poly_funcs.items()}
-        interpretasi, warna = get_interpretation_wfa(berat_anak, z_scores_at_age)
-        props = dict(boxstyle='round', facecolor=warna, alpha=0.8)
-        ax.text(0.03, 0.97, f"Interpretasi: {interpretasi}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
-        
-        ax.set_title(judul, pad=20, fontsize=16, color='white', fontweight='bold')
-        if umur_anak > 60:
-            ax.set_xlabel('Umur', fontsize=12, color='white', labelpad=26)
-        else:
-            ax.set_xlabel('Umur (Bulan)', fontsize=12, color='white')
-        ax.set_ylabel('Berat Badan (kg)', fontsize=12, color='white')
-        ax.set_xlim(settings["xlim"]); ax.set_ylim(settings["ylim"])
-        ax.set_xticks(settings["xticks"]); ax.set_yticks(settings["yticks"])
-        #ax.grid(True, which='both', linestyle='--', linewidth=0.5)
-        # Gambar grid Y
-        ax.grid(which='major', axis='y', linestyle='-', linewidth='0.8', color='gray')
-        ax.grid(which='minor', axis='y', linestyle=':', linewidth='0.5', color='lightgray')
-
-        # 1. Buat sumbu Y kedua
-        ax2 = ax.twinx()
-        ax2.set_ylim(ax.get_ylim())
-        
-        ax.xaxis.set_major_locator(MultipleLocator(settings["x_major"]))
-        ax.xaxis.set_minor_locator(MultipleLocator(settings["x_minor"]))
-        ax.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
-        ax2.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
-        ax.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
-        ax2.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
-        
-        # 1. Nonaktifkan Spines (Frame) untuk KEDUA sumbu
-        for spine_position in ['top', 'bottom', 'left', 'right']:
-            ax.spines[spine_position].set_visible(False)
-            ax2.spines[spine_position].set_visible(False)
-        
-        ax.tick_params(which='minor', axis='x', length=0)
-        ax.tick_params(which='minor', axis='y', length=0)
-        ax.tick_params(which='major', axis='x', labelcolor='white', length=0)
-        ax.tick_params(which='major', axis='y', labelcolor='white', length=0)
-        ax2.tick_params(which='both', axis='y', labelcolor='white', length=0)#sumbu y ke-dua (sebelah kanan)
+    ax.fill_between(x_smooth, smooth_data['SD3neg'], smooth_data['SD2neg'], color='yellow', alpha=0.5)
+    ax.fill_between(x_smooth, smooth_data['SD2neg'], smooth_data['SD1neg'], color='lightgreen', alpha=0.4)
+    ax.fill_between(x_smooth, smooth_data['SD1neg'], smooth_data['SD1'], color='darkgreen', alpha=0.4)
+    ax.fill_between(x_smooth, smooth_data['SD1'], smooth_data['SD2'], color='lightgreen', alpha=0.5)
+    ax.fill_between(x_smooth, smooth_data['SD2'], smooth_data['SD3'], color='yellow', alpha=0.5)
 
-        ax.grid(which='major', linestyle='-', linewidth='0.8', color='gray')
-        ax.grid(which='minor', axis='y', linestyle=':', linewidth='0.7', color='gray')
+    for col, data in smooth_data.items():
+        ax.plot(x_smooth, data, color='black' if col not in ['SD3neg', 'SD3'] else 'red', lw=1)
 
-        
-        # --- LOGIKA KONDISIONAL UNTUK SUMBU X ---
-        if umur_anak > 60:
-            # === Pengaturan Manual untuk 5-10 Tahun ===
-            
-            # 1. Tentukan posisi Major Tick untuk penempatan grid utama (di setiap tahun)
-            major_x_ticks = [60, 72, 84, 96, 108, 120]
-            ax.set_xticks(major_x_ticks)
-            ax.grid(which='major', axis='x', linestyle='-', linewidth='0.8', color='gray')
-
-            # 2. Sembunyikan label default agar kita bisa gambar manual
-            ax.tick_params(axis='x', labelbottom=False)
-
-            # 3. Gambar label TAHUN secara manual
-            month_to_year = {60: '5', 72: '6', 84: '7', 96: '8', 108: '9', 120: '10'}
-            posisi_y_tahun = settings["ylim"][0] - 1.5  # Posisi Y untuk label tahun
-            
-            for bulan, tahun in month_to_year.items():
-                ax.text(bulan, posisi_y_tahun, tahun, ha='center', va='top', fontsize=12, color='white', fontweight='bold')
-                # Tambahkan teks "Tahun" di bawah angka
-                ax.text(bulan, posisi_y_tahun - 1.2, 'Tahun', ha='center', va='top', fontsize=8, color='white')
-
-            # 4. Gambar grid dan label BULAN minor (3, 6, 9)
-            posisi_y_bulan = settings["ylim"][0] - 0.8 # Posisi Y untuk label bulan
-            posisi_y_teks  = settings["ylim"][0] - 1.4 # Posisi Y untuk teks "Bulan"
-            for awal_tahun_bulan in range(60, 120, 12): # Loop per tahun (60, 72, 84, 96, 108)
-                for tambahan_bulan in [3, 6, 9]:
-                    posisi_x = awal_tahun_bulan + tambahan_bulan
-                    # Gambar garis grid minor vertikal
-                    ax.axvline(x=posisi_x, color='gray', linestyle=':', linewidth=0.7, zorder=0)
-                    # Gambar label bulan
-                    ax.text(posisi_x, posisi_y_bulan, str(tambahan_bulan), ha='center', va='top', fontsize=8, color='white')
-                    ax.text(posisi_x, posisi_y_teks, "Bulan", ha='center', va='top', fontsize=6, color='white')
+    ax.scatter(umur_anak, berat_anak, marker='*', c='darkviolet', s=250, ec='black', zorder=10, label=f'Data Anak')
 
-        
-        ax.legend(loc='lower right')
-        fig.tight_layout()
+    z_scores_at_age = get_z_scores_at('wfa', kelamin, months_to_days(umur_anak), poly_funcs, umur_anak)
+    interpretasi, warna = classify_at_point('wfa', berat_anak, z_scores_at_age)
+    props = dict(boxstyle='round', facecolor=warna, alpha=0.8)
+    ax.text(0.03, 0.97, f"Interpretasi: {interpretasi}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
+
+    ax.set_title(judul, pad=20, fontsize=16, color='white', fontweight='bold')
+    if umur_anak > 60:
+        ax.set_xlabel('Umur', fontsize=12, color='white', labelpad=26)
+    else:
+        ax.set_xlabel('Umur (Bulan)', fontsize=12, color='white')
+    ax.set_ylabel('Berat Badan (kg)', fontsize=12, color='white')
+    ax.set_xlim(settings["xlim"]); ax.set_ylim(settings["ylim"])
+    ax.set_xticks(settings["xticks"]); ax.set_yticks(settings["yticks"])
+    #ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+    # Gambar grid Y
+    ax.grid(which='major', axis='y', linestyle='-', linewidth='0.8', color='gray')
+    ax.grid(which='minor', axis='y', linestyle=':', linewidth='0.5', color='lightgray')
+
+    # 1. Buat sumbu Y kedua
+    ax2 = ax.twinx()
+    ax2.set_ylim(ax.get_ylim())
+
+    ax.xaxis.set_major_locator(MultipleLocator(settings["x_major"]))
+    ax.xaxis.set_minor_locator(MultipleLocator(settings["x_minor"]))
+    ax.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
+    ax2.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
+    ax.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
+    ax2.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
+
+    # 1. Nonaktifkan Spines (Frame) untuk KEDUA sumbu
+    for spine_position in ['top', 'bottom', 'left', 'right']:
+        ax.spines[spine_position].set_visible(False)
+        ax2.spines[spine_position].set_visible(False)
+
+    ax.tick_params(which='minor', axis='x', length=0)
+    ax.tick_params(which='minor', axis='y', length=0)
+    ax.tick_params(which='major', axis='x', labelcolor='white', length=0)
+    ax.tick_params(which='major', axis='y', labelcolor='white', length=0)
+    ax2.tick_params(which='both', axis='y', labelcolor='white', length=0)#sumbu y ke-dua (sebelah kanan)
+
+    ax.grid(which='major', linestyle='-', linewidth='0.8', color='gray')
+    ax.grid(which='minor', axis='y', linestyle=':', linewidth='0.7', color='gray')
+
+
+    # --- LOGIKA KONDISIONAL UNTUK SUMBU X ---
+    if umur_anak > 60:
+        # === Pengaturan Manual untuk 5-10 Tahun ===
+
+        # 1. Tentukan posisi Major Tick untuk penempatan grid utama (di setiap tahun)
+        major_x_ticks = [60, 72, 84, 96, 108, 120]
+        ax.set_xticks(major_x_ticks)
+        ax.grid(which='major', axis='x', linestyle='-', linewidth='0.8', color='gray')
+
+        # 2. Sembunyikan label default agar kita bisa gambar manual
+        ax.tick_params(axis='x', labelbottom=False)
+
+        # 3. Gambar label TAHUN secara manual
+        month_to_year = {60: '5', 72: '6', 84: '7', 96: '8', 108: '9', 120: '10'}
+        posisi_y_tahun = settings["ylim"][0] - 1.5  # Posisi Y untuk label tahun
+
+        for bulan, tahun in month_to_year.items():
+            ax.text(bulan, posisi_y_tahun, tahun, ha='center', va='top', fontsize=12, color='white', fontweight='bold')
+            # Tambahkan teks "Tahun" di bawah angka
+            ax.text(bulan, posisi_y_tahun - 1.2, 'Tahun', ha='center', va='top', fontsize=8, color='white')
+
+        # 4. Gambar grid dan label BULAN minor (3, 6, 9)
+        posisi_y_bulan = settings["ylim"][0] - 0.8 # Posisi Y untuk label bulan
+        posisi_y_teks  = settings["ylim"][0] - 1.4 # Posisi Y untuk teks "Bulan"
+        for awal_tahun_bulan in range(60, 120, 12): # Loop per tahun (60, 72, 84, 96, 108)
+            for tambahan_bulan in [3, 6, 9]:
+                posisi_x = awal_tahun_bulan + tambahan_bulan
+                # Gambar garis grid minor vertikal
+                ax.axvline(x=posisi_x, color='gray', linestyle=':', linewidth=0.7, zorder=0)
+                # Gambar label bulan
+                ax.text(posisi_x, posisi_y_bulan, str(tambahan_bulan), ha='center', va='top', fontsize=8, color='white')
+                ax.text(posisi_x, posisi_y_teks, "Bulan", ha='center', va='top', fontsize=6, color='white')
+
+
+    ax.legend(loc='lower right')
+    fig.tight_layout()
+    return fig
+
+def handle_weight_for_age():
+    """Fungsi utama untuk menangani semua logika kurva Berat Badan vs Umur."""
+    try:
+        kelamin, umur_anak, berat_anak = get_input_wfa()
+        draw_weight_for_age(kelamin, umur_anak, berat_anak)
         plt.show()
 
     except Exception as e:
@@ -239,105 +269,102 @@ def get_settings_wfh(age_in_months):
             "age_range": "24-60 Bulan"
             }
 
-def get_interpretation_wfh(berat_anak, z_scores_at_length):
-    """Menentukan interpretasi untuk WfH/WfL."""
-    if berat_anak > z_scores_at_length['SD3']: return "Gizi lebih (Obesitas)", 'red'
-    elif berat_anak > z_scores_at_length['SD2']: return "Berisiko gizi lebih (Overweight)", 'yellow'
-    elif berat_anak >= z_scores_at_length['SD2neg']: return "Gizi baik (Normal)", 'forestgreen'
-    elif berat_anak >= z_scores_at_length['SD3neg']: return "Gizi kurang (Wasting)", 'yellow'
-    else: return "Gizi buruk (Severe Wasting)", 'red'
+def draw_weight_for_height(kelamin, umur_anak, panjang_anak, berat_anak):
+    """Menggambar kurva Berat Badan vs Tinggi/Panjang untuk satu anak dan mengembalikan Figure-nya. Interpretasi dari kms_zscore.classify_at_point."""
+    #tambahan
+    settings = get_settings_wfh(umur_anak)
+
+    gender_text = "Perempuan" if kelamin == 'P' else "Laki-laki"
+
+    # Logika untuk memilih file dan pengaturan berdasarkan USIA
+    if umur_anak <= 24:
+        nama_file = f"wfl_{'girls' if kelamin == 'P' else 'boys'}_0-to-2-years_zscores.xlsx"
+        x_axis_label = "Panjang Badan (cm)"
+        judul = f'Grafik Berat Badan vs Panjang Badan - Anak {gender_text} (0-2 Tahun)'
+        x_col_name = 'Length'
+    else: # Usia > 24 bulan
+        nama_file = f"wfh_{'girls' if kelamin == 'P' else 'boys'}_2-to-5-years_zscores.xlsx"
+        x_axis_label = "Tinggi Badan (cm)"
+        judul = f'Grafik Berat Badan vs Tinggi Badan - Anak {gender_text} (2-5 Tahun)'
+        x_col_name = 'Height'
+
+    df = read_reference(nama_file)
+    df = df.rename(columns={x_col_name: 'PanjangTinggi'}).sort_values(by='PanjangTinggi').drop_duplicates(subset='PanjangTinggi')
+
+    x_original = df['PanjangTinggi']
+    z_cols = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
+    poly_funcs = {col: np.poly1d(np.polyfit(x_original, df[col], 5)) for col in z_cols}
+
+    x_smooth = np.linspace(x_original.min(), x_original.max(), 500)
+    smooth_data = {col: func(x_smooth) for col, func in poly_funcs.items()}
+
+    fig, ax = plt.subplots(figsize=(12, 7))
+
+    # --- TAMBAHKAN BARIS INI ---
+    # Mengatur warna latar belakang Figure menjadi biru muda
+    if kelamin == 'L':
+        fig.set_facecolor('steelblue')#fig.set_facecolor('darkturquoise') deepskyblue dodgerblue
+    else:
+        fig.set_facecolor('hotpink')
+    # ---------------------------
+
+    ax.fill_between(x_smooth, smooth_data['SD3neg'], smooth_data['SD2neg'], color='yellow', alpha=0.5)
+    ax.fill_between(x_smooth, smooth_data['SD2neg'], smooth_data['SD2'], color='green', alpha=0.4)
+    ax.fill_between(x_smooth, smooth_data['SD2'], smooth_data['SD3'], color='yellow', alpha=0.5)
+
+    for col, data in smooth_data.items():
+        ax.plot(x_smooth, data, color='black' if col not in ['SD3neg', 'SD3'] else 'red', lw=1)
+
+    ax.scatter(panjang_anak, berat_anak, marker='*', c='darkviolet', s=250, ec='black', zorder=10, label=f'Data Anak')
+
+    z_scores_at_length = get_z_scores_at('wfl' if months_to_days(umur_anak) < WFL_MAX_AGE_DAYS else 'wfh', kelamin, panjang_anak, poly_funcs, panjang_anak)
+    interpretasi, warna = classify_at_point('wflh', berat_anak, z_scores_at_length)
+    props = dict(boxstyle='round', facecolor=warna, alpha=0.8)
+    ax.text(0.03, 0.97, f"Status Gizi: {interpretasi}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
+
+    ax.set_title(judul, pad=20, fontsize=16, color='white', fontweight='bold')
+    ax.set_xlabel(x_axis_label, fontsize=12, color='white')
+    ax.set_ylabel('Berat Badan (kg)', fontsize=12, color='white')
+    ax.set_xlim(settings["xlim"]); ax.set_ylim(settings["ylim"])
+    ax.set_xticks(settings["xticks"]); ax.set_yticks(settings["yticks"])
+    ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+
+    # 1. Buat sumbu Y kedua
+    ax2 = ax.twinx()
+    ax2.set_ylim(ax.get_ylim())
+
+    ax.xaxis.set_major_locator(MultipleLocator(settings["x_major"]))
+    ax.xaxis.set_minor_locator(MultipleLocator(settings["x_minor"]))
+    ax.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
+    ax2.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
+    ax.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
+    ax2.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
+
+    # 1. Nonaktifkan Spines (Frame) untuk KEDUA sumbu
+    for spine_position in ['top', 'bottom', 'left', 'right']:
+        ax.spines[spine_position].set_visible(False)
+        ax2.spines[spine_position].set_visible(False)
+
+    # Mengatur Ticks (tanda) berdasarkan interval yang sudah ditentukan
+    ax.tick_params(which='minor', axis='x', length=0)
+    ax.tick_params(which='minor', axis='y', length=0)
+    ax.tick_params(which='major', axis='x', labelcolor='white', length=0)
+    ax.tick_params(which='major', axis='y', labelcolor='white', length=0)
+    ax2.tick_params(which='both', axis='y', labelcolor='white', length=0)#sumbu y ke-dua (sebelah kanan)
+
+    ax.grid(which='major', linestyle='-', linewidth='0.8', color='gray')
+    ax.grid(which='minor', axis='y', linestyle='-', linewidth='0.7', color='gray')
+
+    #ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+    ax.legend(loc='lower right')
+    fig.tight_layout()
+    return fig
 
 def handle_weight_for_height():
     """Fungsi utama untuk menangani semua logika kurva Berat Badan vs Tinggi/Panjang."""
     try:
         kelamin, umur_anak, panjang_anak, berat_anak = get_input_wfh()
-        #tambahan
-        settings = get_settings_wfh(umur_anak)
-        
-        gender_text = "Perempuan" if kelamin == 'P' else "Laki-laki"
-        
-        # Logika untuk memilih file dan pengaturan berdasarkan USIA
-        if umur_anak <= 24:
-            nama_file = f"wfl_{'girls' if kelamin == 'P' else 'boys'}_0-to-2-years_zscores.xlsx"
-            x_axis_label = "Panjang Badan (cm)"
-            judul = f'Grafik Berat Badan vs Panjang Badan - Anak {gender_text} (0-2 Tahun)'
-            x_col_name = 'Length'
-        else: # Usia > 24 bulan
-            nama_file = f"wfh_{'girls' if kelamin == 'P' else 'boys'}_2-to-5-years_zscores.xlsx"
-            x_axis_label = "Tinggi Badan (cm)"
-            judul = f'Grafik Berat Badan vs Tinggi Badan - Anak {gender_text} (2-5 Tahun)'
-            x_col_name = 'Height'
-
-        df = pd.read_excel(nama_file)
-        df = df.rename(columns={x_col_name: 'PanjangTinggi'}).sort_values(by='PanjangTinggi').drop_duplicates(subset='PanjangTinggi')
-        
-        x_original = df['PanjangTinggi']
-        z_cols = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
-        poly_funcs = {col: np.poly1d(np.polyfit(x_original, df[col], 5)) for col in z_cols}
-
-        x_smooth = np.linspace(x_original.min(), x_original.max(), 500)
-        smooth_data = {col: func(x_smooth) for col, func in poly_funcs.items()}
-        
-        fig, ax = plt.subplots(figsize=(12, 7))
-
-        # --- TAMBAHKAN BARIS INI ---
-        # Mengatur warna latar belakang Figure menjadi biru muda
-        if kelamin == 'L':
-            fig.set_facecolor('steelblue')#fig.set_facecolor('darkturquoise') deepskyblue dodgerblue
-        else:
-            fig.set_facecolor('hotpink')
-        # ---------------------------
-        
-        ax.fill_between(x_smooth, smooth_data['SD3neg'], smooth_data['SD2neg'], color='yellow', alpha=0.5)
-        ax.fill_between(x_smooth, smooth_data['SD2neg'], smooth_data['SD2'], color='green', alpha=0.4)
-        ax.fill_between(x_smooth, smooth_data['SD2'], smooth_data['SD3'], color='yellow', alpha=0.5)
-        
-        for col, data in smooth_data.items():
-            ax.plot(x_smooth, data, color='black' if col not in ['SD3neg', 'SD3'] else 'red', lw=1)
-        
-        ax.scatter(panjang_anak, berat_anak, marker='*', c='darkviolet', s=250, ec='black', zorder=10, label=f'Data Anak')
-        
-        z_scores_at_length = {col: func(panjang_anak) for col, func in poly_funcs.items()}
-        interpretasi, warna = get_interpretation_wfh(berat_anak, z_scores_at_length)
-        props = dict(boxstyle='round', facecolor=warna, alpha=0.8)
-        ax.text(0.03, 0.97, f"Status Gizi: {interpretasi}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
-        
-        ax.set_title(judul, pad=20, fontsize=16, color='white', fontweight='bold')
-        ax.set_xlabel(x_axis_label, fontsize=12, color='white')
-        ax.set_ylabel('Berat Badan (kg)', fontsize=12, color='white')
-        ax.set_xlim(settings["xlim"]); ax.set_ylim(settings["ylim"])
-        ax.set_xticks(settings["xticks"]); ax.set_yticks(settings["yticks"])
-        ax.grid(True, which='both', linestyle='--', linewidth=0.5)
-
-        # 1. Buat sumbu Y kedua
-        ax2 = ax.twinx()
-        ax2.set_ylim(ax.get_ylim())
-
-        ax.xaxis.set_major_locator(MultipleLocator(settings["x_major"]))
-        ax.xaxis.set_minor_locator(MultipleLocator(settings["x_minor"]))
-        ax.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
-        ax2.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
-        ax.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
-        ax2.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
-        
-        # 1. Nonaktifkan Spines (Frame) untuk KEDUA sumbu
-        for spine_position in ['top', 'bottom', 'left', 'right']:
-            ax.spines[spine_position].set_visible(False)
-            ax2.spines[spine_position].set_visible(False)
-        
-        # Mengatur Ticks (tanda) berdasarkan interval yang sudah ditentukan
-        ax.tick_params(which='minor', axis='x', length=0)
-        ax.tick_params(which='minor', axis='y', length=0)
-        ax.tick_params(which='major', axis='x', labelcolor='white', length=0)
-        ax.tick_params(which='major', axis='y', labelcolor='white', length=0)
-        ax2.tick_params(which='both', axis='y', labelcolor='white', length=0)#sumbu y ke-dua (sebelah kanan)
-
-        ax.grid(which='major', linestyle='-', linewidth='0.8', color='gray')
-        ax.grid(which='minor', axis='y', linestyle='-', linewidth='0.7', color='gray')
-
-        #ax.grid(True, which='both', linestyle='--', linewidth=0.5)
-        ax.legend(loc='lower right')
-        fig.tight_layout()
+        draw_weight_for_height(kelamin, umur_anak, panjang_anak, berat_anak)
         plt.show()
 
     except Exception as e:
@@ -394,116 +421,113 @@ def get_settings_bmi(age_in_months):
             "age_range": "24-60 Bulan"
             }
 
-def get_interpretation_bmi(bmi_anak, z_scores_at_age):
-    """Menentukan interpretasi untuk IMT. Logikanya sama dengan WfH."""
-    if bmi_anak > z_scores_at_age['SD3']: return "Gizi lebih (Obesitas)", 'red'
-    elif bmi_anak > z_scores_at_age['SD2']: return "Berisiko gizi lebih (Overweight)", 'yellow'
-    elif bmi_anak >= z_scores_at_age['SD2neg']: return "Gizi baik (Normal)", 'forestgreen'
-    elif bmi_anak >= z_scores_at_age['SD3neg']: return "Gizi kurang (Wasting)", 'yellow'
-    else: return "Gizi buruk (Severe Wasting)", 'red'
+def draw_bmi_for_age(kelamin, umur_anak, bmi_anak):
+    """Menggambar kurva IMT vs Umur untuk satu anak dan mengembalikan Figure-nya. Interpretasi dari kms_zscore.classify_at_point."""
+    settings = get_settings_bmi(umur_anak)
 
-def handle_bmi_for_age():
-    """Fungsi utama untuk menangani semua logika kurva IMT vs Umur."""
-    try:
-        kelamin, umur_anak, bmi_anak = get_input_bmi()
-        settings = get_settings_bmi(umur_anak)
-        
-        gender_text = "Perempuan" if kelamin == 'P' else "Laki-laki"
-        
-        # Memilih file berdasarkan usia
-        if umur_anak <= 24:
-            nama_file = f"bmi_{'girls' if kelamin == 'P' else 'boys'}_0-to-2-years_zscores.xlsx"
-        else:
-            nama_file = f"bmi_{'girls' if kelamin == 'P' else 'boys'}_2-to-5-years_zscores.xlsx"
-            
-        judul = f'Grafik IMT vs Umur - Anak {gender_text} ({settings["age_range"]})'
+    gender_text = "Perempuan" if kelamin == 'P' else "Laki-laki"
 
-        df = pd.read_excel(nama_file)
-        df = df.sort_values(by='Month').drop_duplicates(subset='Month')
+    # Memilih file berdasarkan usia
+    if umur_anak <= 24:
+        nama_file = f"bmi_{'girls' if kelamin == 'P' else 'boys'}_0-to-2-years_zscores.xlsx"
+    else:
+        nama_file = f"bmi_{'girls' if kelamin == 'P' else 'boys'}_2-to-5-years_zscores.xlsx"
 
-        x_original = df['Month']
-        z_cols = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
-        poly_funcs = {col: np.poly1d(np.polyfit(x_original, df[col], 5)) for col in z_cols}
-        
-        # Sumbu X untuk plot adalah seluruh rentang 0-60 bulan
-        x_smooth = np.linspace(0, 60, 500)
-        smooth_data = {col: func(x_smooth) for col, func in poly_funcs.items()}
-        
-        fig, ax = plt.subplots(figsize=(12, 7))
+    judul = f'Grafik IMT vs Umur - Anak {gender_text} ({settings["age_range"]})'
 
-        # --- TAMBAHKAN BARIS INI ---
-        # Mengatur warna latar belakang Figure menjadi biru muda
-        if kelamin == 'L':
-            fig.set_facecolor('steelblue')#fig.set_facecolor('darkturquoise') deepskyblue dodgerblue
-        else:
-            fig.set_facecolor('hotpink')
-        # ---------------------------
-        
-        # Mengisi area dan menggambar garis (sama seperti WfH)
-        ax.fill_between(x_smooth, smooth_data['SD3neg'], smooth_data['SD2neg'], color='yellow', alpha=0.5)
-        ax.fill_between(x_smooth, smooth_data['SD2neg'], smooth_data['SD2'], color='green', alpha=0.4)
-        ax.fill_between(x_smooth, smooth_data['SD2'], smooth_data['SD3'], color='yellow', alpha=0.5)
-        for col, data in smooth_data.items():
-            ax.plot(x_smooth, data, color='black' if col not in ['SD3neg', 'SD3'] else 'red', lw=1)
-
-        # Plot titik IMT anak
-        ax.scatter(umur_anak, bmi_anak, marker='*', c='darkviolet', s=250, ec='black', zorder=10, 
-                   label=f'Data Anak ({umur_anak} bln, {bmi_anak:.2f} IMT)')
-
-        # --- TAMBAHKAN BARIS INI ---
-        # Menambahkan label nilai IMT di samping titik
-        ax.text(umur_anak + 0.3,  # Posisi X: sedikit ke kanan dari titik
-                bmi_anak,         # Posisi Y: sejajar dengan titik
-                f'{bmi_anak:.2f} kg/m²', # Teks yang ditampilkan (IMT dengan 1 desimal)
-                fontsize=11,         # Ukuran font
-                color='darkviolet',   # Warna teks disamakan dengan warna titik
-                va='center')        # Vertical Alignment: center
-        # ---------------------------
-        
-        # Menambahkan interpretasi
-        z_scores_at_age = {col: func(umur_anak) for col, func in poly_funcs.items()}
-        interpretasi, warna = get_interpretation_bmi(bmi_anak, z_scores_at_age)
-        props = dict(boxstyle='round', facecolor=warna, alpha=0.8)
-        ax.text(0.03, 0.97, f"Status Gizi: {interpretasi}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
-        
-        # Kustomisasi Sumbu dan Grid
-        ax.set_title(judul, pad=20, fontsize=16, color='white', fontweight='bold')
-        ax.set_xlabel('Umur (Bulan)', fontsize=12, color='white')
-        ax.set_ylabel('IMT (kg/m²)', fontsize=12, color='white') # Label Y diubah menjadi IMT
-        ax.set_xlim(settings["xlim"]); ax.set_ylim(settings["ylim"])
-        ax.set_xticks(settings["xticks"]); ax.set_yticks(settings["yticks"])
-        ax.grid(True, which='both', linestyle='--', linewidth=0.5)
-        
-        # 1. Buat sumbu Y kedua
-        ax2 = ax.twinx()
-        ax2.set_ylim(ax.get_ylim())
-
-        ax.xaxis.set_major_locator(MultipleLocator(settings["x_major"]))
-        ax.xaxis.set_minor_locator(MultipleLocator(settings["x_minor"]))
-        ax.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
-        ax2.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
-        ax.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
-        ax2.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
-        
-        # 1. Nonaktifkan Spines (Frame) untuk KEDUA sumbu
-        for spine_position in ['top', 'bottom', 'left', 'right']:
-            ax.spines[spine_position].set_visible(False)
-            ax2.spines[spine_position].set_visible(False)
-        
-        # Mengatur Ticks (tanda) berdasarkan interval yang sudah ditentukan
-        ax.tick_params(which='minor', axis='x', length=0)
-        ax.tick_params(which='minor', axis='y', length=0)
-        ax.tick_params(which='major', axis='x', labelcolor='white', length=0)
-        ax.tick_params(which='major', axis='y', labelcolor='white', length=0)
-        ax2.tick_params(which='both', axis='y', labelcolor='white', length=0)#sumbu y ke-dua (sebelah kanan)
+    df = read_reference(nama_file)
+    df = df.sort_values(by='Month').drop_duplicates(subset='Month')
 
-        ax.grid(which='major', linestyle='-', linewidth='0.8', color='gray')
-        ax.grid(which='minor', axis='y', linestyle=':', linewidth='0.7', color='gray')
+    x_original = df['Month']
+    z_cols = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
+    poly_funcs = {col: np.poly1d(np.polyfit(x_original, df[col], 5)) for col in z_cols}
 
-        #ax.grid(True, which='both', linestyle='--', linewidth=0.5)
-        
-        ax.legend(loc='lower right')
-        fig.tight_layout()
+    # Sumbu X untuk plot adalah seluruh rentang 0-60 bulan
+    x_smooth = np.linspace(0, 60, 500)
+    smooth_data = {col: func(x_smooth) for col, func in poly_funcs.items()}
+
+    fig, ax = plt.subplots(figsize=(12, 7))
+
+    # --- TAMBAHKAN BARIS INI ---
+    # Mengatur warna latar belakang Figure menjadi biru muda
+    if kelamin == 'L':
+        fig.set_facecolor('steelblue')#fig.set_facecolor('darkturquoise') deepskyblue dodgerblue
+    else:
+        fig.set_facecolor('hotpink')
+    # ---------------------------
+
+    # Mengisi area dan menggambar garis (sama seperti WfH)
+    ax.fill_between(x_smooth, smooth_data['SD3neg'], smooth_data['SD2neg'], color='yellow', alpha=0.5)
+    ax.fill_between(x_smooth, smooth_data['SD2neg'], smooth_data['SD2'], color='green', alpha=0.4)
+    ax.fill_between(x_smooth, smooth_data['SD2'], smooth_data['SD3'], color='yellow', alpha=0.5)
+    for col, data in smooth_data.items():
+        ax.plot(x_smooth, data, color='black' if col not in ['SD3neg', 'SD3'] else 'red', lw=1)
+
+    # Plot titik IMT anak
+    ax.scatter(umur_anak, bmi_anak, marker='*', c='darkviolet', s=250, ec='black', zorder=10, 
+               label=f'Data Anak ({umur_anak} bln, {bmi_anak:.2f} IMT)')
+
+    # --- TAMBAHKAN BARIS INI ---
+    # Menambahkan label nilai IMT di samping titik
+    ax.text(umur_anak + 0.3,  # Posisi X: sedikit ke kanan dari titik
+            bmi_anak,         # Posisi Y: sejajar dengan titik
+            f'{bmi_anak:.2f} kg/m²', # Teks yang ditampilkan (IMT dengan 1 desimal)
+            fontsize=11,         # Ukuran font
+            color='darkviolet',   # Warna teks disamakan dengan warna titik
+            va='center')        # Vertical Alignment: center
+    # ---------------------------
+
+    # Menambahkan interpretasi
+    z_scores_at_age = get_z_scores_at('bfa', kelamin, months_to_days(umur_anak), poly_funcs, umur_anak)
+    interpretasi, warna = classify_at_point('bfa', bmi_anak, z_scores_at_age)
+    props = dict(boxstyle='round', facecolor=warna, alpha=0.8)
+    ax.text(0.03, 0.97, f"Status Gizi: {interpretasi}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
+
+    # Kustomisasi Sumbu dan Grid
+    ax.set_title(judul, pad=20, fontsize=16, color='white', fontweight='bold')
+    ax.set_xlabel('Umur (Bulan)', fontsize=12, color='white')
+    ax.set_ylabel('IMT (kg/m²)', fontsize=12, color='white') # Label Y diubah menjadi IMT
+    ax.set_xlim(settings["xlim"]); ax.set_ylim(settings["ylim"])
+    ax.set_xticks(settings["xticks"]); ax.set_yticks(settings["yticks"])
+    ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+
+    # 1. Buat sumbu Y kedua
+    ax2 = ax.twinx()
+    ax2.set_ylim(ax.get_ylim())
+
+    ax.xaxis.set_major_locator(MultipleLocator(settings["x_major"]))
+    ax.xaxis.set_minor_locator(MultipleLocator(settings["x_minor"]))
+    ax.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
+    ax2.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
+    ax.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
+    ax2.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
+
+    # 1. Nonaktifkan Spines (Frame) untuk KEDUA sumbu
+    for spine_position in ['top', 'bottom', 'left', 'right']:
+        ax.spines[spine_position].set_visible(False)
+        ax2.spines[spine_position].set_visible(False)
+
+    # Mengatur Ticks (tanda) berdasarkan interval yang sudah ditentukan
+    ax.tick_params(which='minor', axis='x', length=0)
+    ax.tick_params(which='minor', axis='y', length=0)
+    ax.tick_params(which='major', axis='x', labelcolor='white', length=0)
+    ax.tick_params(which='major', axis='y', labelcolor='white', length=0)
+    ax2.tick_params(which='both', axis='y', labelcolor='white', length=0)#sumbu y ke-dua (sebelah kanan)
+
+    ax.grid(which='major', linestyle='-', linewidth='0.8', color='gray')
+    ax.grid(which='minor', axis='y', linestyle=':', linewidth='0.7', color='gray')
+
+    #ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+
+    ax.legend(loc='lower right')
+    fig.tight_layout()
+    return fig
+
+def handle_bmi_for_age():
+    """Fungsi utama untuk menangani semua logika kurva IMT vs Umur."""
+    try:
+        kelamin, umur_anak, bmi_anak = get_input_bmi()
+        draw_bmi_for_age(kelamin, umur_anak, bmi_anak)
         plt.show()
 
     except Exception as e:
@@ -582,15 +606,157 @@ def get_settings_lhfa(age_in_months):
             "age_range_title": "2-5 Tahun"
         }
 
-def get_interpretation_lhfa(panjang_anak, z_scores_at_age):
-    """Menentukan interpretasi untuk stunting."""
-    # Pastikan kunci ada sebelum diakses
-    if 'SD2' not in z_scores_at_age or 'SD_2' not in z_scores_at_age or 'SD_3' not in z_scores_at_age:
-        return "Data tidak lengkap untuk interpretasi", "gray"
-    if panjang_anak > z_scores_at_age['SD2']: return "Tinggi", 'forestgreen'
-    elif panjang_anak >= z_scores_at_age['SD_2']: return "Normal", 'forestgreen'
-    elif panjang_anak >= z_scores_at_age['SD_3']: return "Pendek (Stunting)", 'yellow'
-    else: return "Sangat Pendek (Severe Stunting)", 'red'
+def draw_length_for_age(kelamin, umur_anak, panjang_anak):
+    """Menggambar kurva Panjang/Tinggi Badan vs Umur untuk satu anak dan mengembalikan Figure-nya. Interpretasi dari kms_zscore.classify_at_point."""
+    settings = get_settings_lhfa(umur_anak)
+
+    gender_text = "Perempuan" if kelamin == 'P' else "Laki-laki"
+    gender_file_key = 'girls' if kelamin == 'P' else 'boys'
+
+    # Logika untuk memilih dan menggabungkan data
+    if umur_anak <= 24:
+        # === PROSES KONSOLIDASI DATA UNTUK 0-24 BULAN ===
+        # 1. Baca kedua file data
+        file_mingguan = f"lhfa_{gender_file_key}_0-to-13-weeks_zscores.xlsx"
+        file_bulanan = f"lhfa_{gender_file_key}_0-to-2-years_zscores.xlsx"
+        df_mingguan = read_reference(file_mingguan)
+        df_bulanan = read_reference(file_bulanan)
+
+        # 2. Standarisasi Sumbu X: konversi minggu ke bulan
+        df_mingguan['Month'] = df_mingguan['Week'] / 4.345
+
+        # 3. Gabungkan kedua DataFrame
+        combined_df = pd.concat([df_mingguan, df_bulanan], ignore_index=True)
+
+        # 4. Bersihkan data: prioritaskan data mingguan (yang ada di urutan pertama)
+        combined_df = combined_df.sort_values(by='Month').drop_duplicates(subset='Month', keep='first')
+
+        x_original = combined_df['Month']
+        df_to_process = combined_df
+        #settings = {"xlim": (0, 24), "ylim": (45, 95), "age_range_title": "0-24 Bulan"}
+        judul = f'Grafik Panjang Badan vs Umur - Anak {gender_text} ({settings["age_range_title"]})'
+
+    else: # Usia > 24 bulan
+        # === PROSES UNTUK 2-5 TAHUN (TIDAK PERLU GABUNG DATA) ===
+        nama_file = f"lhfa_{gender_file_key}_2-to-5-years_zscores.xlsx"
+        df_tahunan = read_reference(nama_file)
+
+        x_original = df_tahunan['Month']
+        df_to_process = df_tahunan
+        #settings = {"xlim": (24, 60), "ylim": (80, 120), "age_range_title": "2-5 Tahun"}
+        judul = f'Grafik Tinggi Badan vs Umur - Anak {gender_text} ({settings["age_range_title"]})'
+
+    # --- Proses Pembuatan Model & Plotting (Berlaku untuk kedua kondisi) ---
+    rename_dict = {'SD-3': 'SD3neg', 'SD-2': 'SD2neg', 'SD-1': 'SD1neg'}
+    df_to_process = df_to_process.rename(columns=rename_dict)
+
+    z_cols = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
+    poly_funcs = {col: np.poly1d(np.polyfit(x_original, df_to_process[col], 3)) for col in z_cols}
+
+    x_smooth = np.linspace(x_original.min(), x_original.max(), 500)
+    smooth_data = {col: func(x_smooth) for col, func in poly_funcs.items()}
+
+    fig, ax = plt.subplots(figsize=(12, 7))
+
+    # --- TAMBAHKAN BARIS INI ---
+    # Mengatur warna latar belakang Figure menjadi biru muda
+    if kelamin == 'L':
+        fig.set_facecolor('steelblue')#fig.set_facecolor('darkturquoise') deepskyblue dodgerblue
+    else:
+        fig.set_facecolor('hotpink')
+    # ---------------------------
+
+    line_colors = {'SD3': 'black', 'SD2': 'red', 'SD1':'black', 'SD0': 'green', 'SD1neg':'black', 'SD2neg': 'red', 'SD3neg': 'black'}
+    for col, data in smooth_data.items():
+        if col in line_colors:
+            ax.plot(x_smooth, data, color=line_colors[col], lw=1.5)
+
+    ax.scatter(umur_anak, panjang_anak, marker='*', c='darkviolet', s=250, ec='black', zorder=10, label=f'Data Anak')
+
+    z_scores_at_age = get_z_scores_at('lhfa', kelamin, months_to_days(umur_anak), poly_funcs, umur_anak)
+    interpretasi, warna = classify_at_point('lhfa', panjang_anak, z_scores_at_age)
+
+    props = dict(boxstyle='round', facecolor=warna, alpha=0.8)
+    ax.text(0.03, 0.97, f"Interpretasi: {interpretasi}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
+
+    ax.set_title(judul, pad=20, fontsize=16, color='white', fontweight='bold')
+    if umur_anak <= 6:
+        ax.set_xlabel("Umur (Minggu atau Bulan)", fontsize=12, color='white', labelpad=22)
+    else:
+        ax.set_xlabel("Umur (Bulan)", fontsize=12, color='white')
+
+    if umur_anak >= 24:
+        ax.set_ylabel('Tinggi Badan (cm)', fontsize=12, color='white')
+    else:
+        ax.set_ylabel('Panjang Badan (cm)', fontsize=12, color='white')
+    ax.set_xlim(settings["xlim"]); ax.set_ylim(settings["ylim"])
+    ax.set_xticks(settings["xticks"]); ax.set_yticks(settings["yticks"])
+    ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+
+     # 1. Buat sumbu Y kedua
+    ax2 = ax.twinx()
+    ax2.set_ylim(ax.get_ylim())
+
+    #ax.xaxis.set_major_locator(MultipleLocator(settings["x_major"]))
+    #ax.xaxis.set_minor_locator(MultipleLocator(settings["x_minor"]))
+    ax.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
+    ax2.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
+    ax.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
+    ax2.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
+
+    # 1. Nonaktifkan Spines (Frame) untuk KEDUA sumbu
+    for spine_position in ['top', 'bottom', 'left', 'right']:
+        ax.spines[spine_position].set_visible(False)
+        ax2.spines[spine_position].set_visible(False)
+
+    # Mengatur Ticks (tanda) berdasarkan interval yang sudah ditentukan
+    ax.tick_params(which='minor', axis='x', length=0)
+    ax.tick_params(which='minor', axis='y', length=0)
+    ax.tick_params(which='major', axis='x', labelcolor='white', length=0)
+    ax.tick_params(which='major', axis='y', labelcolor='white', length=0)
+    ax2.tick_params(which='both', axis='y', labelcolor='white', length=0)#sumbu y ke-dua (sebelah kanan)
+
+    ax.grid(which='major', linestyle='-', linewidth='0.9', color='gray')
+    ax.grid(which='minor', axis='y', linestyle=':', linewidth='0.8', color='gray')
+
+
+    # 2. Atur Ticks dan Grid Sumbu X (kondisional)
+    if umur_anak <= 24:
+        # Untuk 0-6 bulan, kita atur tick manual dan grid spesial
+        major_x_ticks = [0, 3, 4, 5, 6]
+        ax.set_xticks(major_x_ticks)
+        ax.grid(which='major', axis='x', linestyle='-', linewidth='0.9', color='gray') # Grid utama
+
+        # Nonaktifkan label bawaan agar kita bisa menggambar manual
+        ax.tick_params(axis='x', labelbottom=False)
+
+        # --- KODE BARU: Menggambar label X secara manual ---
+        y_pos_normal = settings["ylim"][0] - 0.8  # Posisi Y untuk label '0'
+        y_pos_lower  = settings["ylim"][0] - 0.9  # Posisi Y lebih rendah untuk 3,4,5,6
+
+        for tick in major_x_ticks:
+            y_pos = y_pos_lower if tick in [3, 4, 5, 6] else y_pos_normal
+            ax.text(tick, y_pos, str(tick), ha='center', va='top', fontsize=12, color='white')
+
+        # Gambar 12 garis vertikal untuk 13 bagian antara 0-3 bulan
+        interval = 3.0 / 13.0
+        for i in range(1, 13):
+            ax.axvline(x=i * interval, color='lightgray', linestyle='-', linewidth=0.8, zorder=0)
+
+        # Loop untuk menempatkan setiap angka
+        y_min_limit = settings["ylim"][0]
+        for i in range(1, 14): # Loop dari 1 sampai 13
+            posisi_x = i * interval
+            label_text = str(i)
+            # Tempatkan teks sedikit di bawah garis sumbu x
+            ax.text(posisi_x, y_min_limit - 0.2, label_text, 
+                    ha='center', va='top', fontsize=8, color='white')
+        # -----------------------------------------------
+
+
+    ax.legend(loc='lower right')
+    fig.tight_layout()
+    return fig
 
 def handle_length_for_age():
     """
@@ -598,157 +764,7 @@ def handle_length_for_age():
     """
     try:
         kelamin, umur_anak, panjang_anak = get_input_lhfa()
-        settings = get_settings_lhfa(umur_anak)
-
-        gender_text = "Perempuan" if kelamin == 'P' else "Laki-laki"
-        gender_file_key = 'girls' if kelamin == 'P' else 'boys'
-
-        # Logika untuk memilih dan menggabungkan data
-        if umur_anak <= 24:
-            # === PROSES KONSOLIDASI DATA UNTUK 0-24 BULAN ===
-            # 1. Baca kedua file data
-            file_mingguan = f"lhfa_{gender_file_key}_0-to-13-weeks_zscores.xlsx"
-            file_bulanan = f"lhfa_{gender_file_key}_0-to-2-years_zscores.xlsx"
-            df_mingguan = pd.read_excel(file_mingguan)
-            df_bulanan = pd.read_excel(file_bulanan)
-
-            # 2. Standarisasi Sumbu X: konversi minggu ke bulan
-            df_mingguan['Month'] = df_mingguan['Week'] / 4.345
-
-            # 3. Gabungkan kedua DataFrame
-            combined_df = pd.concat([df_mingguan, df_bulanan], ignore_index=True)
-
-            # 4. Bersihkan data: prioritaskan data mingguan (yang ada di urutan pertama)
-            combined_df = combined_df.sort_values(by='Month').drop_duplicates(subset='Month', keep='first')
-            
-            x_original = combined_df['Month']
-            df_to_process = combined_df
-            #settings = {"xlim": (0, 24), "ylim": (45, 95), "age_range_title": "0-24 Bulan"}
-            judul = f'Grafik Panjang Badan vs Umur - Anak {gender_text} ({settings["age_range_title"]})'
-        
-        else: # Usia > 24 bulan
-            # === PROSES UNTUK 2-5 TAHUN (TIDAK PERLU GABUNG DATA) ===
-            nama_file = f"lhfa_{gender_file_key}_2-to-5-years_zscores.xlsx"
-            df_tahunan = pd.read_excel(nama_file)
-            
-            x_original = df_tahunan['Month']
-            df_to_process = df_tahunan
-            #settings = {"xlim": (24, 60), "ylim": (80, 120), "age_range_title": "2-5 Tahun"}
-            judul = f'Grafik Tinggi Badan vs Umur - Anak {gender_text} ({settings["age_range_title"]})'
-
-        # --- Proses Pembuatan Model & Plotting (Berlaku untuk kedua kondisi) ---
-        rename_dict = {'SD-3': 'SD3neg', 'SD-2': 'SD2neg', 'SD-1': 'SD1neg'}
-        df_to_process = df_to_process.rename(columns=rename_dict)
-        
-        z_cols = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
-        poly_funcs = {col: np.poly1d(np.polyfit(x_original, df_to_process[col], 3)) for col in z_cols}
-
-        x_smooth = np.linspace(x_original.min(), x_original.max(), 500)
-        smooth_data = {col: func(x_smooth) for col, func in poly_funcs.items()}
-        
-        fig, ax = plt.subplots(figsize=(12, 7))
-
-        # --- TAMBAHKAN BARIS INI ---
-        # Mengatur warna latar belakang Figure menjadi biru muda
-        if kelamin == 'L':
-            fig.set_facecolor('steelblue')#fig.set_facecolor('darkturquoise') deepskyblue dodgerblue
-        else:
-            fig.set_facecolor('hotpink')
-        # ---------------------------
-        
-        line_colors = {'SD3': 'black', 'SD2': 'red', 'SD1':'black', 'SD0': 'green', 'SD1neg':'black', 'SD2neg': 'red', 'SD3neg': 'black'}
-        for col, data in smooth_data.items():
-            if col in line_colors:
-                ax.plot(x_smooth, data, color=line_colors[col], lw=1.5)
-        
-        ax.scatter(umur_anak, panjang_anak, marker='*', c='darkviolet', s=250, ec='black', zorder=10, label=f'Data Anak')
-        
-        z_scores_at_age = {col: func(umur_anak) for col, func in poly_funcs.items()}
-        # Ganti nama kolom sementara untuk fungsi interpretasi
-        z_scores_at_age['SD_2'] = z_scores_at_age.get('SD2neg', None)
-        z_scores_at_age['SD_3'] = z_scores_at_age.get('SD3neg', None)
-        interpretasi, warna = get_interpretation_lhfa(panjang_anak, z_scores_at_age)
-        
-        props = dict(boxstyle='round', facecolor=warna, alpha=0.8)
-        ax.text(0.03, 0.97, f"Interpretasi: {interpretasi}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
-        
-        ax.set_title(judul, pad=20, fontsize=16, color='white', fontweight='bold')
-        if umur_anak <= 6:
-            ax.set_xlabel("Umur (Minggu atau Bulan)", fontsize=12, color='white', labelpad=22)
-        else:
-            ax.set_xlabel("Umur (Bulan)", fontsize=12, color='white')
-
-        if umur_anak >= 24:
-            ax.set_ylabel('Tinggi Badan (cm)', fontsize=12, color='white')
-        else:
-            ax.set_ylabel('Panjang Badan (cm)', fontsize=12, color='white')
-        ax.set_xlim(settings["xlim"]); ax.set_ylim(settings["ylim"])
-        ax.set_xticks(settings["xticks"]); ax.set_yticks(settings["yticks"])
-        ax.grid(True, which='both', linestyle='--', linewidth=0.5)
-
-         # 1. Buat sumbu Y kedua
-        ax2 = ax.twinx()
-        ax2.set_ylim(ax.get_ylim())
-
-        #ax.xaxis.set_major_locator(MultipleLocator(settings["x_major"]))
-        #ax.xaxis.set_minor_locator(MultipleLocator(settings["x_minor"]))
-        ax.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
-        ax2.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
-        ax.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
-        ax2.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
-
-        # 1. Nonaktifkan Spines (Frame) untuk KEDUA sumbu
-        for spine_position in ['top', 'bottom', 'left', 'right']:
-            ax.spines[spine_position].set_visible(False)
-            ax2.spines[spine_position].set_visible(False)
-        
-        # Mengatur Ticks (tanda) berdasarkan interval yang sudah ditentukan
-        ax.tick_params(which='minor', axis='x', length=0)
-        ax.tick_params(which='minor', axis='y', length=0)
-        ax.tick_params(which='major', axis='x', labelcolor='white', length=0)
-        ax.tick_params(which='major', axis='y', labelcolor='white', length=0)
-        ax2.tick_params(which='both', axis='y', labelcolor='white', length=0)#sumbu y ke-dua (sebelah kanan)
-
-        ax.grid(which='major', linestyle='-', linewidth='0.9', color='gray')
-        ax.grid(which='minor', axis='y', linestyle=':', linewidth='0.8', color='gray')
-        
-        
-        # 2. Atur Ticks dan Grid Sumbu X (kondisional)
-        if umur_anak <= 24:
-            # Untuk 0-6 bulan, kita atur tick manual dan grid spesial
-            major_x_ticks = [0, 3, 4, 5, 6]
-            ax.set_xticks(major_x_ticks)
-            ax.grid(which='major', axis='x', linestyle='-', linewidth='0.9', color='gray') # Grid utama
-            
-            # Nonaktifkan label bawaan agar kita bisa menggambar manual
-            ax.tick_params(axis='x', labelbottom=False)
-
-            # --- KODE BARU: Menggambar label X secara manual ---
-            y_pos_normal = settings["ylim"][0] - 0.8  # Posisi Y untuk label '0'
-            y_pos_lower  = settings["ylim"][0] - 0.9  # Posisi Y lebih rendah untuk 3,4,5,6
-            
-            for tick in major_x_ticks:
-                y_pos = y_pos_lower if tick in [3, 4, 5, 6] else y_pos_normal
-                ax.text(tick, y_pos, str(tick), ha='center', va='top', fontsize=12, color='white')
-
-            # Gambar 12 garis vertikal untuk 13 bagian antara 0-3 bulan
-            interval = 3.0 / 13.0
-            for i in range(1, 13):
-                ax.axvline(x=i * interval, color='lightgray', linestyle='-', linewidth=0.8, zorder=0)
-            
-            # Loop untuk menempatkan setiap angka
-            y_min_limit = settings["ylim"][0]
-            for i in range(1, 14): # Loop dari 1 sampai 13
-                posisi_x = i * interval
-                label_text = str(i)
-                # Tempatkan teks sedikit di bawah garis sumbu x
-                ax.text(posisi_x, y_min_limit - 0.2, label_text, 
-                        ha='center', va='top', fontsize=8, color='white')
-            # -----------------------------------------------
-        
-        
-        ax.legend(loc='lower right')
-        fig.tight_layout()
+        draw_length_for_age(kelamin, umur_anak, panjang_anak)
         plt.show()
 
     except Exception as e:
@@ -803,93 +819,234 @@ def get_settings_hcfa(age_in_months):
             "age_range_title": "2-5 Tahun"
         }
 
-def get_interpretation_hcfa(hc_anak, z_scores_at_age):
-    """Menentukan interpretasi untuk Lingkar Kepala."""
-    if hc_anak > z_scores_at_age['SD2']:
-        return "Makrosefali (Perlu evaluasi medis)", 'yellow'
-    elif hc_anak >= z_scores_at_age['SD2neg']:
-        return "Normal", 'forestgreen'
-    else: # hc_anak < z_scores_at_age['SD2neg']
-        return "Mikrosefali (Perlu evaluasi medis)", 'yellow'
+def draw_head_circumference_for_age(kelamin, umur_anak_bulan, hc_anak):
+    """Menggambar kurva Lingkar Kepala vs Umur untuk satu anak dan mengembalikan Figure-nya. Interpretasi dari kms_zscore.classify_at_point."""
+    settings = get_settings_hcfa(umur_anak_bulan)
 
-def handle_head_circumference_for_age():
-    """Fungsi utama yang menangani kurva Lingkar Kepala vs Umur."""
-    try:
-        kelamin, umur_anak_bulan, hc_anak = get_input_hcfa()
-        settings = get_settings_hcfa(umur_anak_bulan)
-        
-        gender_text = "Perempuan" if kelamin == 'P' else "Laki-laki"
-        gender_file_key = 'girls' if kelamin == 'P' else 'boys'
-        
-        judul = f'Grafik Lingkar Kepala vs Umur - Anak {gender_text} ({settings["age_range_title"]})'
+    gender_text = "Perempuan" if kelamin == 'P' else "Laki-laki"
+    gender_file_key = 'girls' if kelamin == 'P' else 'boys'
 
-        # === PROSES KONSOLIDASI DATA ===
-        file_mingguan = f"hcfa_{gender_file_key}_0-13-zscores.xlsx"
-        file_bulanan = f"hcfa_{gender_file_key}_0-5-zscores.xlsx"
-        df_mingguan = pd.read_excel(file_mingguan)
-        df_bulanan = pd.read_excel(file_bulanan)
-        df_mingguan['Month'] = df_mingguan['Week'] / 4.345
-        combined_df = pd.concat([df_mingguan, df_bulanan], ignore_index=True)
-        combined_df = combined_df.sort_values(by='Month').drop_duplicates(subset='Month', keep='first')
-        
-        x_original = combined_df['Month']
-        df_to_process = combined_df
+    judul = f'Grafik Lingkar Kepala vs Umur - Anak {gender_text} ({settings["age_range_title"]})'
 
-        rename_dict = {'SD-3': 'SD3neg', 'SD-2': 'SD2neg', 'SD-1': 'SD1neg'}
-        df_to_process = df_to_process.rename(columns=rename_dict)
-        
-        z_cols = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
-        poly_funcs = {col: np.poly1d(np.polyfit(x_original, df_to_process[col], 5)) for col in z_cols}
+    # === PROSES KONSOLIDASI DATA ===
+    file_mingguan = f"hcfa_{gender_file_key}_0-13-zscores.xlsx"
+    file_bulanan = f"hcfa_{gender_file_key}_0-to-5-years-zscores.xlsx"
+    df_mingguan = read_reference(file_mingguan)
+    df_bulanan = read_reference(file_bulanan)
+    df_mingguan['Month'] = df_mingguan['Week'] / 4.345
+    combined_df = pd.concat([df_mingguan, df_bulanan], ignore_index=True)
+    combined_df = combined_df.sort_values(by='Month').drop_duplicates(subset='Month', keep='first')
 
-        x_smooth = np.linspace(0, 60, 500) # Buat kurva untuk seluruh rentang
-        smooth_data = {col: func(x_smooth) for col, func in poly_funcs.items()}
-        
-        fig, ax = plt.subplots(figsize=(12, 7))
+    x_original = combined_df['Month']
+    df_to_process = combined_df
 
-        # --- TAMBAHKAN BARIS INI ---
-        # Mengatur warna latar belakang Figure menjadi biru muda
-        if kelamin == 'L':
-            fig.set_facecolor('steelblue')#fig.set_facecolor('darkturquoise') deepskyblue dodgerblue
-        else:
-            fig.set_facecolor('hotpink')
-        # ---------------------------
-        
-        # --- PLOTTING GAYA GARIS WHO ---
-        line_colors = {'SD3': 'black', 'SD2': 'red', 'SD1': 'orange', 'SD0': 'green', 'SD1neg': 'orange', 'SD2neg': 'red', 'SD3neg': 'black'}
-        for col, data in smooth_data.items():
-            if col in line_colors:
-                ax.plot(x_smooth, data, color=line_colors[col], lw=1.5)
-        
-        # Menambahkan label angka Z-score di ujung kanan garis
-        for col, data in smooth_data.items():
-            if col in ['SD3', 'SD2', 'SD0', 'SD2neg', 'SD3neg']:
-                label_text = col.replace('neg', '-').replace('SD', '')
-                ax.text(x_smooth[-1] + (settings['xlim'][1] * 0.01), data[-1], label_text, 
-                        color=line_colors[col], va='center', ha='left', fontweight='bold')
-        # --------------------------------
-
-        ax.scatter(umur_anak_bulan, hc_anak, marker='*', c='darkviolet', s=250, ec='black', zorder=10, label=f'Data Anak')
-        
-        z_scores_at_age = {col: func(umur_anak_bulan) for col, func in poly_funcs.items()}
-        interpretasi, warna = get_interpretation_hcfa(hc_anak, z_scores_at_age)
-        props = dict(boxstyle='round', facecolor=warna, alpha=0.8)
-        ax.text(0.03, 0.97, f"Interpretasi: {interpretasi}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
-        
-        # Kustomisasi Sumbu dan Grid
-        ax.set_title(judul, pad=20, fontsize=16, color='white', fontweight='bold')
-        ax.set_xlabel("Umur (Bulan)", fontsize=12)
-        ax.set_ylabel('Lingkar Kepala (cm)', fontsize=12)
-        ax.set_xlim(settings["xlim"]); ax.set_ylim(settings["ylim"])
-        ax.grid(True, which='both', linestyle='--', linewidth=0.5)
-        
-        ax.legend(loc='lower right')
-        fig.tight_layout()
+    rename_dict = {'SD-3': 'SD3neg', 'SD-2': 'SD2neg', 'SD-1': 'SD1neg'}
+    df_to_process = df_to_process.rename(columns=rename_dict)
+
+    z_cols = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
+    poly_funcs = {col: np.poly1d(np.polyfit(x_original, df_to_process[col], 5)) for col in z_cols}
+
+    x_smooth = np.linspace(0, 60, 500) # Buat kurva untuk seluruh rentang
+    smooth_data = {col: func(x_smooth) for col, func in poly_funcs.items()}
+
+    fig, ax = plt.subplots(figsize=(12, 7))
+
+    # --- TAMBAHKAN BARIS INI ---
+    # Mengatur warna latar belakang Figure menjadi biru muda
+    if kelamin == 'L':
+        fig.set_facecolor('steelblue')#fig.set_facecolor('darkturquoise') deepskyblue dodgerblue
+    else:
+        fig.set_facecolor('hotpink')
+    # ---------------------------
+
+    # --- PLOTTING GAYA GARIS WHO ---
+    line_colors = {'SD3': 'black', 'SD2': 'red', 'SD1': 'orange', 'SD0': 'green', 'SD1neg': 'orange', 'SD2neg': 'red', 'SD3neg': 'black'}
+    for col, data in smooth_data.items():
+        if col in line_colors:
+            ax.plot(x_smooth, data, color=line_colors[col], lw=1.5)
+
+    # Menambahkan label angka Z-score di ujung kanan garis
+    for col, data in smooth_data.items():
+        if col in ['SD3', 'SD2', 'SD0', 'SD2neg', 'SD3neg']:
+            label_text = col.replace('neg', '-').replace('SD', '')
+            ax.text(x_smooth[-1] + (settings['xlim'][1] * 0.01), data[-1], label_text, 
+                    color=line_colors[col], va='center', ha='left', fontweight='bold')
+    # --------------------------------
+
+    ax.scatter(umur_anak_bulan, hc_anak, marker='*', c='darkviolet', s=250, ec='black', zorder=10, label=f'Data Anak')
+
+    z_scores_at_age = get_z_scores_at('hcfa', kelamin, months_to_days(umur_anak_bulan), poly_funcs, umur_anak_bulan)
+    interpretasi, warna = classify_at_point('hcfa', hc_anak, z_scores_at_age)
+    props = dict(boxstyle='round', facecolor=warna, alpha=0.8)
+    ax.text(0.03, 0.97, f"Interpretasi: {interpretasi}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
+
+    # Kustomisasi Sumbu dan Grid
+    ax.set_title(judul, pad=20, fontsize=16, color='white', fontweight='bold')
+    ax.set_xlabel("Umur (Bulan)", fontsize=12)
+    ax.set_ylabel('Lingkar Kepala (cm)', fontsize=12)
+    ax.set_xlim(settings["xlim"]); ax.set_ylim(settings["ylim"])
+    ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+
+    ax.legend(loc='lower right')
+    fig.tight_layout()
+    return fig
+
+def handle_head_circumference_for_age():
+    """Fungsi utama yang menangani kurva Lingkar Kepala vs Umur."""
+    try:
+        kelamin, umur_anak_bulan, hc_anak = get_input_hcfa()
+        draw_head_circumference_for_age(kelamin, umur_anak_bulan, hc_anak)
         plt.show()
 
     except Exception as e:
         print(f"\nError pada proses HCFA: {e}")
 1
 
+# ==============================================================================
+# MODE BATCH (TANPA INTERAKSI)
+# ==============================================================================
+
+# Menilai satu register anak sekaligus, tanpa input() dan plt.show():
+#   python kms_wfa_lhfa_bfa_hcfa_acfa_wflh-0_1.py batch register.xlsx [-o hasil.csv]
+#          [--grafik FOLDER] [--format png|pdf] [--proses N]
+# Header kolom sama dengan impor massal (kms_import.COLUMN_ALIASES): jenis_kelamin, berat_kg,
+# tinggi_cm, lingkar_kepala_cm, dan umur dari tanggal_lahir + tanggal_pengukuran atau kolom
+# usia_bulan. Z-score, kategori, dan tanda BIV seluruh baris dihitung sekaligus oleh kms_zscore
+# (tabel klasifikasi yang sama dengan aplikasi Streamlit). Grafik per anak (opsional) memakai
+# fungsi draw_* yang sama dengan menu interaktif, sehingga interpretasinya sama dengan kolom
+# kategori; grafik dirender paralel di ProcessPoolExecutor, setiap proses membuka tabel referensi sekali.
+
+AGE_BASED_MAX_MONTHS = 60 # Batas atas tabel harian kms_zscore untuk indikator berbasis umur
+AGE_BASED_SCORES = [f"{prefix}_{code}" for code in ('wfa', 'lhfa', 'bfa', 'hcfa') for prefix in ('zscore', 'kategori')]
+
+# Jenis grafik -> (fungsi gambar, kolom nilai untuk fungsi gambar, umur maksimal dalam bulan)
+BATCH_CHARTS = {
+    'wfa': (draw_weight_for_age, ['berat_kg'], AGE_BASED_MAX_MONTHS),
+    'wfh': (draw_weight_for_height, ['tinggi_cm', 'berat_kg'], 120), # Berbasis tinggi badan, dinilai juga di atas 60 bulan
+    'bmi': (draw_bmi_for_age, ['bmi'], AGE_BASED_MAX_MONTHS),
+    'lhfa': (draw_length_for_age, ['tinggi_cm'], AGE_BASED_MAX_MONTHS),
+    'hcfa': (draw_head_circumference_for_age, ['lingkar_kepala_cm'], AGE_BASED_MAX_MONTHS),
+}
+REGISTER_COLUMNS = ['id_anak', 'nama_anak', 'jenis_kelamin', 'tanggal_lahir', 'tanggal_pengukuran', 'usia_bulan',
+                    'berat_kg', 'tinggi_cm', 'lingkar_kepala_cm']
+OUTPUT_COLUMNS = ['baris'] + REGISTER_COLUMNS + ['bmi'] + SCORE_COLUMNS + ['pesan']
+
+def score_register(raw):
+    """Z-score, kategori, dan tanda BIV untuk seluruh baris register; baris yang tidak bisa dinilai diberi pesan."""
+    df = raw.rename(columns={'umur_bulan': 'usia_bulan', 'umur': 'usia_bulan'})
+    for col in REGISTER_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+    df['jenis_kelamin'] = df['jenis_kelamin'].astype("string").str.strip().str.upper().str[:1].fillna("")
+    for col in ['usia_bulan', 'berat_kg', 'tinggi_cm', 'lingkar_kepala_cm']:
+        df[col] = pd.to_numeric(df[col].astype("string").str.replace(",", ".", regex=False), errors='coerce')
+    df['tanggal_lahir'] = parse_dates(df['tanggal_lahir'])
+    df['tanggal_pengukuran'] = parse_dates(df['tanggal_pengukuran'])
+
+    # Umur presisi hari dari tanggal; tanpa tanggal, dari kolom usia_bulan (seperti input menu interaktif)
+    usia_hari = calculate_age_days(df['tanggal_lahir'], df['tanggal_pengukuran'])
+    df['usia_hari'] = np.where(np.isnan(usia_hari), months_to_days_float(df['usia_bulan']), usia_hari)
+    df['usia_bulan'] = (df['usia_hari'] / DAYS_PER_MONTH).round(2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tinggi_m = df['tinggi_cm'].to_numpy(dtype=float) / 100
+        df['bmi'] = np.where(tinggi_m > 0, df['berat_kg'].to_numpy(dtype=float) / tinggi_m ** 2, np.nan)
+
+    df['pesan'] = np.select(
+        [~df['jenis_kelamin'].isin(['L', 'P']), df['usia_hari'].isna(), df['usia_hari'] < 0],
+        ["Jenis kelamin harus L/P", "Umur tidak diketahui: isi tanggal_lahir + tanggal_pengukuran atau usia_bulan",
+         "Tanggal pengukuran sebelum tanggal lahir"], "")
+    scores = calculate_scores_batch(df)
+    invalid = df['pesan'] != ""
+    scores.loc[invalid, SCORE_COLUMNS] = None
+    df['dinilai'] = ~invalid
+    # Di atas 60 bulan hanya BB/TB (berbasis tinggi badan) yang dinilai dan digambar; batasnya sama dengan
+    # BATCH_CHARTS agar tabel hasil dan grafik selalu sepakat.
+    over_age = ~invalid & (df['usia_bulan'] > AGE_BASED_MAX_MONTHS)
+    scores.loc[over_age, AGE_BASED_SCORES] = None
+    scores[BIV_COLUMN] = flag_implausible({col: scores[col].to_numpy(dtype=float) for col in BATCH_COLUMNS})
+    df.loc[over_age, 'pesan'] = (f"Umur di atas {AGE_BASED_MAX_MONTHS} bulan: BB/U, TB/U, IMT/U, dan LK/U "
+                                 "tidak dinilai (standar WHO 0-5 tahun)")
+    return pd.concat([df.drop(columns=[col for col in SCORE_COLUMNS if col in df.columns]), scores], axis=1)
+
+def chart_jobs(results):
+    """Satu job per baris yang bisa digambar: (nama file, jenis kelamin, umur bulan, {grafik: nilai})."""
+    names = results['id_anak'].astype("string").fillna("").str.replace(r"[^0-9A-Za-z_-]+", "_", regex=True)
+    names = names.where(names != "", "baris" + results['baris'].astype(str))
+    names = names.where(~names.duplicated(keep=False), names + "_" + results['baris'].astype(str))
+    jobs = []
+    for row, name in zip(results.to_dict('records'), names):
+        if not row['dinilai']:
+            continue
+        charts = {}
+        for key, (_, value_cols, max_age) in BATCH_CHARTS.items():
+            values = [row[col] for col in value_cols]
+            if not 0 <= row['usia_bulan'] <= max_age or any(pd.isna(v) or v <= 0 for v in values):
+                continue
+            if key == 'wfh' and not 45 <= row['tinggi_cm'] <= 120: # Rentang tabel WFL/WFH
+                continue
+            charts[key] = values
+        if charts:
+            # Umur tanpa pembulatan, agar grafik memakai hari yang sama dengan kolom kategori
+            jobs.append((name, row['jenis_kelamin'], float(row['usia_hari'] / DAYS_PER_MONTH), charts))
+    return jobs
+
+def _init_chart_worker():
+    matplotlib.use("Agg")
+
+def render_child_charts(job, folder, file_format):
+    """Merender semua grafik satu anak (PNG per grafik atau satu PDF per anak); mengembalikan (nama, error)."""
+    name, kelamin, umur_bulan, charts = job
+    figures, errors = [], []
+    for key, values in charts.items():
+        try:
+            figures.append((key, BATCH_CHARTS[key][0](kelamin, umur_bulan, *values)))
+        except Exception as e:
+            errors.append(f"{key}: {e}")
+    if file_format == "pdf" and figures:
+        with PdfPages(os.path.join(folder, f"{name}.pdf")) as pdf:
+            for _, fig in figures:
+                pdf.savefig(fig)
+    elif file_format == "png":
+        for key, fig in figures:
+            fig.savefig(os.path.join(folder, f"{name}_{key}.png"))
+    for _, fig in figures:
+        plt.close(fig)
+    return name, errors
+
+def run_batch(args):
+    """Perintah `batch`: register -> file hasil (+ grafik per anak)."""
+    matplotlib.use("Agg")
+    results = score_register(read_sheet(args.register))
+    output = args.output or os.path.splitext(args.register)[0] + "_hasil.csv"
+    table = results[OUTPUT_COLUMNS].copy()
+    for col in ['tanggal_lahir', 'tanggal_pengukuran']:
+        table[col] = table[col].dt.strftime('%Y-%m-%d')
+    table['bmi'] = table['bmi'].round(2)
+    if output.lower().endswith(".xlsx"):
+        table.to_excel(output, index=False)
+    else:
+        table.to_csv(output, index=False)
+    print(f"{len(table)} baris dinilai ({int((~results['dinilai']).sum())} tidak bisa dinilai, "
+          f"{int(table[BIV_COLUMN].notna().sum())} bernilai tidak wajar/BIV) -> {output}")
+
+    if args.grafik:
+        os.makedirs(args.grafik, exist_ok=True)
+        jobs = chart_jobs(results)
+        failed = 0
+        with ProcessPoolExecutor(max_workers=args.proses, initializer=_init_chart_worker) as pool:
+            rendered = pool.map(render_child_charts, jobs, repeat(args.grafik), repeat(args.format), chunksize=8)
+            for done, (name, errors) in enumerate(rendered, start=1):
+                for error in errors:
+                    print(f"  {name}: gagal menggambar {error}")
+                failed += len(errors)
+                if done % 100 == 0 or done == len(jobs):
+                    print(f"{done}/{len(jobs)} anak selesai digambar...")
+        if failed:
+            print(f"{failed} grafik gagal digambar; grafik lainnya tersimpan di {args.grafik}", file=sys.stderr)
+            return 1
+        print(f"Grafik tersimpan di {args.grafik}")
+    return 0
+
 # ==============================================================================
 # FUNGSI UTAMA (MAIN MENU)
 # ==============================================================================
@@ -926,5 +1083,22 @@ def main_menu():
         else:
             print("Pilihan tidak valid, silakan coba lagi.")
 
+def main(argv=None):
+    """Tanpa argumen: menu interaktif. `batch REGISTER`: menilai register anak tanpa interaksi."""
+    parser = argparse.ArgumentParser(description="Kurva pertumbuhan anak WHO (tanpa argumen: menu interaktif).")
+    commands = parser.add_subparsers(dest="perintah")
+    batch = commands.add_parser("batch", help="Menilai register anak (.csv/.xlsx) tanpa interaksi")
+    batch.add_argument("register", help="File register anak (.csv atau .xlsx)")
+    batch.add_argument("-o", "--output", help="File hasil .csv atau .xlsx (default: <register>_hasil.csv)")
+    batch.add_argument("--grafik", metavar="FOLDER", help="Simpan grafik per anak ke folder ini")
+    batch.add_argument("--format", choices=["png", "pdf"], default="png", help="png: satu file per grafik; pdf: satu file per anak")
+    batch.add_argument("--proses", type=int, default=None, help="Jumlah proses render grafik (default: jumlah CPU)")
+    args = parser.parse_args(argv)
+
+    if args.perintah == "batch":
+        return run_batch(args)
+    main_menu()
+    return 0
+
 if __name__ == '__main__':
-    main_menu()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
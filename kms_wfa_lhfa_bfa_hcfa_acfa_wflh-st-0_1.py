@@ -1,8 +1,70 @@
+import threading
+
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 import streamlit as st
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from matplotlib.ticker import MultipleLocator
+from kms_poly_cache import cached_polyfit
+from kms_reference_store import load_reference_frame
+from kms_zscore import WFL_MAX_AGE_DAYS, classify_at_point, months_to_days, sd_values_at
+
+# ==============================================================================
+# NILAI REFERENSI WHO PADA TITIK ANAK
+# ==============================================================================
+
+def get_z_scores_at(indicator, kelamin, x_lms, poly_funcs, x_poly):
+    """
+    Mengambil nilai SD pada titik anak langsung dari tabel LMS harian di data/.
+    Jika titik berada di luar rentang tabel, pakai kurva polinomial sebagai cadangan.
+    """
+    try:
+        return sd_values_at(indicator, kelamin, x_lms)
+    except ValueError:
+        return {col: func(x_poly) for col, func in poly_funcs.items()}
+
+# ==============================================================================
+# CACHE LATAR GRAFIK STATIS
+# ==============================================================================
+
+# Pita SD, sumbu kembar, grid, dan label ax.text per bulan (5-10 tahun) sama untuk semua anak:
+# dirender sekali per (grafik, jenis kelamin, rentang, file standar) lalu disimpan sebagai region
+# piksel. Per request hanya titik anak, kotak interpretasi, dan legenda yang digambar di atasnya.
+
+@st.cache_resource
+def get_chart_background_registry():
+    """Registri latar grafik yang bertahan lintas rerun dan sesi."""
+    return {"items": {}, "lock": threading.Lock()}
+
+def render_on_background(key, draw_background, draw_overlay):
+    """
+    Mengembalikan piksel RGBA grafik: latar `key` (dibuat sekali dengan draw_background(fig) -> ax)
+    ditimpa artist yang dikembalikan draw_overlay(ax).
+    """
+    registry = get_chart_background_registry()
+    entry = registry["items"].get(key)
+    if entry is None:
+        with registry["lock"]:
+            entry = registry["items"].get(key)
+            if entry is None:
+                fig = Figure(figsize=(12, 7)) # Tanpa registri global pyplot: aman untuk banyak sesi paralel
+                canvas = FigureCanvasAgg(fig)
+                ax = draw_background(fig)
+                canvas.draw()
+                entry = {"canvas": canvas, "ax": ax, "region": canvas.copy_from_bbox(fig.bbox), "lock": threading.Lock()}
+                registry["items"][key] = entry
+    with entry["lock"]:
+        canvas, ax = entry["canvas"], entry["ax"]
+        canvas.restore_region(entry["region"])
+        artists = draw_overlay(ax)
+        try:
+            for artist in artists:
+                ax.draw_artist(artist)
+            return np.asarray(canvas.buffer_rgba()).copy()
+        finally:
+            for artist in artists:
+                artist.remove()
 
 # ==============================================================================
 # FUNGSI-FUNGSI UNTUK KURVA BERAT BADAN vs UMUR (WfA)
@@ -50,16 +112,6 @@ def get_settings_wfa(age_in_months):
             "age_range": "5-10 Tahun"
             }
 
-def get_interpretation_wfa(berat_anak, z_scores_at_age):
-    """Menentukan interpretasi untuk WfA."""
-    if berat_anak > z_scores_at_age['SD3']: return "Berat badan sangat lebih", 'red'
-    elif berat_anak > z_scores_at_age['SD2']: return "Berat badan lebih", 'yellow'
-    elif berat_anak >= z_scores_at_age['SD1']: return "Berat cukup normal", 'lightgreen'
-    elif berat_anak >= z_scores_at_age['SD1neg']: return "Berat badan normal", 'darkgreen'
-    elif berat_anak > z_scores_at_age['SD2neg']: return "Berat cukup normal", 'lightgreen'
-    elif berat_anak > z_scores_at_age['SD3neg']: return "Berat badan kurang", 'yellow'
-    else: return "Berat badan kurang (Underweight)", 'red'
-
 def handle_weight_for_age():
     st.header("Grafik Berat Badan menurut Umur (WfA)") # Judul di web
 
@@ -88,119 +140,125 @@ def handle_weight_for_age():
                 nama_file = f"wfa_{'girls' if kelamin == 'P' else 'boys'}_5-to-10-years_zscores.xlsx"
                 judul = f'Grafik Berat Badan vs Umur - Anak {gender_text} ({settings["age_range"]})'
 
-            df = pd.read_excel(nama_file)
+            df = load_reference_frame(nama_file)
             #df = df.rename(columns={'SD-2': 'SD_2', 'SD-3': 'SD_3'}).sort_values(by='Month').drop_duplicates(subset='Month')
 
             x_original = df['Month']
             z_cols = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
-            poly_funcs = {col: np.poly1d(np.polyfit(x_original, df[col], 5)) for col in z_cols}
+            poly_funcs = cached_polyfit(nama_file, x_original, df, z_cols, 5)
 
             x_smooth = np.linspace(x_original.min(), x_original.max(), 500)
             smooth_data = {col: func(x_smooth) for col, func in poly_funcs.items()}
             
-            fig, ax = plt.subplots(figsize=(12, 7))
-
-            # --- TAMBAHKAN BARIS INI ---
-            # Mengatur warna latar belakang Figure menjadi biru muda
-            if kelamin == 'L':
-                fig.set_facecolor('steelblue')#fig.set_facecolor('darkturquoise') deepskyblue dodgerblue
-            else:
-                fig.set_facecolor('hotpink')
-            # ---------------------------
-            
-            ax.fill_between(x_smooth, smooth_data['SD3neg'], smooth_data['SD2neg'], color='yellow', alpha=0.5)
-            ax.fill_between(x_smooth, smooth_data['SD2neg'], smooth_data['SD1neg'], color='lightgreen', alpha=0.4)
-            ax.fill_between(x_smooth, smooth_data['SD1neg'], smooth_data['SD1'], color='darkgreen', alpha=0.4)
-            ax.fill_between(x_smooth, smooth_data['SD1'], smooth_data['SD2'], color='lightgreen', alpha=0.5)
-            ax.fill_between(x_smooth, smooth_data['SD2'], smooth_data['SD3'], color='yellow', alpha=0.5)
-            
-            for col, data in smooth_data.items():
-                ax.plot(x_smooth, data, color='black' if col not in ['SD3neg', 'SD3'] else 'red', lw=1)
+            z_scores_at_age = get_z_scores_at('wfa', kelamin, months_to_days(umur_anak), poly_funcs, umur_anak)
+            interpretasi, warna = classify_at_point('wfa', berat_anak, z_scores_at_age)
+
+            def draw_background(fig):
+                """Bagian grafik yang sama untuk semua anak (di-cache, lihat render_on_background)."""
+                ax = fig.add_subplot()
+
+                # --- TAMBAHKAN BARIS INI ---
+                # Mengatur warna latar belakang Figure menjadi biru muda
+                if kelamin == 'L':
+                    fig.set_facecolor('steelblue')#fig.set_facecolor('darkturquoise') deepskyblue dodgerblue
+                else:
+                    fig.set_facecolor('hotpink')
+                # ---------------------------
             
-            ax.scatter(umur_anak, berat_anak, marker='*', c='darkviolet', s=250, ec='black', zorder=10, label=f'Data Anak')
+                ax.fill_between(x_smooth, smooth_data['SD3neg'], smooth_data['SD2neg'], color='yellow', alpha=0.5)
+                ax.fill_between(x_smooth, smooth_data['SD2neg'], smooth_data['SD1neg'], color='lightgreen', alpha=0.4)
+                ax.fill_between(x_smooth, smooth_data['SD1neg'], smooth_data['SD1'], color='darkgreen', alpha=0.4)
+                ax.fill_between(x_smooth, smooth_data['SD1'], smooth_data['SD2'], color='lightgreen', alpha=0.5)
+                ax.fill_between(x_smooth, smooth_data['SD2'], smooth_data['SD3'], color='yellow', alpha=0.5)
             
-            z_scores_at_age = {col: func(umur_anak) for col, func in poly_funcs.items()}
-            interpretasi, warna = get_interpretation_wfa(berat_anak, z_scores_at_age)
-            props = dict(boxstyle='round', facecolor=warna, alpha=0.8)
-            ax.text(0.03, 0.97, f"Interpretasi: {interpretasi}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
+                for col, data in smooth_data.items():
+                    ax.plot(x_smooth, data, color='black' if col not in ['SD3neg', 'SD3'] else 'red', lw=1)
             
-            ax.set_title(judul, pad=20, fontsize=16, color='white', fontweight='bold')
-            if umur_anak > 60:
-                ax.set_xlabel('Umur', fontsize=12, color='white', labelpad=26)
-            else:
-                ax.set_xlabel('Umur (Bulan)', fontsize=12, color='white')
-            ax.set_ylabel('Berat Badan (kg)', fontsize=12, color='white')
-            ax.set_xlim(settings["xlim"]); ax.set_ylim(settings["ylim"])
-            ax.set_xticks(settings["xticks"]); ax.set_yticks(settings["yticks"])
-            #ax.grid(True, which='both', linestyle='--', linewidth=0.5)
-            # Gambar grid Y
-            ax.grid(which='major', axis='y', linestyle='-', linewidth='0.8', color='gray')
-            ax.grid(which='minor', axis='y', linestyle=':', linewidth='0.5', color='lightgray')
-
-            # 1. Buat sumbu Y kedua
-            ax2 = ax.twinx()
-            ax2.set_ylim(ax.get_ylim())
+                ax.set_title(judul, pad=20, fontsize=16, color='white', fontweight='bold')
+                if umur_anak > 60:
+                    ax.set_xlabel('Umur', fontsize=12, color='white', labelpad=26)
+                else:
+                    ax.set_xlabel('Umur (Bulan)', fontsize=12, color='white')
+                ax.set_ylabel('Berat Badan (kg)', fontsize=12, color='white')
+                ax.set_xlim(settings["xlim"]); ax.set_ylim(settings["ylim"])
+                ax.set_xticks(settings["xticks"]); ax.set_yticks(settings["yticks"])
+                #ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+                # Gambar grid Y
+                ax.grid(which='major', axis='y', linestyle='-', linewidth='0.8', color='gray')
+                ax.grid(which='minor', axis='y', linestyle=':', linewidth='0.5', color='lightgray')
+
+                # 1. Buat sumbu Y kedua
+                ax2 = ax.twinx()
+                ax2.set_ylim(ax.get_ylim())
             
-            ax.xaxis.set_major_locator(MultipleLocator(settings["x_major"]))
-            ax.xaxis.set_minor_locator(MultipleLocator(settings["x_minor"]))
-            ax.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
-            ax2.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
-            ax.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
-            ax2.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
+                ax.xaxis.set_major_locator(MultipleLocator(settings["x_major"]))
+                ax.xaxis.set_minor_locator(MultipleLocator(settings["x_minor"]))
+                ax.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
+                ax2.yaxis.set_major_locator(MultipleLocator(settings["y_major"]))
+                ax.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
+                ax2.yaxis.set_minor_locator(MultipleLocator(settings["y_minor"]))
             
-            # 1. Nonaktifkan Spines (Frame) untuk KEDUA sumbu
-            for spine_position in ['top', 'bottom', 'left', 'right']:
-                ax.spines[spine_position].set_visible(False)
-                ax2.spines[spine_position].set_visible(False)
+                # 1. Nonaktifkan Spines (Frame) untuk KEDUA sumbu
+                for spine_position in ['top', 'bottom', 'left', 'right']:
+                    ax.spines[spine_position].set_visible(False)
+                    ax2.spines[spine_position].set_visible(False)
             
-            ax.tick_params(which='minor', axis='x', length=0)
-            ax.tick_params(which='minor', axis='y', length=0)
-            ax.tick_params(which='major', axis='x', labelcolor='white', length=0)
-            ax.tick_params(which='major', axis='y', labelcolor='white', length=0)
-            ax2.tick_params(which='both', axis='y', labelcolor='white', length=0)#sumbu y ke-dua (sebelah kanan)
+                ax.tick_params(which='minor', axis='x', length=0)
+                ax.tick_params(which='minor', axis='y', length=0)
+                ax.tick_params(which='major', axis='x', labelcolor='white', length=0)
+                ax.tick_params(which='major', axis='y', labelcolor='white', length=0)
+                ax2.tick_params(which='both', axis='y', labelcolor='white', length=0)#sumbu y ke-dua (sebelah kanan)
 
-            ax.grid(which='major', linestyle='-', linewidth='0.8', color='gray')
-            ax.grid(which='minor', axis='y', linestyle=':', linewidth='0.7', color='gray')
+                ax.grid(which='major', linestyle='-', linewidth='0.8', color='gray')
+                ax.grid(which='minor', axis='y', linestyle=':', linewidth='0.7', color='gray')
 
             
-            # --- LOGIKA KONDISIONAL UNTUK SUMBU X ---
-            if umur_anak > 60:
-                # === Pengaturan Manual untuk 5-10 Tahun ===
+                # --- LOGIKA KONDISIONAL UNTUK SUMBU X ---
+                if umur_anak > 60:
+                    # === Pengaturan Manual untuk 5-10 Tahun ===
                 
-                # 1. Tentukan posisi Major Tick untuk penempatan grid utama (di setiap tahun)
-                major_x_ticks = [60, 72, 84, 96, 108, 120]
-                ax.set_xticks(major_x_ticks)
-                ax.grid(which='major', axis='x', linestyle='-', linewidth='0.8', color='gray')
+                    # 1. Tentukan posisi Major Tick untuk penempatan grid utama (di setiap tahun)
+                    major_x_ticks = [60, 72, 84, 96, 108, 120]
+                    ax.set_xticks(major_x_ticks)
+                    ax.grid(which='major', axis='x', linestyle='-', linewidth='0.8', color='gray')
 
-                # 2. Sembunyikan label default agar kita bisa gambar manual
-                ax.tick_params(axis='x', labelbottom=False)
+                    # 2. Sembunyikan label default agar kita bisa gambar manual
+                    ax.tick_params(axis='x', labelbottom=False)
 
-                # 3. Gambar label TAHUN secara manual
-                month_to_year = {60: '5', 72: '6', 84: '7', 96: '8', 108: '9', 120: '10'}
-                posisi_y_tahun = settings["ylim"][0] - 1.5  # Posisi Y untuk label tahun
+                    # 3. Gambar label TAHUN secara manual
+                    month_to_year = {60: '5', 72: '6', 84: '7', 96: '8', 108: '9', 120: '10'}
+                    posisi_y_tahun = settings["ylim"][0] - 1.5  # Posisi Y untuk label tahun
                 
-                for bulan, tahun in month_to_year.items():
-                    ax.text(bulan, posisi_y_tahun, tahun, ha='center', va='top', fontsize=12, color='white', fontweight='bold')
-                    # Tambahkan teks "Tahun" di bawah angka
-                    ax.text(bulan, posisi_y_tahun - 1.2, 'Tahun', ha='center', va='top', fontsize=8, color='white')
-
-                # 4. Gambar grid dan label BULAN minor (3, 6, 9)
-                posisi_y_bulan = settings["ylim"][0] - 0.8 # Posisi Y untuk label bulan
-                posisi_y_teks  = settings["ylim"][0] - 1.4 # Posisi Y untuk teks "Bulan"
-                for awal_tahun_bulan in range(60, 120, 12): # Loop per tahun (60, 72, 84, 96, 108)
-                    for tambahan_bulan in [3, 6, 9]:
-                        posisi_x = awal_tahun_bulan + tambahan_bulan
-                        # Gambar garis grid minor vertikal
-                        ax.axvline(x=posisi_x, color='gray', linestyle=':', linewidth=0.7, zorder=0)
-                        # Gambar label bulan
-                        ax.text(posisi_x, posisi_y_bulan, str(tambahan_bulan), ha='center', va='top', fontsize=8, color='white')
-                        ax.text(posisi_x, posisi_y_teks, "Bulan", ha='center', va='top', fontsize=6, color='white')
+                    for bulan, tahun in month_to_year.items():
+                        ax.text(bulan, posisi_y_tahun, tahun, ha='center', va='top', fontsize=12, color='white', fontweight='bold')
+                        # Tambahkan teks "Tahun" di bawah angka
+                        ax.text(bulan, posisi_y_tahun - 1.2, 'Tahun', ha='center', va='top', fontsize=8, color='white')
+
+                    # 4. Gambar grid dan label BULAN minor (3, 6, 9)
+                    posisi_y_bulan = settings["ylim"][0] - 0.8 # Posisi Y untuk label bulan
+                    posisi_y_teks  = settings["ylim"][0] - 1.4 # Posisi Y untuk teks "Bulan"
+                    for awal_tahun_bulan in range(60, 120, 12): # Loop per tahun (60, 72, 84, 96, 108)
+                        for tambahan_bulan in [3, 6, 9]:
+                            posisi_x = awal_tahun_bulan + tambahan_bulan
+                            # Gambar garis grid minor vertikal
+                            ax.axvline(x=posisi_x, color='gray', linestyle=':', linewidth=0.7, zorder=0)
+                            # Gambar label bulan
+                            ax.text(posisi_x, posisi_y_bulan, str(tambahan_bulan), ha='center', va='top', fontsize=8, color='white')
+                            ax.text(posisi_x, posisi_y_teks, "Bulan", ha='center', va='top', fontsize=6, color='white')
 
             
-            ax.legend(loc='lower right')
-            fig.tight_layout()
-            #plt.show()
-            st.pyplot(fig)
+                fig.tight_layout()
+                return ax
+
+            def draw_overlay(ax):
+                """Titik anak, kotak interpretasi, dan legenda: digambar ulang setiap request."""
+                star = ax.scatter(umur_anak, berat_anak, marker='*', c='darkviolet', s=250, ec='black', zorder=10, label=f'Data Anak')
+                props = dict(boxstyle='round', facecolor=warna, alpha=0.8)
+                box = ax.text(0.03, 0.97, f"Interpretasi: {interpretasi}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
+                return [star, box, ax.legend(loc='lower right')]
+
+            key = ('wfa', kelamin, settings["age_range"], nama_file)
+            st.image(render_on_background(key, draw_background, draw_overlay), use_container_width=True)
 
         except Exception as e:
             print(f"\nError pada proses WfA: {e}")
@@ -249,14 +307,6 @@ def get_settings_wfh(age_in_months):
             "age_range": "24-60 Bulan"
             }
 
-def get_interpretation_wfh(berat_anak, z_scores_at_length):
-    """Menentukan interpretasi untuk WfH/WfL."""
-    if berat_anak > z_scores_at_length['SD3']: return "Gizi lebih (Obesitas)", 'red'
-    elif berat_anak > z_scores_at_length['SD2']: return "Berisiko gizi lebih (Overweight)", 'yellow'
-    elif berat_anak >= z_scores_at_length['SD2neg']: return "Gizi baik (Normal)", 'forestgreen'
-    elif berat_anak >= z_scores_at_length['SD3neg']: return "Gizi kurang (Wasting)", 'yellow'
-    else: return "Gizi buruk (Severe Wasting)", 'red'
-
 def handle_weight_for_height():
     """Fungsi utama untuk menangani semua logika kurva Berat Badan vs Tinggi/Panjang."""
     try:
@@ -278,17 +328,18 @@ def handle_weight_for_height():
             judul = f'Grafik Berat Badan vs Tinggi Badan - Anak {gender_text} (2-5 Tahun)'
             x_col_name = 'Height'
 
-        df = pd.read_excel(nama_file)
+        df = load_reference_frame(nama_file)
         df = df.rename(columns={x_col_name: 'PanjangTinggi'}).sort_values(by='PanjangTinggi').drop_duplicates(subset='PanjangTinggi')
         
         x_original = df['PanjangTinggi']
         z_cols = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
-        poly_funcs = {col: np.poly1d(np.polyfit(x_original, df[col], 5)) for col in z_cols}
+        poly_funcs = cached_polyfit(nama_file, x_original, df, z_cols, 5)
 
         x_smooth = np.linspace(x_original.min(), x_original.max(), 500)
         smooth_data = {col: func(x_smooth) for col, func in poly_funcs.items()}
         
-        fig, ax = plt.subplots(figsize=(12, 7))
+        fig = Figure(figsize=(12, 7))
+        ax = fig.add_subplot()
 
         # --- TAMBAHKAN BARIS INI ---
         # Mengatur warna latar belakang Figure menjadi biru muda
@@ -307,8 +358,8 @@ def handle_weight_for_height():
         
         ax.scatter(panjang_anak, berat_anak, marker='*', c='darkviolet', s=250, ec='black', zorder=10, label=f'Data Anak')
         
-        z_scores_at_length = {col: func(panjang_anak) for col, func in poly_funcs.items()}
-        interpretasi, warna = get_interpretation_wfh(berat_anak, z_scores_at_length)
+        z_scores_at_length = get_z_scores_at('wfl' if months_to_days(umur_anak) < WFL_MAX_AGE_DAYS else 'wfh', kelamin, panjang_anak, poly_funcs, panjang_anak)
+        interpretasi, warna = classify_at_point('wflh', berat_anak, z_scores_at_length)
         props = dict(boxstyle='round', facecolor=warna, alpha=0.8)
         ax.text(0.03, 0.97, f"Status Gizi: {interpretasi}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
         
@@ -348,7 +399,7 @@ def handle_weight_for_height():
         #ax.grid(True, which='both', linestyle='--', linewidth=0.5)
         ax.legend(loc='lower right')
         fig.tight_layout()
-        plt.show()
+        st.pyplot(fig)
 
     except Exception as e:
         print(f"\nError pada proses WfH/WfL: {e}")
@@ -404,14 +455,6 @@ def get_settings_bmi(age_in_months):
             "age_range": "24-60 Bulan"
             }
 
-def get_interpretation_bmi(bmi_anak, z_scores_at_age):
-    """Menentukan interpretasi untuk IMT. Logikanya sama dengan WfH."""
-    if bmi_anak > z_scores_at_age['SD3']: return "Gizi lebih (Obesitas)", 'red'
-    elif bmi_anak > z_scores_at_age['SD2']: return "Berisiko gizi lebih (Overweight)", 'yellow'
-    elif bmi_anak >= z_scores_at_age['SD2neg']: return "Gizi baik (Normal)", 'forestgreen'
-    elif bmi_anak >= z_scores_at_age['SD3neg']: return "Gizi kurang (Wasting)", 'yellow'
-    else: return "Gizi buruk (Severe Wasting)", 'red'
-
 def handle_bmi_for_age():
     """Fungsi utama untuk menangani semua logika kurva IMT vs Umur."""
     try:
@@ -428,18 +471,19 @@ def handle_bmi_for_age():
             
         judul = f'Grafik IMT vs Umur - Anak {gender_text} ({settings["age_range"]})'
 
-        df = pd.read_excel(nama_file)
+        df = load_reference_frame(nama_file)
         df = df.sort_values(by='Month').drop_duplicates(subset='Month')
 
         x_original = df['Month']
         z_cols = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
-        poly_funcs = {col: np.poly1d(np.polyfit(x_original, df[col], 5)) for col in z_cols}
+        poly_funcs = cached_polyfit(nama_file, x_original, df, z_cols, 5)
         
         # Sumbu X untuk plot adalah seluruh rentang 0-60 bulan
         x_smooth = np.linspace(0, 60, 500)
         smooth_data = {col: func(x_smooth) for col, func in poly_funcs.items()}
         
-        fig, ax = plt.subplots(figsize=(12, 7))
+        fig = Figure(figsize=(12, 7))
+        ax = fig.add_subplot()
 
         # --- TAMBAHKAN BARIS INI ---
         # Mengatur warna latar belakang Figure menjadi biru muda
@@ -471,8 +515,8 @@ def handle_bmi_for_age():
         # ---------------------------
         
         # Menambahkan interpretasi
-        z_scores_at_age = {col: func(umur_anak) for col, func in poly_funcs.items()}
-        interpretasi, warna = get_interpretation_bmi(bmi_anak, z_scores_at_age)
+        z_scores_at_age = get_z_scores_at('bfa', kelamin, months_to_days(umur_anak), poly_funcs, umur_anak)
+        interpretasi, warna = classify_at_point('bfa', bmi_anak, z_scores_at_age)
         props = dict(boxstyle='round', facecolor=warna, alpha=0.8)
         ax.text(0.03, 0.97, f"Status Gizi: {interpretasi}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
         
@@ -514,7 +558,7 @@ def handle_bmi_for_age():
         
         ax.legend(loc='lower right')
         fig.tight_layout()
-        plt.show()
+        st.pyplot(fig)
 
     except Exception as e:
         print(f"\nError pada proses IMT vs Umur: {e}")
@@ -592,16 +636,6 @@ def get_settings_lhfa(age_in_months):
             "age_range_title": "2-5 Tahun"
         }
 
-def get_interpretation_lhfa(panjang_anak, z_scores_at_age):
-    """Menentukan interpretasi untuk stunting."""
-    # Pastikan kunci ada sebelum diakses
-    if 'SD2' not in z_scores_at_age or 'SD_2' not in z_scores_at_age or 'SD_3' not in z_scores_at_age:
-        return "Data tidak lengkap untuk interpretasi", "gray"
-    if panjang_anak > z_scores_at_age['SD2']: return "Tinggi", 'forestgreen'
-    elif panjang_anak >= z_scores_at_age['SD_2']: return "Normal", 'forestgreen'
-    elif panjang_anak >= z_scores_at_age['SD_3']: return "Pendek (Stunting)", 'yellow'
-    else: return "Sangat Pendek (Severe Stunting)", 'red'
-
 def handle_length_for_age():
     """
     Fungsi utama yang menggabungkan data mingguan dan bulanan untuk kurva L/H-f-A.
@@ -619,8 +653,8 @@ def handle_length_for_age():
             # 1. Baca kedua file data
             file_mingguan = f"lhfa_{gender_file_key}_0-to-13-weeks_zscores.xlsx"
             file_bulanan = f"lhfa_{gender_file_key}_0-to-2-years_zscores.xlsx"
-            df_mingguan = pd.read_excel(file_mingguan)
-            df_bulanan = pd.read_excel(file_bulanan)
+            df_mingguan = load_reference_frame(file_mingguan)
+            df_bulanan = load_reference_frame(file_bulanan)
 
             # 2. Standarisasi Sumbu X: konversi minggu ke bulan
             df_mingguan['Month'] = df_mingguan['Week'] / 4.345
@@ -633,16 +667,18 @@ def handle_length_for_age():
             
             x_original = combined_df['Month']
             df_to_process = combined_df
+            cache_key = f"{file_mingguan}+{file_bulanan}"
             #settings = {"xlim": (0, 24), "ylim": (45, 95), "age_range_title": "0-24 Bulan"}
             judul = f'Grafik Panjang Badan vs Umur - Anak {gender_text} ({settings["age_range_title"]})'
         
         else: # Usia > 24 bulan
             # === PROSES UNTUK 2-5 TAHUN (TIDAK PERLU GABUNG DATA) ===
             nama_file = f"lhfa_{gender_file_key}_2-to-5-years_zscores.xlsx"
-            df_tahunan = pd.read_excel(nama_file)
+            df_tahunan = load_reference_frame(nama_file)
             
             x_original = df_tahunan['Month']
             df_to_process = df_tahunan
+            cache_key = nama_file
             #settings = {"xlim": (24, 60), "ylim": (80, 120), "age_range_title": "2-5 Tahun"}
             judul = f'Grafik Tinggi Badan vs Umur - Anak {gender_text} ({settings["age_range_title"]})'
 
@@ -651,12 +687,13 @@ def handle_length_for_age():
         df_to_process = df_to_process.rename(columns=rename_dict)
         
         z_cols = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
-        poly_funcs = {col: np.poly1d(np.polyfit(x_original, df_to_process[col], 3)) for col in z_cols}
+        poly_funcs = cached_polyfit(cache_key, x_original, df_to_process, z_cols, 3)
 
         x_smooth = np.linspace(x_original.min(), x_original.max(), 500)
         smooth_data = {col: func(x_smooth) for col, func in poly_funcs.items()}
         
-        fig, ax = plt.subplots(figsize=(12, 7))
+        fig = Figure(figsize=(12, 7))
+        ax = fig.add_subplot()
 
         # --- TAMBAHKAN BARIS INI ---
         # Mengatur warna latar belakang Figure menjadi biru muda
@@ -673,11 +710,8 @@ def handle_length_for_age():
         
         ax.scatter(umur_anak, panjang_anak, marker='*', c='darkviolet', s=250, ec='black', zorder=10, label=f'Data Anak')
         
-        z_scores_at_age = {col: func(umur_anak) for col, func in poly_funcs.items()}
-        # Ganti nama kolom sementara untuk fungsi interpretasi
-        z_scores_at_age['SD_2'] = z_scores_at_age.get('SD2neg', None)
-        z_scores_at_age['SD_3'] = z_scores_at_age.get('SD3neg', None)
-        interpretasi, warna = get_interpretation_lhfa(panjang_anak, z_scores_at_age)
+        z_scores_at_age = get_z_scores_at('lhfa', kelamin, months_to_days(umur_anak), poly_funcs, umur_anak)
+        interpretasi, warna = classify_at_point('lhfa', panjang_anak, z_scores_at_age)
         
         props = dict(boxstyle='round', facecolor=warna, alpha=0.8)
         ax.text(0.03, 0.97, f"Interpretasi: {interpretasi}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
@@ -759,7 +793,7 @@ def handle_length_for_age():
         
         ax.legend(loc='lower right')
         fig.tight_layout()
-        plt.show()
+        st.pyplot(fig)
 
     except Exception as e:
         print(f"\nError pada proses L/H-f-A: {e}")
@@ -813,15 +847,6 @@ def get_settings_hcfa(age_in_months):
             "age_range_title": "2-5 Tahun"
         }
 
-def get_interpretation_hcfa(hc_anak, z_scores_at_age):
-    """Menentukan interpretasi untuk Lingkar Kepala."""
-    if hc_anak > z_scores_at_age['SD2']:
-        return "Makrosefali (Perlu evaluasi medis)", 'yellow'
-    elif hc_anak >= z_scores_at_age['SD2neg']:
-        return "Normal", 'forestgreen'
-    else: # hc_anak < z_scores_at_age['SD2neg']
-        return "Mikrosefali (Perlu evaluasi medis)", 'yellow'
-
 def handle_head_circumference_for_age():
     """Fungsi utama yang menangani kurva Lingkar Kepala vs Umur."""
     try:
@@ -835,9 +860,9 @@ def handle_head_circumference_for_age():
 
         # === PROSES KONSOLIDASI DATA ===
         file_mingguan = f"hcfa_{gender_file_key}_0-13-zscores.xlsx"
-        file_bulanan = f"hcfa_{gender_file_key}_0-5-zscores.xlsx"
-        df_mingguan = pd.read_excel(file_mingguan)
-        df_bulanan = pd.read_excel(file_bulanan)
+        file_bulanan = f"hcfa_{gender_file_key}_0-to-5-years-zscores.xlsx"
+        df_mingguan = load_reference_frame(file_mingguan)
+        df_bulanan = load_reference_frame(file_bulanan)
         df_mingguan['Month'] = df_mingguan['Week'] / 4.345
         combined_df = pd.concat([df_mingguan, df_bulanan], ignore_index=True)
         combined_df = combined_df.sort_values(by='Month').drop_duplicates(subset='Month', keep='first')
@@ -849,12 +874,13 @@ def handle_head_circumference_for_age():
         df_to_process = df_to_process.rename(columns=rename_dict)
         
         z_cols = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
-        poly_funcs = {col: np.poly1d(np.polyfit(x_original, df_to_process[col], 5)) for col in z_cols}
+        poly_funcs = cached_polyfit(f"{file_mingguan}+{file_bulanan}", x_original, df_to_process, z_cols, 5)
 
         x_smooth = np.linspace(0, 60, 500) # Buat kurva untuk seluruh rentang
         smooth_data = {col: func(x_smooth) for col, func in poly_funcs.items()}
         
-        fig, ax = plt.subplots(figsize=(12, 7))
+        fig = Figure(figsize=(12, 7))
+        ax = fig.add_subplot()
 
         # --- TAMBAHKAN BARIS INI ---
         # Mengatur warna latar belakang Figure menjadi biru muda
@@ -880,8 +906,8 @@ def handle_head_circumference_for_age():
 
         ax.scatter(umur_anak_bulan, hc_anak, marker='*', c='darkviolet', s=250, ec='black', zorder=10, label=f'Data Anak')
         
-        z_scores_at_age = {col: func(umur_anak_bulan) for col, func in poly_funcs.items()}
-        interpretasi, warna = get_interpretation_hcfa(hc_anak, z_scores_at_age)
+        z_scores_at_age = get_z_scores_at('hcfa', kelamin, months_to_days(umur_anak_bulan), poly_funcs, umur_anak_bulan)
+        interpretasi, warna = classify_at_point('hcfa', hc_anak, z_scores_at_age)
         props = dict(boxstyle='round', facecolor=warna, alpha=0.8)
         ax.text(0.03, 0.97, f"Interpretasi: {interpretasi}", transform=ax.transAxes, fontsize=12, va='top', bbox=props)
         
@@ -894,7 +920,7 @@ def handle_head_circumference_for_age():
         
         ax.legend(loc='lower right')
         fig.tight_layout()
-        plt.show()
+        st.pyplot(fig)
 
     except Exception as e:
         print(f"\nError pada proses HCFA: {e}")
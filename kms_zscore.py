@@ -0,0 +1,390 @@
+import hashlib
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from kms_reference_store import get_table
+
+# ==============================================================================
+# MESIN Z-SCORE BERBASIS LMS (STANDAR ANTROPOMETRI WHO 2006)
+# ==============================================================================
+
+# Modul ini menghitung z-score secara langsung dari kolom L, M, S pada tabel harian
+# di folder data/. Tidak ada proses fitting saat request: nilai referensi diambil
+# lewat indeks array (umur dalam hari atau panjang/tinggi per 0,1 cm).
+# Tabel dibaca dari artefak memory-mapped kms_reference_store (kunci "<indikator>/<sex>/daily").
+
+SD_COLS = ['SD3neg', 'SD2neg', 'SD1neg', 'SD0', 'SD1', 'SD2', 'SD3']
+SD_VALUES = {'SD3neg': -3, 'SD2neg': -2, 'SD1neg': -1, 'SD0': 0, 'SD1': 1, 'SD2': 2, 'SD3': 3}
+
+# Rata-rata jumlah hari dalam satu bulan yang dipakai WHO untuk konversi umur.
+DAYS_PER_MONTH = 30.4375
+
+# Konfigurasi tabel per indikator:
+# - "prefix": awalan nama file di data/
+# - "x_col": kolom sumbu X pada tabel (Day, Length, Height)
+# - "step": jarak antar baris pada sumbu X
+# - "restricted": pakai aturan WHO untuk z di luar +/-3 SD (indikator berbasis berat)
+INDICATORS: Dict[str, Dict[str, Union[str, float, bool]]] = {
+    "wfa": {"prefix": "wfa", "x_col": "Day", "step": 1, "restricted": True},
+    "lhfa": {"prefix": "lhfa", "x_col": "Day", "step": 1, "restricted": False},
+    "bfa": {"prefix": "bfa", "x_col": "Day", "step": 1, "restricted": True},
+    "hcfa": {"prefix": "hcfa", "x_col": "Day", "step": 1, "restricted": False},
+    "acfa": {"prefix": "acfa", "x_col": "Day", "step": 1, "restricted": True},
+    "wfl": {"prefix": "wfl", "x_col": "Length", "step": 0.1, "restricted": True},
+    "wfh": {"prefix": "wfh", "x_col": "Height", "step": 0.1, "restricted": True},
+}
+
+ArrayLike = Union[float, np.ndarray, pd.Series]
+
+
+def gender_key(gender: str) -> str:
+    """Mengubah kode jenis kelamin aplikasi ('L'/'P') menjadi kunci file ('boys'/'girls')."""
+    return "girls" if gender == 'P' else "boys"
+
+
+def months_to_days(age_in_months: ArrayLike) -> np.ndarray:
+    """Mengonversi umur dalam bulan menjadi umur dalam hari (dibulatkan)."""
+    return np.rint(np.asarray(age_in_months, dtype=float) * DAYS_PER_MONTH).astype(int)
+
+
+def months_to_days_float(age_in_months: ArrayLike) -> np.ndarray:
+    """Seperti months_to_days, tetapi mempertahankan NaN untuk umur yang kosong."""
+    return np.rint(np.asarray(age_in_months, dtype=float) * DAYS_PER_MONTH)
+
+
+def calculate_age_days(tanggal_lahir: ArrayLike, tanggal_pengukuran: ArrayLike) -> np.ndarray:
+    """
+    Menghitung umur dalam hari untuk seluruh array tanggal sekaligus (aritmetika datetime64).
+    Menerima string 'YYYY-MM-DD', objek date, atau datetime64; tanggal kosong menghasilkan NaN.
+    """
+    lahir = pd.to_datetime(pd.Series(np.atleast_1d(tanggal_lahir)), errors='coerce').to_numpy(dtype='datetime64[D]')
+    ukur = pd.to_datetime(pd.Series(np.atleast_1d(tanggal_pengukuran)), errors='coerce').to_numpy(dtype='datetime64[D]')
+    selisih = ukur - lahir
+    return np.where(np.isnat(selisih), np.nan, selisih.astype('timedelta64[D]').astype(float))
+
+
+def age_days_column(df: pd.DataFrame) -> np.ndarray:
+    """
+    Umur dalam hari untuk setiap baris: pakai kolom `usia_hari` jika terisi, lalu selisih
+    tanggal_pengukuran - tanggal_lahir, dan terakhir konversi dari `usia_bulan`.
+    """
+    usia_hari = np.full(len(df), np.nan)
+    if 'usia_hari' in df.columns:
+        usia_hari = pd.to_numeric(df['usia_hari'], errors='coerce').to_numpy(dtype=float)
+    missing = np.isnan(usia_hari)
+    if missing.any() and {'tanggal_lahir', 'tanggal_pengukuran'} <= set(df.columns):
+        usia_hari = np.where(missing, calculate_age_days(df['tanggal_lahir'], df['tanggal_pengukuran']), usia_hari)
+        missing = np.isnan(usia_hari)
+    if missing.any() and 'usia_bulan' in df.columns:
+        usia_bulan = pd.to_numeric(df['usia_bulan'], errors='coerce').to_numpy(dtype=float)
+        usia_hari = np.where(missing, months_to_days_float(usia_bulan), usia_hari)
+    return usia_hari
+
+
+@lru_cache(maxsize=None)
+def load_lms_table(indicator: str, gender: str) -> Dict[str, np.ndarray]:
+    """
+    Memuat tabel LMS harian untuk satu indikator dan jenis kelamin.
+    Hasilnya berupa dict berisi view array numpy (memory-mapped) untuk akses indeks langsung.
+    """
+    cfg = INDICATORS[indicator]
+    columns = get_table(f"{cfg['prefix']}/{gender_key(gender)}/daily")
+    x = columns[cfg["x_col"]]
+    table = {"x0": float(x[0]), "step": float(cfg["step"]), "x": x}
+    for col in ['L', 'M', 'S'] + SD_COLS:
+        table[col] = columns[col]
+    return table
+
+
+def lookup_index(table: Dict[str, np.ndarray], x: ArrayLike) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mengembalikan indeks baris tabel untuk nilai X dan mask nilai yang berada di dalam rentang tabel.
+    Indeks di luar rentang dipotong ke batas agar tetap aman dipakai untuk pengindeksan.
+    """
+    x = np.asarray(x, dtype=float)
+    idx = np.rint((x - table["x0"]) / table["step"])
+    n_rows = np.shape(table["L"])[-1]
+    valid = np.isfinite(idx) & (idx >= 0) & (idx < n_rows)
+    idx = np.clip(np.nan_to_num(idx), 0, n_rows - 1).astype(int)
+    return idx, valid
+
+
+def lms_value(L: ArrayLike, M: ArrayLike, S: ArrayLike, z: ArrayLike) -> np.ndarray:
+    """Menghitung nilai pengukuran pada z-score tertentu (kebalikan rumus LMS)."""
+    L, M, S, z = (np.asarray(a, dtype=float) for a in (L, M, S, z))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(L == 0, M * np.exp(S * z), M * np.power(1 + L * S * z, 1 / np.where(L == 0, 1, L)))
+
+
+def zscore_from_lms(y: ArrayLike, L: ArrayLike, M: ArrayLike, S: ArrayLike, restricted: bool = False) -> np.ndarray:
+    """
+    Menghitung z-score dengan rumus LMS tertutup: z = ((y/M)^L - 1) / (L*S).
+    Jika `restricted`, nilai di luar +/-3 SD dihitung ulang dengan jarak SD2-SD3 sesuai aturan WHO
+    untuk indikator berbasis berat badan.
+    """
+    y, L, M, S = (np.asarray(a, dtype=float) for a in (y, L, M, S))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        safe_L = np.where(L == 0, 1, L)
+        z = np.where(L == 0, np.log(y / M) / S, (np.power(y / M, L) - 1) / (safe_L * S))
+        if restricted:
+            sd3 = lms_value(L, M, S, 3)
+            sd2 = lms_value(L, M, S, 2)
+            sd3neg = lms_value(L, M, S, -3)
+            sd2neg = lms_value(L, M, S, -2)
+            z = np.where(z > 3, 3 + (y - sd3) / (sd3 - sd2), z)
+            z = np.where(z < -3, -3 + (y - sd3neg) / (sd2neg - sd3neg), z)
+    return z
+
+
+def calculate_zscore(indicator: str, gender: str, x: ArrayLike, y: ArrayLike) -> Union[float, np.ndarray]:
+    """
+    Menghitung z-score untuk satu indikator.
+    `x` adalah umur dalam hari (indikator umur) atau panjang/tinggi dalam cm (WFL/WFH).
+    Nilai di luar rentang tabel atau pengukuran yang tidak positif menghasilkan NaN.
+    """
+    table = load_lms_table(indicator, gender)
+    idx, valid = lookup_index(table, x)
+    y = np.asarray(y, dtype=float)
+    z = zscore_from_lms(y, table["L"][idx], table["M"][idx], table["S"][idx], INDICATORS[indicator]["restricted"])
+    z = np.where(valid & (y > 0), z, np.nan)
+    return float(z) if z.ndim == 0 else z
+
+
+def sd_values_at(indicator: str, gender: str, x: float) -> Dict[str, float]:
+    """
+    Mengembalikan nilai garis SD3neg..SD3 pada titik X, langsung dari tabel WHO.
+    Format dict ini sama dengan yang dipakai classify_at_point.
+    """
+    table = load_lms_table(indicator, gender)
+    idx, valid = lookup_index(table, x)
+    if not valid:
+        raise ValueError(f"Nilai {x} berada di luar rentang tabel {indicator.upper()}.")
+    return {col: float(table[col][idx]) for col in SD_COLS}
+
+
+# ==============================================================================
+# API BATCH (VEKTORISASI UNTUK SELURUH TABEL PENGUKURAN)
+# ==============================================================================
+
+# Batas umur (hari) peralihan dari panjang badan (WFL) ke tinggi badan (WFH): 24 bulan.
+WFL_MAX_AGE_DAYS = 731
+
+BATCH_COLUMNS = ['zscore_wfa', 'zscore_lhfa', 'zscore_wflh', 'zscore_bfa', 'zscore_hcfa']
+
+
+@lru_cache(maxsize=None)
+def load_stacked_table(indicator: str) -> Dict[str, np.ndarray]:
+    """
+    Menggabungkan tabel laki-laki dan perempuan menjadi array 2 x N (baris 0 = 'L', baris 1 = 'P'),
+    sehingga satu operasi fancy-indexing bisa melayani kedua jenis kelamin sekaligus.
+    """
+    boys, girls = load_lms_table(indicator, 'L'), load_lms_table(indicator, 'P')
+    if boys["x0"] != girls["x0"] or len(boys["L"]) != len(girls["L"]):
+        raise ValueError(f"Sumbu tabel {indicator.upper()} laki-laki dan perempuan tidak sama.")
+    stacked = {"x0": boys["x0"], "step": boys["step"]}
+    for col in ['L', 'M', 'S']:
+        stacked[col] = np.vstack([boys[col], girls[col]])
+    return stacked
+
+
+def zscore_batch(indicator: str, sex_idx: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Menghitung z-score satu indikator untuk seluruh baris dengan satu kali pengindeksan array."""
+    table = load_stacked_table(indicator)
+    idx, valid = lookup_index(table, x)
+    L, M, S = (table[col][sex_idx, idx] for col in ['L', 'M', 'S'])
+    y = np.asarray(y, dtype=float)
+    z = zscore_from_lms(y, L, M, S, INDICATORS[indicator]["restricted"])
+    return np.where(valid & (y > 0), z, np.nan)
+
+
+def calculate_zscores_arrays(jenis_kelamin: ArrayLike, usia_hari: ArrayLike, berat_kg: ArrayLike,
+                             tinggi_cm: ArrayLike, lingkar_kepala_cm: ArrayLike) -> Dict[str, np.ndarray]:
+    """
+    Menghitung z-score WFA, LHFA, WFL/WFH, BFA, dan HCFA untuk seluruh array sekaligus.
+    WFL dipakai untuk umur < 24 bulan dan WFH untuk umur >= 24 bulan.
+    Nilai kosong, nol, atau di luar rentang tabel menghasilkan NaN.
+    """
+    sex_idx = (np.asarray(jenis_kelamin) == 'P').astype(int)
+    usia_hari = np.asarray(usia_hari, dtype=float)
+    berat = np.asarray(berat_kg, dtype=float)
+    tinggi = np.asarray(tinggi_cm, dtype=float)
+    lingkar_kepala = np.asarray(lingkar_kepala_cm, dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bmi = np.where(tinggi > 0, berat / (tinggi / 100) ** 2, np.nan)
+
+    is_length = usia_hari < WFL_MAX_AGE_DAYS
+    return {
+        'zscore_wfa': zscore_batch('wfa', sex_idx, usia_hari, berat),
+        'zscore_lhfa': zscore_batch('lhfa', sex_idx, usia_hari, tinggi),
+        'zscore_wflh': np.where(is_length,
+                                zscore_batch('wfl', sex_idx, tinggi, berat),
+                                zscore_batch('wfh', sex_idx, tinggi, berat)),
+        'zscore_bfa': zscore_batch('bfa', sex_idx, usia_hari, bmi),
+        'zscore_hcfa': zscore_batch('hcfa', sex_idx, usia_hari, lingkar_kepala),
+    }
+
+
+def calculate_zscores_batch(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Menghitung seluruh z-score untuk DataFrame berbentuk `data_pengukuran`
+    (jenis_kelamin, usia_hari/usia_bulan, berat_kg, tinggi_cm, lingkar_kepala_cm).
+    Umur diambil dengan presisi hari (lihat age_days_column).
+    Mengembalikan DataFrame baru dengan kolom BATCH_COLUMNS dan indeks yang sama dengan input.
+    """
+    def column(name: str) -> np.ndarray:
+        if name not in df.columns:
+            return np.full(len(df), np.nan)
+        return pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=float)
+
+    usia_hari = age_days_column(df)
+    result = calculate_zscores_arrays(
+        df['jenis_kelamin'].to_numpy(), usia_hari,
+        column('berat_kg'), column('tinggi_cm'), column('lingkar_kepala_cm'),
+    )
+    return pd.DataFrame(result, index=df.index, columns=BATCH_COLUMNS)
+
+
+# ==============================================================================
+# SKOR SAAT TULIS (Z-SCORE + KATEGORI + CAP VERSI REFERENSI)
+# ==============================================================================
+
+# Z-score dan kategori disimpan sebagai kolom di setiap baris pengukuran saat data ditulis,
+# sehingga tampilan riwayat dan agregat tidak perlu menghitung ulang. Setiap baris diberi
+# cap `referensi_versi`; baris dengan cap berbeda dari reference_version() dihitung ulang
+# oleh kms_rescore.py. Naikkan SCORING_VERSION jika rumus atau batas kategori berubah
+# (perubahan isi tabel LMS otomatis mengubah cap lewat hash tabel).
+#
+# Versi 2: kolom `biv` (tanda nilai biologis tidak wajar) ikut disimpan.
+
+SCORING_VERSION = 2
+
+CATEGORY_COLUMNS = ['kategori_wfa', 'kategori_lhfa', 'kategori_wflh', 'kategori_bfa', 'kategori_hcfa']
+BIV_COLUMN = 'biv'
+SCORE_COLUMNS = BATCH_COLUMNS + CATEGORY_COLUMNS + [BIV_COLUMN, 'referensi_versi']
+
+# Nilai biologis tidak wajar (biologically implausible values, BIV) memakai batas flag WHO Anthro:
+# z-score di luar batas ini hampir pasti salah input (mis. 105 kg untuk 10,5 kg). Baris tetap
+# disimpan, dengan kolom `biv` berisi kode indikator yang ditandai (mis. "wfa,lhfa"), tetapi
+# dikarantina: tidak ikut prevalensi, tren bulanan, daftar T/2T, maupun grafik sampai direvisi.
+BIV_LIMITS = {
+    'zscore_wfa': (-6, 5), 'zscore_lhfa': (-6, 6), 'zscore_wflh': (-5, 5), 'zscore_bfa': (-5, 5), 'zscore_hcfa': (-5, 5),
+}
+BIV_NAMES = {'wfa': "BB/U", 'lhfa': "PB/U atau TB/U", 'wflh': "BB/PB atau BB/TB", 'bfa': "IMT/U", 'hcfa': "LK/U"}
+
+# Klasifikasi berbasis tabel: untuk setiap indikator, batas z (dari bawah ke atas) dan label
+# kelasnya disimpan sebagai data, lalu diterapkan ke seluruh array dengan np.searchsorted.
+# Tabel yang sama dipakai untuk skor saat tulis (z-score) dan untuk interpretasi grafik satu
+# anak di kms_app (nilai ukur dibandingkan kurva SD di titik yang sama; urutannya identik
+# karena kurva SD monoton terhadap z).
+# Setiap batas berupa (z, inklusif): inklusif = nilai tepat di batas masuk kelas di atasnya.
+_WASTING = ([(-3, True), (-2, True), (2, False), (3, False)],
+            ["Gizi buruk (Severe Wasting)", "Gizi kurang (Wasting)", "Gizi baik (Normal)",
+             "Berisiko gizi lebih (Overweight)", "Gizi lebih (Obesitas)"])
+CLASSIFICATION_TABLES: Dict[str, Tuple[List[Tuple[int, bool]], List[str]]] = {
+    'wfa': ([(-3, False), (-2, True), (2, False), (3, False)],
+            ["Berat badan sangat kurang (Underweight)", "Berat badan kurang", "Berat badan normal",
+             "Berat badan lebih", "Berat badan sangat lebih"]),
+    'lhfa': ([(-3, True), (-2, True), (2, False)],
+             ["Sangat Pendek (Severe Stunting)", "Pendek (Stunting)", "Normal", "Tinggi"]),
+    'wflh': _WASTING,
+    'bfa': _WASTING,
+    'hcfa': ([(-2, True), (2, False)], ["Mikrosefali", "Normal", "Makrosefali"]),
+}
+SD_NAMES = {value: name for name, value in SD_VALUES.items()} # -3 -> 'SD3neg', ...
+
+CATEGORY_COLORS = {
+    "Berat badan sangat lebih": 'red', "Berat badan lebih": 'yellow', "Berat badan normal": 'forestgreen',
+    "Berat badan kurang": 'yellow', "Berat badan sangat kurang (Underweight)": 'red',
+    "Gizi lebih (Obesitas)": 'red', "Berisiko gizi lebih (Overweight)": 'yellow', "Gizi baik (Normal)": 'forestgreen',
+    "Gizi kurang (Wasting)": 'yellow', "Gizi buruk (Severe Wasting)": 'red',
+    "Tinggi": 'forestgreen', "Normal": 'forestgreen', "Pendek (Stunting)": 'yellow', "Sangat Pendek (Severe Stunting)": 'red',
+    "Makrosefali": 'yellow', "Mikrosefali": 'yellow',
+}
+
+
+def classify(indicator: str, values: ArrayLike, cut_points: Optional[ArrayLike] = None) -> np.ndarray:
+    """
+    Label kelas (None untuk NaN) seluruh `values` menurut CLASSIFICATION_TABLES[indicator].
+    Tanpa `cut_points`, `values` adalah z-score; jika diisi, `cut_points` adalah nilai ukur di
+    setiap batas z tabel (urutan sama), dan `values` adalah nilai ukur.
+    """
+    cuts, labels = CLASSIFICATION_TABLES[indicator]
+    edges = np.asarray([z for z, _ in cuts] if cut_points is None else cut_points, dtype=float)
+    # Batas inklusif digeser satu ulp ke bawah: "v >= c" sama dengan "v > c'", sehingga satu
+    # searchsorted(side='left') (jumlah batas < v) langsung memberi nomor kelas.
+    inclusive = np.array([flag for _, flag in cuts])
+    edges = np.where(inclusive, np.nextafter(edges, -np.inf), edges)
+    values = np.asarray(values, dtype=float)
+    index = np.where(np.isnan(values), len(labels), np.searchsorted(edges, values, side='left'))
+    return np.array(labels + [None], dtype=object)[index]
+
+
+def classify_at_point(indicator: str, value: float, sd_values: Dict[str, float]) -> Tuple[str, str]:
+    """(label, warna) satu nilai ukur dibandingkan nilai kurva SD (SD3neg..SD3) di titik yang sama."""
+    cuts, _ = CLASSIFICATION_TABLES[indicator]
+    label = classify(indicator, [value], [sd_values[SD_NAMES[z]] for z, _ in cuts])[0]
+    return label, CATEGORY_COLORS[label]
+
+
+def classify_zscores(zscores: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Kategori (label teks, None jika z-score kosong) untuk setiap kolom BATCH_COLUMNS."""
+    return {f"kategori_{col.removeprefix('zscore_')}": classify(col.removeprefix('zscore_'), zscores[col])
+            for col in BATCH_COLUMNS}
+
+
+def flag_implausible(zscores: Dict[str, np.ndarray]) -> np.ndarray:
+    """Nilai kolom `biv` untuk seluruh baris: kode indikator di luar BIV_LIMITS dipisah koma, None jika wajar."""
+    flags = np.full(len(np.asarray(zscores[BATCH_COLUMNS[0]])), "", dtype=object)
+    with np.errstate(invalid='ignore'):
+        for col, (low, high) in BIV_LIMITS.items():
+            z = np.asarray(zscores[col], dtype=float)
+            code = col.removeprefix('zscore_')
+            flags = np.where((z < low) | (z > high), flags + np.where(flags == "", "", ",") + code, flags)
+    flags[flags == ""] = None
+    return flags
+
+
+def describe_biv(record: Dict[str, Any]) -> str:
+    """Penjelasan singkat tanda BIV satu baris skor, mis. "BB/U z = 24.1 (wajar -6 s.d. 5)"."""
+    parts = []
+    for code in (record.get(BIV_COLUMN) or "").split(","):
+        if code:
+            low, high = BIV_LIMITS[f"zscore_{code}"]
+            parts.append(f"{BIV_NAMES[code]} z = {record[f'zscore_{code}']:.1f} (wajar {low} s.d. {high})")
+    return "; ".join(parts)
+
+
+@lru_cache(maxsize=1)
+def reference_version() -> str:
+    """Cap versi skor: SCORING_VERSION + hash isi kolom L, M, S semua tabel harian."""
+    digest = hashlib.sha1(f"v{SCORING_VERSION}".encode())
+    for indicator in INDICATORS:
+        for gender in ('L', 'P'):
+            table = load_lms_table(indicator, gender)
+            for col in ('L', 'M', 'S'):
+                digest.update(np.ascontiguousarray(table[col]).tobytes())
+    return f"{SCORING_VERSION}-{digest.hexdigest()[:10]}"
+
+
+def calculate_scores_batch(df: pd.DataFrame) -> pd.DataFrame:
+    """Seperti calculate_zscores_batch, ditambah kolom kategori dan referensi_versi (SCORE_COLUMNS)."""
+    zscores = calculate_zscores_batch(df)
+    categories = classify_zscores({col: zscores[col].to_numpy() for col in BATCH_COLUMNS})
+    result = zscores.assign(**categories)
+    result[BIV_COLUMN] = flag_implausible({col: zscores[col].to_numpy() for col in BATCH_COLUMNS})
+    result['referensi_versi'] = reference_version()
+    return result[SCORE_COLUMNS]
+
+
+def scores_to_records(scores: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Baris skor sebagai dict siap-JSON (NaN -> None, float numpy -> float Python)."""
+    return scores.astype(object).where(scores.notna(), None).to_dict('records')
+
+
+def score_record(record: Dict[str, Any], jenis_kelamin: str) -> Dict[str, Any]:
+    """Kolom skor untuk satu baris pengukuran (butuh usia_hari atau usia_bulan, berat_kg, tinggi_cm, lingkar_kepala_cm)."""
+    return scores_to_records(calculate_scores_batch(pd.DataFrame([{**record, 'jenis_kelamin': jenis_kelamin}])))[0]
@@ -0,0 +1,7 @@
+-- Umur presisi hari untuk pencarian O(1) pada tabel LMS harian WHO (Day 0..1856).
+alter table data_pengukuran add column if not exists usia_hari integer;
+
+-- Isi ulang baris lama dari selisih tanggal (date - date menghasilkan jumlah hari).
+update data_pengukuran
+set usia_hari = tanggal_pengukuran::date - tanggal_lahir::date
+where usia_hari is null;
@@ -0,0 +1,36 @@
+-- Indeks anak: satu baris per anak untuk daftar pilihan di aplikasi, sehingga
+-- get_child_list tidak perlu memindai seluruh data_pengukuran.
+create table if not exists anak (
+    id_anak text primary key,
+    nama_anak text not null,
+    tanggal_lahir date,
+    jenis_kelamin text check (jenis_kelamin in ('L', 'P'))
+);
+
+create index if not exists anak_nama_anak_idx on anak (nama_anak, id_anak);
+
+-- Isi dari data yang sudah ada (ambil identitas dari pengukuran terbaru tiap anak).
+insert into anak (id_anak, nama_anak, tanggal_lahir, jenis_kelamin)
+select distinct on (id_anak) id_anak, nama_anak, tanggal_lahir::date, jenis_kelamin
+from data_pengukuran
+order by id_anak, tanggal_pengukuran desc
+on conflict (id_anak) do nothing;
+
+-- Jaga indeks tetap sinkron untuk setiap pengukuran baru atau revisi.
+create or replace function sync_anak_index() returns trigger
+language plpgsql as $$
+begin
+    insert into anak (id_anak, nama_anak, tanggal_lahir, jenis_kelamin)
+    values (new.id_anak, new.nama_anak, new.tanggal_lahir::date, new.jenis_kelamin)
+    on conflict (id_anak) do update
+        set nama_anak = excluded.nama_anak,
+            tanggal_lahir = excluded.tanggal_lahir,
+            jenis_kelamin = excluded.jenis_kelamin;
+    return new;
+end;
+$$;
+
+drop trigger if exists data_pengukuran_sync_anak on data_pengukuran;
+create trigger data_pengukuran_sync_anak
+    after insert or update of id_anak, nama_anak, tanggal_lahir, jenis_kelamin on data_pengukuran
+    for each row execute function sync_anak_index();
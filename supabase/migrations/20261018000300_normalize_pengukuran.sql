@@ -0,0 +1,32 @@
+-- Skema ternormalisasi: identitas anak hanya di tabel `anak`, data_pengukuran hanya
+-- berisi id_anak + kolom pengukuran. Jalankan `python kms_migrate.py check` lebih dulu
+-- untuk memastikan tidak ada id_anak dengan identitas yang saling bertentangan.
+
+-- Pastikan setiap id_anak lama sudah punya baris di `anak`.
+insert into anak (id_anak, nama_anak, tanggal_lahir, jenis_kelamin)
+select distinct on (id_anak) id_anak, nama_anak, tanggal_lahir::date, jenis_kelamin
+from data_pengukuran
+order by id_anak, tanggal_pengukuran desc
+on conflict (id_anak) do nothing;
+
+-- Identitas tidak lagi disalin dari baris pengukuran.
+drop trigger if exists data_pengukuran_sync_anak on data_pengukuran;
+drop function if exists sync_anak_index();
+
+alter table data_pengukuran
+    drop column if exists nama_anak,
+    drop column if exists tanggal_lahir,
+    drop column if exists jenis_kelamin;
+
+alter table data_pengukuran
+    add constraint data_pengukuran_id_anak_fkey
+    foreign key (id_anak) references anak (id_anak) on update cascade on delete cascade;
+
+create index if not exists data_pengukuran_id_anak_tanggal_idx
+    on data_pengukuran (id_anak, tanggal_pengukuran);
+
+-- Tampilan bentuk lama (satu baris lengkap per pengukuran) untuk laporan/ekspor.
+create or replace view data_pengukuran_lengkap as
+select p.*, a.nama_anak, a.tanggal_lahir, a.jenis_kelamin
+from data_pengukuran p
+join anak a using (id_anak);
@@ -0,0 +1,23 @@
+-- Nomor revisi riwayat per anak. Dinaikkan satu setiap ada baris data_pengukuran milik
+-- anak tersebut yang ditambah, diubah, atau dihapus. Aplikasi menyimpan riwayat di cache
+-- dan hanya mengambilnya ulang jika nilai ini berbeda dari revisi yang di-cache.
+
+alter table anak add column if not exists revisi bigint not null default 0;
+
+create or replace function bump_anak_revisi() returns trigger
+language plpgsql as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        update anak set revisi = revisi + 1 where id_anak = old.id_anak;
+    end if;
+    if tg_op = 'INSERT' or (tg_op = 'UPDATE' and new.id_anak is distinct from old.id_anak) then
+        update anak set revisi = revisi + 1 where id_anak = new.id_anak;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists data_pengukuran_bump_revisi on data_pengukuran;
+create trigger data_pengukuran_bump_revisi
+    after insert or update or delete on data_pengukuran
+    for each row execute function bump_anak_revisi();
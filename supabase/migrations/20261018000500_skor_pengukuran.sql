@@ -0,0 +1,46 @@
+-- Z-score dan kategori status gizi disimpan saat data ditulis (lihat kms_zscore.py).
+-- referensi_versi = cap versi rumus + tabel LMS; baris dengan cap lama dihitung ulang
+-- oleh `python kms_rescore.py`.
+
+alter table data_pengukuran
+    add column if not exists zscore_wfa real,
+    add column if not exists zscore_lhfa real,
+    add column if not exists zscore_wflh real,
+    add column if not exists zscore_bfa real,
+    add column if not exists zscore_hcfa real,
+    add column if not exists kategori_wfa text,
+    add column if not exists kategori_lhfa text,
+    add column if not exists kategori_wflh text,
+    add column if not exists kategori_bfa text,
+    add column if not exists kategori_hcfa text,
+    add column if not exists referensi_versi text;
+
+create index if not exists data_pengukuran_referensi_versi_idx on data_pengukuran (referensi_versi);
+
+-- `p.*` pada view dibekukan saat view dibuat; buat ulang agar kolom skor ikut tampil.
+drop view if exists data_pengukuran_lengkap;
+create view data_pengukuran_lengkap as
+select p.*, a.nama_anak, a.tanggal_lahir, a.jenis_kelamin
+from data_pengukuran p
+join anak a using (id_anak);
+
+-- Menulis hasil hitung ulang banyak baris dalam satu request:
+-- rpc('terapkan_skor', {'baris': [{'id': 1, 'zscore_wfa': ..., 'referensi_versi': ...}, ...]})
+create or replace function terapkan_skor(baris jsonb) returns integer
+language sql as $$
+    with diperbarui as (
+        update data_pengukuran p set
+            zscore_wfa = s.zscore_wfa, zscore_lhfa = s.zscore_lhfa, zscore_wflh = s.zscore_wflh,
+            zscore_bfa = s.zscore_bfa, zscore_hcfa = s.zscore_hcfa,
+            kategori_wfa = s.kategori_wfa, kategori_lhfa = s.kategori_lhfa, kategori_wflh = s.kategori_wflh,
+            kategori_bfa = s.kategori_bfa, kategori_hcfa = s.kategori_hcfa,
+            referensi_versi = s.referensi_versi
+        from jsonb_to_recordset(baris) as s(
+            id bigint, zscore_wfa real, zscore_lhfa real, zscore_wflh real, zscore_bfa real, zscore_hcfa real,
+            kategori_wfa text, kategori_lhfa text, kategori_wflh text, kategori_bfa text, kategori_hcfa text,
+            referensi_versi text)
+        where p.id = s.id
+        returning 1
+    )
+    select count(*)::integer from diperbarui;
+$$;
@@ -0,0 +1,9 @@
+-- Pengukuran terakhir per anak (plus jenis kelamin dan tanggal lahir) untuk dashboard
+-- prevalensi posyandu. Memakai indeks data_pengukuran_id_anak_tanggal_idx; aplikasi hanya
+-- meminta anak yang revisinya berubah sejak dashboard terakhir diperbarui.
+
+create or replace view pengukuran_terakhir as
+select distinct on (p.id_anak) p.*, a.jenis_kelamin, a.tanggal_lahir
+from data_pengukuran p
+join anak a using (id_anak)
+order by p.id_anak, p.tanggal_pengukuran desc, p.id desc;
@@ -0,0 +1,67 @@
+-- Penghitung bulanan kategori status gizi untuk tren prevalensi. Setiap baris menyimpan
+-- jumlah pengukuran balita (usia_bulan < 60) pada satu bulan, per jenis kelamin, per kolom
+-- kategori (kategori_wfa, ...), per kategori ('-' = indikator tidak terukur).
+-- Trigger di data_pengukuran mengurangi penghitung baris lama dan menambah baris baru, sehingga
+-- halaman tren cukup membaca tabel kecil ini tanpa memindai data_pengukuran.
+
+create table if not exists prevalensi_bulanan (
+    bulan date not null,
+    jenis_kelamin text not null,
+    kolom text not null,
+    kategori text not null,
+    jumlah bigint not null default 0,
+    primary key (bulan, jenis_kelamin, kolom, kategori)
+);
+
+-- Baris (bulan, jenis_kelamin, kolom, kategori) yang dihitung untuk satu pengukuran.
+create or replace function prevalensi_baris(p data_pengukuran)
+returns table (bulan date, jenis_kelamin text, kolom text, kategori text)
+language sql stable as $$
+    select date_trunc('month', p.tanggal_pengukuran)::date, a.jenis_kelamin, k.kolom, coalesce(k.kategori, '-')
+    from anak a
+    cross join (values
+        ('kategori_wfa', p.kategori_wfa), ('kategori_lhfa', p.kategori_lhfa), ('kategori_wflh', p.kategori_wflh),
+        ('kategori_bfa', p.kategori_bfa), ('kategori_hcfa', p.kategori_hcfa)
+    ) as k (kolom, kategori)
+    where a.id_anak = p.id_anak and coalesce(p.usia_bulan, 0) < 60;
+$$;
+
+create or replace function ubah_prevalensi_bulanan() returns trigger
+language plpgsql as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        update prevalensi_bulanan t set jumlah = t.jumlah - 1
+        from prevalensi_baris(old) b
+        where t.bulan = b.bulan and t.jenis_kelamin = b.jenis_kelamin and t.kolom = b.kolom and t.kategori = b.kategori;
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        insert into prevalensi_bulanan (bulan, jenis_kelamin, kolom, kategori, jumlah)
+        select b.bulan, b.jenis_kelamin, b.kolom, b.kategori, 1 from prevalensi_baris(new) b
+        on conflict (bulan, jenis_kelamin, kolom, kategori) do update set jumlah = prevalensi_bulanan.jumlah + 1;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists data_pengukuran_prevalensi_bulanan on data_pengukuran;
+create trigger data_pengukuran_prevalensi_bulanan
+    after insert or delete or update of tanggal_pengukuran, usia_bulan, id_anak,
+        kategori_wfa, kategori_lhfa, kategori_wflh, kategori_bfa, kategori_hcfa
+    on data_pengukuran
+    for each row execute function ubah_prevalensi_bulanan();
+
+-- Menghitung ulang seluruh penghitung dari data_pengukuran (pengisian awal, atau setelah
+-- jenis kelamin anak dikoreksi). Dipanggil juga lewat `python kms_rescore.py --prevalensi`.
+create or replace function hitung_ulang_prevalensi_bulanan() returns integer
+language plpgsql as $$
+begin
+    delete from prevalensi_bulanan where true;
+    insert into prevalensi_bulanan (bulan, jenis_kelamin, kolom, kategori, jumlah)
+    select b.bulan, b.jenis_kelamin, b.kolom, b.kategori, count(*)
+    from data_pengukuran p cross join lateral prevalensi_baris(p) b
+    group by 1, 2, 3, 4;
+    return (select count(*) from prevalensi_bulanan);
+end;
+$$;
+
+select hitung_ulang_prevalensi_bulanan();
@@ -0,0 +1,61 @@
+-- Tanda nilai biologis tidak wajar (BIV, batas flag WHO Anthro di kms_zscore.BIV_LIMITS).
+-- biv berisi kode indikator yang z-scorenya di luar batas (mis. 'wfa,lhfa'), null jika wajar.
+-- Baris bertanda tetap disimpan tetapi dikarantina dari pengukuran_terakhir dan
+-- prevalensi_bulanan. Baris lama ditandai oleh `python kms_rescore.py` (SCORING_VERSION 2).
+
+alter table data_pengukuran add column if not exists biv text;
+
+-- `p.*` pada view dibekukan saat view dibuat; buat ulang agar kolom biv ikut tampil.
+drop view if exists data_pengukuran_lengkap;
+create view data_pengukuran_lengkap as
+select p.*, a.nama_anak, a.tanggal_lahir, a.jenis_kelamin
+from data_pengukuran p
+join anak a using (id_anak);
+
+-- Pengukuran terakhir yang wajar per anak.
+drop view if exists pengukuran_terakhir;
+create view pengukuran_terakhir as
+select distinct on (p.id_anak) p.*, a.jenis_kelamin, a.tanggal_lahir
+from data_pengukuran p
+join anak a using (id_anak)
+where p.biv is null
+order by p.id_anak, p.tanggal_pengukuran desc, p.id desc;
+
+create or replace function terapkan_skor(baris jsonb) returns integer
+language sql as $$
+    with diperbarui as (
+        update data_pengukuran p set
+            zscore_wfa = s.zscore_wfa, zscore_lhfa = s.zscore_lhfa, zscore_wflh = s.zscore_wflh,
+            zscore_bfa = s.zscore_bfa, zscore_hcfa = s.zscore_hcfa,
+            kategori_wfa = s.kategori_wfa, kategori_lhfa = s.kategori_lhfa, kategori_wflh = s.kategori_wflh,
+            kategori_bfa = s.kategori_bfa, kategori_hcfa = s.kategori_hcfa,
+            biv = s.biv, referensi_versi = s.referensi_versi
+        from jsonb_to_recordset(baris) as s(
+            id bigint, zscore_wfa real, zscore_lhfa real, zscore_wflh real, zscore_bfa real, zscore_hcfa real,
+            kategori_wfa text, kategori_lhfa text, kategori_wflh text, kategori_bfa text, kategori_hcfa text,
+            biv text, referensi_versi text)
+        where p.id = s.id
+        returning 1
+    )
+    select count(*)::integer from diperbarui;
+$$;
+
+-- Baris bertanda BIV tidak dihitung di penghitung bulanan.
+create or replace function prevalensi_baris(p data_pengukuran)
+returns table (bulan date, jenis_kelamin text, kolom text, kategori text)
+language sql stable as $$
+    select date_trunc('month', p.tanggal_pengukuran)::date, a.jenis_kelamin, k.kolom, coalesce(k.kategori, '-')
+    from anak a
+    cross join (values
+        ('kategori_wfa', p.kategori_wfa), ('kategori_lhfa', p.kategori_lhfa), ('kategori_wflh', p.kategori_wflh),
+        ('kategori_bfa', p.kategori_bfa), ('kategori_hcfa', p.kategori_hcfa)
+    ) as k (kolom, kategori)
+    where a.id_anak = p.id_anak and coalesce(p.usia_bulan, 0) < 60 and p.biv is null;
+$$;
+
+drop trigger if exists data_pengukuran_prevalensi_bulanan on data_pengukuran;
+create trigger data_pengukuran_prevalensi_bulanan
+    after insert or delete or update of tanggal_pengukuran, usia_bulan, id_anak,
+        kategori_wfa, kategori_lhfa, kategori_wflh, kategori_bfa, kategori_hcfa, biv
+    on data_pengukuran
+    for each row execute function ubah_prevalensi_bulanan();